@@ -0,0 +1 @@
+# Модули, общие для приложений преподавателя (Pselp) и студента (Pselu)
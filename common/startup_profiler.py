@@ -0,0 +1,145 @@
+"""
+Профилирование холодного запуска приложения.
+
+Общий модуль для Pselp и Pselu: каждое приложение передаёт в install() свою
+переменную окружения (PSELP_PROFILE_STARTUP, PSELU_PROFILE_STARTUP) и имя
+журнала. Профилирование включается этой переменной со значением 1 или ключом
+--profile-startup. Перехватчик в sys.meta_path замеряет выполнение каждого
+импортируемого модуля (как ``python -X importtime``: собственное время и
+время вместе с вложенными импортами), а после показа первого окна в журнал
+пишется отчёт с самыми дорогими импортами и временем до первого кадра.
+"""
+
+import logging
+import os
+import sys
+import time
+
+COMMAND_LINE_FLAG = "--profile-startup"
+TOP_IMPORTS = 15
+
+_profiler = None
+_logger = logging.getLogger(__name__)
+
+
+class _TimedLoader:
+    """Загрузчик-обёртка: замеряет exec_module и передаёт остальное исходному загрузчику."""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler.enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.leave(module.__name__)
+
+
+class ImportProfiler:
+    """
+    Перехватчик импорта для sys.meta_path.
+
+    Attributes:
+        imports (dict): {модуль: (собственное время, общее время)} в секундах
+        marks (list): Отметки этапов запуска [(название, секунды от установки)]
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = {}
+        self.marks = []
+        self._stack = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def enter(self):
+        # [время начала, время вложенных импортов]
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def leave(self, name):
+        started, children = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        self.imports[name] = (elapsed - children, elapsed)
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.started))
+
+    def report(self, top=TOP_IMPORTS):
+        """Возвращает текст отчёта о запуске."""
+        import_total = sum(own for own, _ in self.imports.values())
+        lines = [
+            f"Профиль запуска: модулей импортировано {len(self.imports)}, "
+            f"импорт занял {import_total * 1000:.0f} мс"
+        ]
+        for label, elapsed in self.marks:
+            lines.append(f"  {label}: {elapsed * 1000:.0f} мс")
+        lines.append(f"  {'собств., мс':>12} {'всего, мс':>10}  модуль")
+        by_cost = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (own, total) in by_cost[:top]:
+            lines.append(f"  {own * 1000:12.1f} {total * 1000:10.1f}  {name}")
+        return "\n".join(lines)
+
+
+def is_enabled(env_variable, argv=None):
+    argv = sys.argv if argv is None else argv
+    return os.environ.get(env_variable) == "1" or COMMAND_LINE_FLAG in argv
+
+
+def install(env_variable, logger_name=__name__):
+    """
+    Устанавливает перехватчик импорта, если профилирование включено.
+
+    Вызывается первой строкой приложения, до импорта PyQt5 и окон.
+    Время отсчитывается от установки, то есть без запуска интерпретатора.
+
+    Args:
+        env_variable (str): Переменная окружения, включающая профилирование
+        logger_name (str): Журнал, в который пишется отчёт
+    """
+    global _profiler, _logger
+    _logger = logging.getLogger(logger_name)
+    if _profiler is None and is_enabled(env_variable):
+        if COMMAND_LINE_FLAG in sys.argv:
+            sys.argv.remove(COMMAND_LINE_FLAG)
+        _profiler = ImportProfiler()
+        sys.meta_path.insert(0, _profiler)
+    return _profiler
+
+
+def mark(label):
+    """Отмечает этап запуска (без профилирования ничего не делает)."""
+    if _profiler:
+        _profiler.mark(label)
+
+
+def finish(label="Первое окно показано"):
+    """Отмечает последний этап, пишет отчёт в журнал и снимает перехватчик."""
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.mark(label)
+    sys.meta_path.remove(_profiler)
+    report = _profiler.report()
+    _logger.info(report)
+    print(report, file=sys.stderr)
+    _profiler = None
@@ -66,3 +66,9 @@ class ConfigManager:
 
     def get_static_port(self):
         return self._config.getint('Server', 'static_port', fallback=8080)
+
+    def get_image_cache_limit_mb(self):
+        return self._config.getint('Cache', 'image_cache_mb', fallback=200)
+
+    def get_pixmap_cache_limit_mb(self):
+        return self._config.getint('Cache', 'pixmap_cache_mb', fallback=64)
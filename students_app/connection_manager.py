@@ -0,0 +1,342 @@
+"""
+Постоянное соединение клиента с сервером.
+
+Менеджер держит одно TCP-соединение на всё приложение вместо соединения на
+каждый запрос. Каждый запрос помечается полем request_id, сервер возвращает
+его в ответе, поэтому несколько запросов могут выполняться одновременно, а
+ответы, пришедшие не по порядку, доставляются в сигналы того Worker, который
+их ждёт.
+
+При обрыве соединение восстанавливается в фоне с нарастающей задержкой,
+после чего повторяется вход студента. Запросы на чтение, оборванные вместе
+с соединением, повторяются на новом соединении, остальные завершаются ошибкой.
+
+Ответы на часто повторяемые запросы берутся из ResponseCache, а одинаковые
+запросы на чтение, отправленные до прихода ответа (например, двойной щелчок),
+объединяются: на сервер уходит один запрос, ответ получают все.
+"""
+
+import itertools
+import json
+import socket
+import struct
+import threading
+import copy
+import time
+
+from config_manager import ConfigManager
+from logger_config import get_logger
+from response_cache import ResponseCache, request_key
+
+logger = get_logger('network.connection')
+
+CONNECT_TIMEOUT = 5.0
+REQUEST_TIMEOUT = 30.0
+CONNECT_ATTEMPTS = 3
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8.0
+# Запросы без побочных эффектов: их можно повторить после обрыва соединения
+# и объединить с таким же запросом, ещё ожидающим ответа
+RETRYABLE_ACTIONS = {
+    'login', 'get_lab_works', 'get_questions', 'sync_questions',
+    'get_student_info', 'check_lab_completed',
+}
+
+
+class PendingRequest:
+    """Запрос, ожидающий ответа сервера."""
+
+    def __init__(self, request, signals, deadline, key=None):
+        self.request = request
+        # Сигналы всех Worker, ожидающих этот ответ (объединённые запросы)
+        self.waiters = [signals] if signals else []
+        self.deadline = deadline
+        self.key = key
+        self.sock = None
+        self.retried = False
+
+    def finish(self, response):
+        for number, signals in enumerate(self.waiters):
+            signals.finished.emit(response if number == 0 else copy.deepcopy(response))
+
+    def fail(self, message):
+        for signals in self.waiters:
+            signals.error.emit(message)
+
+
+def recv_exact(sock, size):
+    """Читает ровно size байт; возвращает None, если соединение закрыто."""
+    chunks = []
+    received = 0
+    while received < size:
+        chunk = sock.recv(min(size - received, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+class ConnectionManager:
+    """
+    Одно соединение с сервером на приложение (singleton, как ConfigManager).
+
+    Attributes:
+        pending (dict): Ожидающие ответа запросы {request_id: PendingRequest}
+        inflight (dict): Объединяемые запросы в пути {ключ запроса: request_id}
+        cache (ResponseCache): Кэш ответов
+        login_request (dict): Последний успешный запрос входа, повторяется
+            после переподключения
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ConnectionManager, cls).__new__(cls)
+            cls._instance._init_state()
+        return cls._instance
+
+    def _init_state(self):
+        self.config = ConfigManager()
+        self.sock = None
+        self.address = None
+        self.request_ids = itertools.count(1)
+        self.pending = {}
+        self.inflight = {}
+        self.cache = ResponseCache()
+        self.login_request = None
+        self.closed = False
+        self.reconnecting = False
+        # lock защищает pending и текущий сокет, send_lock — запись кадров,
+        # connect_lock — установку соединения
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.connect_lock = threading.Lock()
+        threading.Thread(target=self._expire_loop, name="pselu-request-timeouts", daemon=True).start()
+
+    def send(self, request, signals, timeout=REQUEST_TIMEOUT):
+        """
+        Отправляет запрос, не дожидаясь ответа.
+
+        Ответ придёт в signals.finished, ошибка или таймаут — в signals.error.
+        Свежий ответ из кэша отправляется в signals.finished сразу.
+
+        Returns:
+            int | None: request_id или None, если ответ взят из кэша
+
+        Raises:
+            OSError: Если соединение установить не удалось
+        """
+        cached = self.cache.get(request)
+        if cached is not None:
+            signals.finished.emit(cached)
+            return None
+
+        key = request_key(request) if request.get('action') in RETRYABLE_ACTIONS else None
+        with self.lock:
+            if key in self.inflight:
+                request_id = self.inflight[key]
+                self.pending[request_id].waiters.append(signals)
+                logger.info(f"Запрос {request.get('action')} объединён с запросом {request_id}")
+                return request_id
+            request_id = next(self.request_ids)
+            entry = PendingRequest(request, signals, time.monotonic() + timeout, key)
+            self.pending[request_id] = entry
+            if key is not None:
+                self.inflight[key] = request_id
+        try:
+            self._write(request_id, entry)
+        except OSError as e:
+            with self.lock:
+                self._pop_pending(request_id)
+                # Об ошибке первого запроса сообщит его Worker, объединённым — менеджер
+                followers = entry.waiters[1:]
+            for follower in followers:
+                follower.error.emit(str(e))
+            raise
+        return request_id
+
+    def invalidate_cache(self, *actions):
+        """Сбрасывает кэшированные ответы указанных действий (без аргументов — все)."""
+        self.cache.invalidate(*actions)
+
+    def close(self):
+        """Закрывает соединение при выходе из приложения."""
+        self.closed = True
+        with self.lock:
+            sock, self.sock = self.sock, None
+        if sock:
+            sock.close()
+
+    def _server_address(self):
+        return (self.config.get_server_host(), self.config.get_server_port())
+
+    def _ensure_connected(self):
+        """Возвращает открытое соединение, при необходимости устанавливая его."""
+        address = self._server_address()
+        with self.connect_lock:
+            with self.lock:
+                if self.sock is not None and self.address == address:
+                    return self.sock
+                old_sock, self.sock = self.sock, None
+            if old_sock:
+                # Адрес сервера изменился в настройках
+                old_sock.close()
+
+            delay = RECONNECT_MIN_DELAY
+            for attempt in range(1, CONNECT_ATTEMPTS + 1):
+                try:
+                    logger.info(f"Подключение к {address[0]}:{address[1]} (попытка {attempt})")
+                    sock = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+                    break
+                except OSError as e:
+                    logger.warning(f"Не удалось подключиться к {address[0]}:{address[1]}: {e}")
+                    if attempt == CONNECT_ATTEMPTS or self.closed:
+                        raise
+                    time.sleep(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+            # Таймауты ответов отслеживаются по каждому запросу, чтение блокирующее
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.sock = sock
+                self.address = address
+            threading.Thread(target=self._read_loop, args=(sock,), name="pselu-connection-reader", daemon=True).start()
+            logger.info("Подключение успешно установлено")
+
+            if self.login_request:
+                self._replay_login(sock)
+            return sock
+
+    def _pop_pending(self, request_id):
+        """Убирает запрос из ожидающих (вызывается под self.lock)."""
+        entry = self.pending.pop(request_id, None)
+        if entry is not None and entry.key is not None and self.inflight.get(entry.key) == request_id:
+            del self.inflight[entry.key]
+        return entry
+
+    def _replay_login(self, sock):
+        request_id = next(self.request_ids)
+        entry = PendingRequest(self.login_request, None, time.monotonic() + REQUEST_TIMEOUT)
+        with self.lock:
+            self.pending[request_id] = entry
+        logger.info("Повторный вход после переподключения")
+        self._send_frame(sock, request_id, entry)
+
+    def _write(self, request_id, entry):
+        sock = self._ensure_connected()
+        self._send_frame(sock, request_id, entry)
+
+    def _send_frame(self, sock, request_id, entry):
+        data = json.dumps(dict(entry.request, request_id=request_id)).encode('utf-8')
+        logger.info(f"Отправляем запрос {request_id}: {entry.request.get('action')}")
+        try:
+            with self.send_lock:
+                sock.sendall(struct.pack('!I', len(data)) + data)
+        except OSError:
+            self._connection_lost(sock)
+            raise
+        # Запрос привязывается к соединению только после отправки: при ошибке
+        # отправки о нём сообщает вызывающий код, а не обработчик обрыва
+        entry.sock = sock
+
+    def _read_loop(self, sock):
+        try:
+            while True:
+                length_prefix = recv_exact(sock, 4)
+                if length_prefix is None:
+                    break
+                message_length = struct.unpack('!I', length_prefix)[0]
+                payload = recv_exact(sock, message_length)
+                if payload is None:
+                    break
+                try:
+                    response = json.loads(payload.decode('utf-8'))
+                except ValueError as e:
+                    logger.error(f"Ошибка декодирования JSON: {e}")
+                    continue
+                self._dispatch(response)
+        except OSError as e:
+            if not self.closed:
+                logger.warning(f"Соединение с сервером прервано: {e}")
+        self._connection_lost(sock)
+
+    def _dispatch(self, response):
+        request_id = response.pop('request_id', None)
+        with self.lock:
+            if request_id is None:
+                # Сервер старой версии не возвращает request_id и отвечает по порядку
+                request_id = next((rid for rid, e in self.pending.items() if e.sock is not None), None)
+            entry = self.pending.get(request_id)
+            # Промежуточные кадры потоковых ответов не завершают запрос
+            if entry is None or response.get('status') == 'partial':
+                return
+            self._pop_pending(request_id)
+
+        if entry.request.get('action') == 'login':
+            self.login_request = entry.request if response.get('status') == 'success' else None
+        self.cache.put(entry.request, response)
+        logger.info(f"Получен ответ на запрос {request_id}: {response.get('status')}")
+        entry.finish(response)
+
+    def _connection_lost(self, sock):
+        with self.lock:
+            if self.sock is sock:
+                self.sock = None
+            lost = {rid: e for rid, e in self.pending.items() if e.sock is sock}
+            retry = {}
+            for request_id, entry in lost.items():
+                if entry.request.get('action') in RETRYABLE_ACTIONS and not entry.retried:
+                    entry.retried = True
+                    entry.sock = None
+                    retry[request_id] = entry
+                else:
+                    self._pop_pending(request_id)
+        try:
+            sock.close()
+        except OSError:
+            pass
+        if self.closed:
+            return
+        for request_id, entry in lost.items():
+            if request_id not in retry:
+                entry.fail("Соединение с сервером потеряно")
+        with self.lock:
+            if self.reconnecting:
+                return
+            self.reconnecting = True
+        threading.Thread(target=self._reconnect_loop, name="pselu-reconnect", daemon=True).start()
+
+    def _reconnect_loop(self):
+        """Восстанавливает соединение с нарастающей задержкой и повторяет оборванные запросы."""
+        delay = RECONNECT_MIN_DELAY
+        sock = None
+        while sock is None and not self.closed:
+            try:
+                sock = self._ensure_connected()
+            except OSError:
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        with self.lock:
+            self.reconnecting = False
+            if sock is None:
+                return
+            retry = [(rid, e) for rid, e in self.pending.items() if e.sock is None and e.retried]
+        for request_id, entry in retry:
+            try:
+                self._send_frame(sock, request_id, entry)
+            except OSError:
+                break
+
+    def _expire_loop(self):
+        while not self.closed:
+            time.sleep(0.5)
+            now = time.monotonic()
+            with self.lock:
+                expired = [(rid, e) for rid, e in self.pending.items() if e.deadline <= now]
+                for request_id, _ in expired:
+                    self._pop_pending(request_id)
+            for request_id, entry in expired:
+                logger.error(f"Истекло время ожидания ответа на запрос {request_id}: {entry.request.get('action')}")
+                entry.fail("Превышено время ожидания ответа сервера")
@@ -0,0 +1,127 @@
+"""
+Общий HTTP-клиент для загрузки изображений.
+
+Все загрузки с сервера изображений идут через одну requests.Session: TCP-
+соединения с сервером переиспользуются (keep-alive), число одновременных
+загрузок ограничено, у каждого запроса есть таймауты. Одновременные запросы
+одного и того же URL (например, prefetch и показ вопроса) объединяются: на
+сервер уходит один запрос, ответ получают все.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Одновременных загрузок на всё приложение
+MAX_CONCURRENT_DOWNLOADS = 4
+# Соединений в пуле на один сервер
+POOL_MAXSIZE = 8
+# Таймауты (подключение, чтение), в секундах
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+def load_requests():
+    """
+    Импортирует requests при первом обращении к серверу изображений.
+
+    requests, urllib3 и PIL заметно замедляют запуск, а окну входа не нужны.
+    """
+    import requests
+    import urllib3
+    # Отключаем предупреждения о небезопасных запросах для локальной сети
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    return requests
+
+
+def is_local_url(url):
+    """Сервер в локальной сети: для него отключается проверка SSL."""
+    hostname = urlparse(url).hostname or ''
+    return hostname in ['localhost', '127.0.0.1'] or hostname.startswith('192.168.')
+
+
+class HttpClient:
+    """
+    Общая сессия с пулом соединений (singleton, как ConfigManager).
+
+    Attributes:
+        requests_sent (int): Число запросов, ушедших на сервер
+        requests_joined (int): Число запросов, объединённых с уже выполняющимися
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HttpClient, cls).__new__(cls)
+            cls._instance._init_state()
+        return cls._instance
+
+    def _init_state(self):
+        self._session = None
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(MAX_CONCURRENT_DOWNLOADS)
+        # {(URL, заголовки): Future} выполняющихся запросов
+        self.inflight = {}
+        self.requests_sent = 0
+        self.requests_joined = 0
+
+    @property
+    def session(self):
+        with self.lock:
+            if self._session is None:
+                requests = load_requests()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def get(self, url, headers=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Выполняет GET и читает ответ целиком.
+
+        Одновременные запросы с тем же URL и заголовками получают один и тот
+        же объект ответа, поэтому изменять его нельзя.
+
+        Raises:
+            requests.exceptions.RequestException: При ошибке сети или таймауте
+        """
+        key = (url, tuple(sorted((headers or {}).items())))
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+                self.requests_sent += 1
+            else:
+                self.requests_joined += 1
+        if not leader:
+            logger.debug(f"Запрос {url} объединён с уже выполняющимся")
+            return future.result()
+
+        try:
+            with self.slots:
+                response = self.session.get(url, headers=headers, timeout=timeout, verify=not is_local_url(url))
+                # Тело читается под ограничением, чтобы соединение вернулось в пул
+                response.content
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def stream(self, url, timeout=DEFAULT_TIMEOUT):
+        """
+        Выполняет потоковый GET (без объединения запросов).
+
+        Ответ нужно закрыть (with ... as response), чтобы соединение вернулось в пул.
+        Занимает место в ограничении загрузок до начала чтения тела.
+        """
+        with self.slots:
+            return self.session.get(url, stream=True, timeout=timeout, verify=not is_local_url(url))
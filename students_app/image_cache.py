@@ -3,158 +3,355 @@
 """
 
 import os
-import sys
+import re
+import atexit
 import hashlib
+import json
 import logging
-from PIL import Image
-from io import BytesIO
-import requests
-from urllib.parse import urlparse
-import warnings
-import urllib3
+import sqlite3
+import threading
 import time
+import weakref
+
+from local_storage import local_data_dir
 
 logger = logging.getLogger(__name__)
 
-# Отключаем предупреждения о небезопасных запросах для локальной сети
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+def parse_cache_control(value):
+    """
+    Разбирает заголовок Cache-Control.
+
+    Returns:
+        tuple[int | None, bool]: (max-age в секундах, признак immutable)
+    """
+    max_age = None
+    immutable = False
+    for directive in (value or '').split(','):
+        directive = directive.strip().lower()
+        if directive == 'immutable':
+            immutable = True
+        elif directive.startswith('max-age='):
+            try:
+                max_age = int(directive.split('=', 1)[1])
+            except ValueError:
+                pass
+    return max_age, immutable
+
+# Ограничение размера кэша на диске по умолчанию, МБ
+DEFAULT_CACHE_LIMIT_MB = 200
+INDEX_NAME = 'index.sqlite'
+# Старые имена файлов: <md5 URL>_<время сохранения>.png и <md5 URL>.meta
+LEGACY_FILE_RE = re.compile(r'^([0-9a-f]{32})_(\d+)\.png$')
+
+_schema_lock = threading.Lock()
+_ready_dirs = set()
+# Общие экземпляры кэша по директориям (см. get_cache)
+_shared = {}
+# Все открытые экземпляры — для записи времени обращения при выходе
+_instances = weakref.WeakSet()
+# Вытеснение выполняется одним потоком за раз
+_evict_lock = threading.Lock()
+# Время обращения копится в памяти и записывается в индекс пачкой: UPDATE с
+# фиксацией на каждое попадание в кэш брал бы блокировку записи индекса
+TOUCH_FLUSH_INTERVAL = 30.0
+
+def url_hash(url):
+    return hashlib.md5(url.encode()).hexdigest()
+
+def get_cache_limit():
+    """Ограничение размера кэша в байтах из config.ini ([Cache] image_cache_mb)."""
+    try:
+        from config_manager import ConfigManager
+        limit_mb = ConfigManager().get_image_cache_limit_mb()
+    except (FileNotFoundError, ValueError):
+        limit_mb = DEFAULT_CACHE_LIMIT_MB
+    return limit_mb * 1024 * 1024
+
+def get_cache(cache_dir='image_cache'):
+    """
+    Возвращает общий экземпляр кэша для директории.
+
+    Экземпляр держит одно соединение с индексом, поэтому его следует
+    переиспользовать, а не создавать кэш на каждое изображение.
+    """
+    with _schema_lock:
+        cache = _shared.get(cache_dir)
+    if cache is None:
+        cache = ImageCache(cache_dir)
+        with _schema_lock:
+            cache = _shared.setdefault(cache_dir, cache)
+    return cache
+
+def flush_access_times():
+    """Записывает накопленные времена обращения всех кэшей (в том числе при выходе)."""
+    for cache in list(_instances):
+        cache.flush_touches()
+
+atexit.register(flush_access_times)
 
 class ImageCache:
-    """Класс для кэширования изображений."""
+    """
+    Дисковый кэш изображений с индексом в SQLite.
+
+    Файл изображения хранится под именем <md5 URL>.png, а индекс связывает
+    хэш URL с файлом, размером, валидаторами (ETag, Cache-Control) и временем
+    последнего обращения. Поиск выполняется по индексу без обхода директории.
+    Файлы записываются атомарно (временный файл и os.replace), а при
+    превышении ограничения размера удаляются давно не использованные.
+    """
     
-    def __init__(self, cache_dir='image_cache'):
+    def __init__(self, cache_dir='image_cache', max_bytes=None):
         """
         Инициализация кэша изображений.
         
         Args:
-            cache_dir (str): Путь к директории кэша
+            cache_dir (str): Имя директории кэша в локальном каталоге данных
+            max_bytes (int): Ограничение размера кэша (по умолчанию из config.ini)
         """
-        if getattr(sys, 'frozen', False):
-            base_dir = os.path.dirname(sys.executable)
-        else:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        self.cache_dir = os.path.join(base_dir, cache_dir)
-        os.makedirs(self.cache_dir, exist_ok=True)
-        logger.info(f"Инициализирован кэш изображений в {self.cache_dir}")
-    
-    def _get_cache_path(self, url):
-        """Получает путь к кэшированному файлу."""
-        # Используем комбинацию хэша URL и времени для уникальности
-        hash_value = hashlib.md5(url.encode()).hexdigest()
-        timestamp = str(int(time.time()))
-        filename = f"{hash_value}_{timestamp}.png"
-        return os.path.join(self.cache_dir, filename)
-    
-    def get(self, url):
-        """Получает изображение из кэша."""
-        # Проверяем все файлы с таким же хэшем URL
-        hash_value = hashlib.md5(url.encode()).hexdigest()
+        self.cache_dir = local_data_dir(cache_dir)
+        self.index_path = os.path.join(self.cache_dir, INDEX_NAME)
+        self.max_bytes = get_cache_limit() if max_bytes is None else max_bytes
+        # Одно соединение на экземпляр: кэшем пользуются потоки загрузки,
+        # поэтому все обращения к соединению идут под self._lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.index_path, timeout=10, check_same_thread=False)
+        # {хэш URL: время обращения}, ещё не записанные в индекс
+        self._pending_touches = {}
+        self._last_touch_flush = time.time()
+        with _schema_lock:
+            if self.cache_dir not in _ready_dirs:
+                self._create_index()
+                _ready_dirs.add(self.cache_dir)
+                logger.info(f"Инициализирован кэш изображений в {self.cache_dir}")
+        _instances.add(self)
+
+    def close(self):
+        """Записывает накопленные обращения и закрывает соединение с индексом."""
+        self.flush_touches()
+        with self._lock:
+            self._conn.close()
+        _instances.discard(self)
+
+    def _create_index(self):
+        with self._lock:
+            conn = self._conn
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    hash TEXT PRIMARY KEY,
+                    url TEXT,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    max_age INTEGER,
+                    immutable INTEGER NOT NULL DEFAULT 0,
+                    stored_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_images_last_access ON images(last_access)")
+            conn.commit()
+            self._migrate_legacy(conn)
+
+    def _migrate_legacy(self, conn):
+        """Переносит в индекс файлы старого формата (с меткой времени в имени и .meta)."""
+        latest = {}
         for filename in os.listdir(self.cache_dir):
-            if filename.startswith(hash_value):
-                cache_path = os.path.join(self.cache_dir, filename)
-                try:
-                    from PyQt5.QtGui import QPixmap
-                    pixmap = QPixmap(cache_path)
-                    if not pixmap.isNull():
-                        return pixmap
-                except Exception as e:
-                    logger.error(f"Ошибка при загрузке изображения из кэша: {str(e)}")
-        return None
-    
-    def save(self, url, image):
+            match = LEGACY_FILE_RE.match(filename)
+            if match:
+                hash_value, stamp = match.group(1), int(match.group(2))
+                if hash_value in latest and latest[hash_value][1] >= stamp:
+                    self._remove_file(filename)
+                    continue
+                if hash_value in latest:
+                    self._remove_file(latest[hash_value][0])
+                latest[hash_value] = (filename, stamp)
+        for hash_value, (filename, stamp) in latest.items():
+            meta = {}
+            meta_path = os.path.join(self.cache_dir, f"{hash_value}.meta")
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                pass
+            try:
+                os.replace(os.path.join(self.cache_dir, filename), self._file_path(hash_value))
+                size = os.path.getsize(self._file_path(hash_value))
+            except OSError:
+                continue
+            conn.execute(
+                """INSERT OR IGNORE INTO images
+                   (hash, url, filename, size, etag, last_modified, max_age, immutable, stored_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (hash_value, meta.get('url'), f"{hash_value}.png", size, meta.get('etag'),
+                 meta.get('last_modified'), meta.get('max_age'), int(bool(meta.get('immutable'))),
+                 meta.get('stored_at', stamp), stamp)
+            )
+        conn.commit()
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.meta'):
+                self._remove_file(filename)
+        if latest:
+            logger.info(f"Перенесено в индекс кэша изображений: {len(latest)}")
+
+    def _file_path(self, hash_value):
+        return os.path.join(self.cache_dir, f"{hash_value}.png")
+
+    def _remove_file(self, filename):
+        try:
+            os.remove(os.path.join(self.cache_dir, filename))
+        except OSError:
+            pass
+
+    def _lookup(self, url, touch=False):
+        """Возвращает строку индекса изображения; touch отмечает обращение к нему."""
+        hash_value = url_hash(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, size, etag, last_modified, max_age, immutable, stored_at FROM images WHERE hash=?",
+                (hash_value,)
+            ).fetchone()
+            if row and touch:
+                self._touch(hash_value)
+        return row
+
+    def _touch(self, hash_value):
+        """Запоминает время обращения; в индекс оно попадает не чаще раза в TOUCH_FLUSH_INTERVAL."""
+        now = time.time()
+        with self._lock:
+            self._pending_touches[hash_value] = now
+            if now - self._last_touch_flush >= TOUCH_FLUSH_INTERVAL:
+                self.flush_touches()
+
+    def flush_touches(self):
+        """Записывает накопленные времена обращения одной транзакцией."""
+        with self._lock:
+            pending, self._pending_touches = self._pending_touches, {}
+            self._last_touch_flush = time.time()
+            if not pending:
+                return
+            try:
+                self._conn.executemany(
+                    "UPDATE images SET last_access=? WHERE hash=?",
+                    [(accessed, hash_value) for hash_value, accessed in pending.items()]
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка при записи времени обращения к кэшу: {str(e)}")
+
+    def get_path(self, url):
+        """
+        Возвращает путь к кэшированному файлу изображения или None.
+
+        Обновляет время последнего обращения, по которому выбираются файлы для вытеснения.
+        """
+        row = self._lookup(url, touch=True)
+        if row is None:
+            return None
+        path = os.path.join(self.cache_dir, row[0])
+        if not os.path.exists(path):
+            # Файл удалили вручную — запись индекса больше не нужна
+            self._delete(url_hash(url))
+            return None
+        return path
+
+    def is_fresh(self, url):
+        """
+        Проверяет, можно ли использовать кэшированное изображение без обращения к серверу.
+
+        Изображения с Cache-Control: immutable свежи всегда, остальные — до истечения max-age.
+        """
+        row = self._lookup(url)
+        if not row:
+            return False
+        _, _, _, _, max_age, immutable, stored_at = row
+        if immutable:
+            return True
+        return max_age is not None and time.time() - stored_at < max_age
+
+    def conditional_headers(self, url):
+        """Возвращает заголовки условного запроса для ревалидации кэшированного изображения."""
+        row = self._lookup(url)
+        headers = {}
+        if row and row[2]:
+            headers['If-None-Match'] = row[2]
+        if row and row[3]:
+            headers['If-Modified-Since'] = row[3]
+        return headers
+
+    def mark_revalidated(self, url, headers):
+        """Обновляет валидаторы после ответа 304 Not Modified."""
+        max_age, immutable = parse_cache_control(headers.get('Cache-Control'))
+        with self._lock:
+            self._conn.execute(
+                """UPDATE images SET etag=COALESCE(?, etag), last_modified=COALESCE(?, last_modified),
+                   max_age=?, immutable=?, stored_at=? WHERE hash=?""",
+                (headers.get('ETag'), headers.get('Last-Modified'), max_age, int(immutable),
+                 time.time(), url_hash(url))
+            )
+            self._conn.commit()
+
+    def save(self, url, data, headers=None):
         """
         Сохраняет изображение в кэш.
         
         Args:
             url (str): URL изображения
-            image: PIL.Image или bytes
+            data (bytes): Содержимое изображения
+            headers: Заголовки ответа сервера для последующей ревалидации
         """
+        hash_value = url_hash(url)
+        cache_path = self._file_path(hash_value)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
         try:
-            cache_path = self._get_cache_path(url)
-            if isinstance(image, Image.Image):
-                image.save(cache_path, format='PNG')
-            else:
-                with open(cache_path, 'wb') as f:
-                    f.write(image)
+            # Читатели видят либо старый файл, либо новый целиком
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+
+            headers = headers or {}
+            max_age, immutable = parse_cache_control(headers.get('Cache-Control'))
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO images
+                       (hash, url, filename, size, etag, last_modified, max_age, immutable, stored_at, last_access)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (hash_value, url, os.path.basename(cache_path), len(data), headers.get('ETag'),
+                     headers.get('Last-Modified'), max_age, int(immutable), now, now)
+                )
+                self._conn.commit()
             logger.info(f"Изображение сохранено в кэш: {url}")
+            self.evict()
         except Exception as e:
             logger.error(f"Ошибка при сохранении в кэш: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
-    def get_image(self, url):
-        """
-        Получает изображение из кэша или загружает его.
-        
-        Args:
-            url (str): URL изображения
-            
-        Returns:
-            str: Путь к локальному файлу изображения
-        """
-        # Проверяем кэш
-        cached_image = self.get(url)
-        if cached_image:
-            cache_path = self._get_cache_path(url)
-            if os.path.exists(cache_path):
-                return cache_path
-        
-        # Если изображения нет в кэше, загружаем его
-        try:
-            logger.info(f"Загрузка изображения: {url}")
-            parsed_url = urlparse(url)
-            if parsed_url.hostname in ['localhost', '127.0.0.1'] or parsed_url.hostname.startswith('192.168.'):
-                response = requests.get(url, verify=False)
-            else:
-                response = requests.get(url)
-            response.raise_for_status()
-            
-            # Сохраняем изображение
-            image = Image.open(BytesIO(response.content))
-            cache_path = self._get_cache_path(url)
-            self.save(url, image)
-            return cache_path
-            
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке изображения {url}: {str(e)}")
-            return None
+    def _delete(self, hash_value):
+        with self._lock:
+            self._conn.execute("DELETE FROM images WHERE hash=?", (hash_value,))
+            self._conn.commit()
 
-def get_cached_image(url):
-    """
-    Получает изображение из кэша или загружает его с сервера.
-    
-    Args:
-        url (str): URL изображения
-        
-    Returns:
-        str: Путь к локальному файлу изображения
-    """
-    # Создаем хэш URL для имени файла
-    filename = hashlib.md5(url.encode()).hexdigest() + '.png'
-    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_cache')
-    os.makedirs(cache_dir, exist_ok=True)
-    cached_path = os.path.join(cache_dir, filename)
-    
-    # Если файл уже есть в кэше, возвращаем его
-    if os.path.exists(cached_path):
-        logger.info(f"Изображение найдено в кэше: {url}")
-        return cached_path
-    
-    # Если файла нет, пробуем загрузить его
-    try:
-        logger.info(f"Загрузка изображения: {url}")
-        # Для локальной сети отключаем проверку SSL
-        parsed_url = urlparse(url)
-        if parsed_url.hostname in ['localhost', '127.0.0.1'] or parsed_url.hostname.startswith('192.168.'):
-            response = requests.get(url, verify=False)
-        else:
-            response = requests.get(url)
-        response.raise_for_status()
-        
-        # Сохраняем изображение в кэш
-        with open(cached_path, 'wb') as f:
-            f.write(response.content)
-        logger.info(f"Изображение сохранено в кэш: {url}")
-        return cached_path
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке изображения {url}: {str(e)}")
-        return None
+    def evict(self):
+        """Удаляет давно не использованные изображения, пока кэш больше ограничения."""
+        with _evict_lock, self._lock:
+            conn = self._conn
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Порядок вытеснения учитывает ещё не записанные обращения
+            self.flush_touches()
+            removed = 0
+            rows = conn.execute("SELECT hash, filename, size FROM images ORDER BY last_access").fetchall()
+            for hash_value, filename, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._remove_file(filename)
+                conn.execute("DELETE FROM images WHERE hash=?", (hash_value,))
+                total -= size
+                removed += 1
+            conn.commit()
+            logger.info(f"Из кэша изображений вытеснено файлов: {removed}")
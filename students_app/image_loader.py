@@ -2,107 +2,110 @@
 Модуль для загрузки и кэширования изображений.
 """
 
-import os
-import requests
 import logging
-from PIL import Image
-from io import BytesIO
-from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot, QByteArray
-from PyQt5.QtGui import QPixmap
-from image_cache import ImageCache
+import tarfile
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+from image_cache import get_cache
+from http_client import DEFAULT_TIMEOUT, HttpClient, load_requests
 
 logger = logging.getLogger(__name__)
 
+def fetch_image_data(url, cache=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Возвращает содержимое изображения из кэша или с сервера.
+
+    Свежая копия из кэша используется без запроса, устаревшая — ревалидируется
+    условным запросом. Не обращается к Qt, поэтому может вызываться из любого потока.
+
+    Returns:
+        bytes | None: Данные изображения или None при ошибке
+    """
+    cache = cache or get_cache()
+    cached_path = cache.get_path(url)
+    cached_data = None
+    if cached_path:
+        try:
+            with open(cached_path, 'rb') as f:
+                cached_data = f.read()
+        except OSError:
+            cached_path = None
+    if cached_data and cache.is_fresh(url):
+        return cached_data
+
+    try:
+        headers = cache.conditional_headers(url) if cached_data else {}
+        response = HttpClient().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached_data:
+            logger.info(f"Изображение не изменилось, используется кэш: {url}")
+            cache.mark_revalidated(url, response.headers)
+            return cached_data
+        response.raise_for_status()
+        cache.save(url, response.content, response.headers)
+        return response.content
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке изображения {url}: {str(e)}")
+        # Устаревшая копия лучше, чем никакой
+        return cached_data
+
 class WorkerSignals(QObject):
-    """Определяет сигналы, доступные для Worker."""
+    """Определяет сигналы, доступные для BundleWorker."""
     finished = pyqtSignal()
     error = pyqtSignal(tuple)
     result = pyqtSignal(object)
-    progress = pyqtSignal(int)
 
-class Worker(QRunnable):
-    """Worker для загрузки изображений в отдельном потоке."""
+# PAX-заголовки элементов пакета изображений (см. сервер, /bundle)
+PAX_ETAG = 'PSELP.etag'
+PAX_CACHE_CONTROL = 'PSELP.cache_control'
+
+class BundleWorker(QRunnable):
+    """
+    Worker для фоновой загрузки всех изображений попытки одним запросом.
+
+    Сервер отдаёт tar-поток, имена элементов которого — относительные URL
+    изображений, поэтому элементы сохраняются в кэш под теми же ключами, по
+    которым их затем ищет окно тестирования.
+    """
 
-    def __init__(self, url, cache_dir='image_cache', max_size=(800, 600)):
+    def __init__(self, base_url, question_ids, cache_dir='image_cache'):
         super().__init__()
-        self.url = url
+        self.base_url = base_url.rstrip('/')
+        self.question_ids = question_ids
         self.signals = WorkerSignals()
-        self.cache = ImageCache(cache_dir)
-        self.max_size = max_size
+        self.cache = get_cache(cache_dir)
 
     @pyqtSlot()
     def run(self):
-        """Основной метод для загрузки и обработки изображения."""
+        """Загружает пакет и распаковывает его в кэш по мере получения."""
+        ids = ','.join(str(q_id) for q_id in self.question_ids)
+        url = f"{self.base_url}/bundle?questions={ids}"
+        saved = 0
+        requests = load_requests()
         try:
-            # Проверяем кэш
-            cached_image = self.cache.get(self.url)
-            if cached_image:
-                logger.info(f"Изображение найдено в кэше: {self.url}")
-                self.signals.result.emit(cached_image)
-                self.signals.finished.emit()
-                return
-
-            # Загружаем изображение
-            logger.info(f"Загрузка изображения: {self.url}")
-            response = requests.get(self.url, timeout=10)
-            response.raise_for_status()
-
-            # Открываем изображение с помощью PIL
-            image = Image.open(BytesIO(response.content))
-
-            # Проверяем минимальный размер изображения
-            min_size = 100  # Минимальный размер в пикселях
-            if image.size[0] < min_size or image.size[1] < min_size:
-                raise ValueError(f"Изображение слишком маленькое: {image.size}")
-
-            # Изменяем размер, если необходимо
-            if image.size[0] > self.max_size[0] or image.size[1] > self.max_size[1]:
-                image.thumbnail(self.max_size, Image.Resampling.LANCZOS)
-
-            # Сохраняем в кэш
-            self.cache.save(self.url, image)
-
-            # Конвертируем в QPixmap
-            pixmap = self._pil_to_pixmap(image)
-            
-            self.signals.result.emit(pixmap)
-
+            logger.info(f"Загрузка пакета изображений: {url}")
+            with HttpClient().stream(url) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                with tarfile.open(fileobj=response.raw, mode='r|') as tar:
+                    for member in tar:
+                        if not member.isfile():
+                            continue
+                        image_url = f"{self.base_url}/{member.name}"
+                        if self.cache.is_fresh(image_url):
+                            continue
+                        data = tar.extractfile(member).read()
+                        headers = {
+                            'ETag': member.pax_headers.get(PAX_ETAG),
+                            'Cache-Control': member.pax_headers.get(PAX_CACHE_CONTROL),
+                        }
+                        self.cache.save(image_url, data, headers)
+                        saved += 1
+            logger.info(f"Из пакета сохранено изображений: {saved}")
+            self.signals.result.emit(saved)
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при загрузке изображения: {str(e)}")
+            logger.error(f"Ошибка при загрузке пакета изображений: {str(e)}")
             self.signals.error.emit(("Ошибка сети", str(e)))
-        except ValueError as e:
-            logger.error(f"Ошибка при обработке изображения: {str(e)}")
-            self.signals.error.emit(("Ошибка изображения", str(e)))
-        except Exception as e:
-            logger.error(f"Неизвестная ошибка: {str(e)}")
-            self.signals.error.emit(("Неизвестная ошибка", str(e)))
+        except tarfile.TarError as e:
+            logger.error(f"Повреждённый пакет изображений: {str(e)}")
+            self.signals.error.emit(("Ошибка пакета", str(e)))
         finally:
             self.signals.finished.emit()
-
-    def _pil_to_pixmap(self, pil_image):
-        """Конвертирует PIL Image в QPixmap."""
-        # Сохраняем во временный буфер
-        buffer = BytesIO()
-        pil_image.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        # Создаем QPixmap из данных буфера
-        pixmap = QPixmap()
-        data = QByteArray(buffer.getvalue())
-        pixmap.loadFromData(data)
-        
-        return pixmap
-
-def get_cached_image(url: str, cache_dir: str = 'image_cache') -> str:
-    """
-    Получает изображение из кэша или загружает его с сервера.
-    
-    Args:
-        url (str): URL изображения
-        cache_dir (str): Директория для кэширования
-        
-    Returns:
-        str: Путь к изображению в кэше
-    """
-    cache = ImageCache(cache_dir)
-    return cache.get_image(url)
@@ -0,0 +1,186 @@
+"""
+Фоновая подготовка изображений попытки.
+
+Как только выбраны вопросы попытки, все их изображения загружаются и
+декодируются в фоновых потоках с ограниченной параллельностью: сначала одним
+пакетом /bundle, затем каждое изображение читается из кэша (или загружается
+отдельно, если пакет недоступен), декодируется в QImage и уменьшается под
+рамку отображения. Готовые изображения складываются в PixmapCache и приходят
+в поток интерфейса сигналом image_ready, поэтому переход между вопросами не
+ждёт сети и диска.
+"""
+
+import logging
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage
+from image_loader import BundleWorker, fetch_image_data
+from pixmap_cache import PixmapCache
+
+logger = logging.getLogger(__name__)
+
+# Одновременно загружаемых и декодируемых изображений
+PREFETCH_THREADS = 4
+
+def variant_url(url: str, size: tuple[int, int]) -> str:
+    """Возвращает URL варианта изображения, уменьшенного сервером под рамку size."""
+    return f"{url}?size={size[0]}x{size[1]}"
+
+def fit_image(image, size):
+    """Уменьшает QImage до рамки size, если оно в неё не помещается."""
+    if image.width() <= size[0] and image.height() <= size[1]:
+        return image
+    return image.scaled(
+        size[0], size[1],
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    )
+
+class ImageJobSignals(QObject):
+    """Сигналы задания: ключ изображения, поколение попытки, результат."""
+    loaded = pyqtSignal(str, int, object)
+    failed = pyqtSignal(str, int)
+
+class ImageJob(QRunnable):
+    """
+    Загружает и декодирует одно изображение вне потока интерфейса.
+
+    Обычно загружается вариант, уменьшенный сервером под рамку; с original=True
+    загружается оригинал (для полноэкранного просмотра) и уменьшается на клиенте.
+    """
+
+    def __init__(self, url, size, generation, original=False):
+        super().__init__()
+        self.url = url
+        self.size = size
+        self.generation = generation
+        self.original = original
+        self.signals = ImageJobSignals()
+
+    @pyqtSlot()
+    def run(self):
+        key = variant_url(self.url, self.size)
+        cache = PixmapCache()
+        image = cache.get(self.url, self.size)
+        if image is not None:
+            self.signals.loaded.emit(key, self.generation, image)
+            return
+        data = fetch_image_data(self.url if self.original else key)
+        image = QImage()
+        # QImage, в отличие от QPixmap, можно создавать вне потока интерфейса
+        if data and image.loadFromData(data):
+            image = fit_image(image, self.size)
+            cache.put(self.url, self.size, image)
+            self.signals.loaded.emit(key, self.generation, image)
+        else:
+            self.signals.failed.emit(key, self.generation)
+
+class ImagePrefetcher(QObject):
+    """
+    Готовит изображения вопросов попытки заранее.
+
+    Готовые изображения хранятся в общем PixmapCache. Каждая новая попытка
+    увеличивает поколение: результаты заданий прошлой попытки отбрасываются.
+
+    Attributes:
+        failed (set): URL вариантов, которые загрузить не удалось
+    """
+    image_ready = pyqtSignal(str, object)
+    image_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, max_threads=PREFETCH_THREADS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.generation = 0
+        self.cache = PixmapCache()
+        self.failed = set()
+        self.queued = set()
+        self.items = []
+        self.bundle = None
+
+    def start(self, base_url, question_ids, items):
+        """
+        Начинает подготовку изображений новой попытки.
+
+        Args:
+            base_url (str): Адрес сервера изображений
+            question_ids (list): ID вопросов попытки (для пакета /bundle)
+            items (list[tuple[str, tuple[int, int]]]): Пары (URL, рамка) в порядке показа
+        """
+        self.generation += 1
+        # Ещё не начатые задания прошлой попытки больше не нужны
+        self.pool.clear()
+        self.failed.clear()
+        self.queued.clear()
+        self.items = list(items)
+        if not self.items:
+            return
+        # Пакет сначала заполняет дисковый кэш одним запросом, затем
+        # изображения декодируются из кэша параллельно
+        self.bundle = BundleWorker(base_url, question_ids)
+        self.bundle.signals.finished.connect(self._on_bundle_finished)
+        self.pool.start(self.bundle)
+
+    def get(self, url, size):
+        """Возвращает готовое изображение или None."""
+        return self.cache.get(url, size)
+
+    def request(self, url, size):
+        """
+        Запрашивает изображение вне очереди (например, для текущего вопроса).
+
+        Returns:
+            str: Ключ изображения в сигналах image_ready и image_failed
+        """
+        key = variant_url(url, size)
+        if key not in self.failed:
+            self._queue(url, size, priority=1)
+        return key
+
+    def request_original(self, url, size):
+        """
+        Запрашивает оригинал изображения, уменьшенный под рамку size
+        (полноэкранный просмотр). Выполняется раньше остальных заданий.
+
+        Returns:
+            str: Ключ изображения в сигналах image_ready и image_failed
+        """
+        key = variant_url(url, size)
+        # Повторное открытие просмотра — новая попытка загрузки
+        self.failed.discard(key)
+        self._queue(url, size, priority=2, original=True)
+        return key
+
+    @pyqtSlot()
+    def _on_bundle_finished(self):
+        if self.bundle is None or self.sender() is not self.bundle.signals:
+            return  # Пакет прошлой попытки
+        self.bundle = None
+        for url, size in self.items:
+            self._queue(url, size)
+
+    def _queue(self, url, size, priority=0, original=False):
+        key = variant_url(url, size)
+        # Изображение уже загружается
+        if key in self.queued:
+            return
+        self.queued.add(key)
+        job = ImageJob(url, size, self.generation, original)
+        job.signals.loaded.connect(self._on_loaded)
+        job.signals.failed.connect(self._on_failed)
+        self.pool.start(job, priority)
+
+    @pyqtSlot(str, int, object)
+    def _on_loaded(self, key, generation, image):
+        if generation != self.generation:
+            return
+        self.queued.discard(key)
+        self.image_ready.emit(key, image)
+
+    @pyqtSlot(str, int)
+    def _on_failed(self, key, generation):
+        if generation != self.generation:
+            return
+        self.queued.discard(key)
+        self.failed.add(key)
+        self.image_failed.emit(key)
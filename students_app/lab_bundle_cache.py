@@ -0,0 +1,108 @@
+"""
+Модуль для кэширования вопросов лабораторных работ на клиенте.
+
+Клиент хранит последний полученный набор вопросов на диске вместе с номером
+последней синхронизации (seq) и передаёт его в запросе sync_questions. Сервер
+отвечает только изменениями после этого номера (delta), которые применяются к
+сохранённому набору, либо полным снимком (snapshot).
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+from local_storage import local_data_dir
+
+logger = logging.getLogger(__name__)
+
+class LabBundleCache:
+    """Дисковый кэш наборов вопросов, разделённый по серверам."""
+
+    def __init__(self, cache_dir='lab_cache'):
+        """
+        Инициализация кэша вопросов.
+
+        Args:
+            cache_dir (str): Имя директории кэша в локальном каталоге данных
+        """
+        self.cache_dir = local_data_dir(cache_dir)
+
+    def _get_path(self, server, lab_id):
+        """Путь к файлу набора: у разных серверов свои идентификаторы лабораторных."""
+        server_hash = hashlib.md5(server.encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{server_hash}_lab{lab_id}.json")
+
+    def load(self, server, lab_id):
+        """
+        Возвращает сохранённый набор вопросов.
+
+        Returns:
+            dict | None: Набор вопросов (questions, time_limit, seq, log_id)
+        """
+        try:
+            with open(self._get_path(server, lab_id), 'r', encoding='utf-8') as f:
+                bundle = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(bundle, dict) or 'questions' not in bundle or 'seq' not in bundle:
+            return None
+        return bundle
+
+    def sync_request(self, server, lab_id):
+        """Возвращает данные запроса sync_questions с учётом сохранённого набора."""
+        request = {'lab_id': lab_id}
+        bundle = self.load(server, lab_id)
+        if bundle:
+            request['since_seq'] = bundle['seq']
+            request['log_id'] = bundle.get('log_id')
+        return request
+
+    def apply_sync(self, server, lab_id, data):
+        """
+        Применяет ответ sync_questions к сохранённому набору и сохраняет результат.
+
+        Returns:
+            dict | None: Актуальный набор (questions, time_limit, ...) или None,
+            если пришла разность, а сохранённого набора нет
+        """
+        if data.get('mode') == 'delta':
+            bundle = self.load(server, lab_id)
+            if bundle is None:
+                return None
+            questions = {q['id']: q for q in bundle['questions']}
+            for q_id in data.get('deleted', []):
+                questions.pop(q_id, None)
+            for question in data.get('changed', []):
+                questions[question['id']] = question
+            logger.info(
+                f"Применены изменения вопросов: изменено {len(data.get('changed', []))}, "
+                f"удалено {len(data.get('deleted', []))}"
+            )
+            questions = [questions[q_id] for q_id in sorted(questions)]
+        else:
+            questions = data.get('questions', [])
+
+        bundle = {key: value for key, value in data.items() if key not in ('mode', 'changed', 'deleted')}
+        bundle['questions'] = questions
+        self.save(server, lab_id, bundle)
+        return bundle
+
+    def save(self, server, lab_id, data):
+        """
+        Сохраняет набор вопросов, полученный от сервера.
+
+        Args:
+            server (str): Адрес сервера ("host:port")
+            lab_id (int): Идентификатор лабораторной работы
+            data (dict): Набор вопросов с номером синхронизации
+        """
+        path = self._get_path(server, lab_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            logger.info(f"Сохранены вопросы лабораторной {lab_id}, версия {data.get('version')}")
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении вопросов в кэш: {str(e)}")
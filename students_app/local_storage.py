@@ -0,0 +1,59 @@
+"""
+Локальные каталоги данных клиента.
+
+Приложение обычно запускается с сетевого диска, общего для всего класса,
+поэтому кэши, журнал отправок и файлы логов хранятся не рядом с исполняемым
+файлом, а в локальном каталоге пользователя (то же, что
+QStandardPaths.AppLocalDataLocation):
+%LOCALAPPDATA%\\Pselu на Windows, ~/Library/Application Support/Pselu на macOS
+и $XDG_DATA_HOME/Pselu (~/.local/share/Pselu) на Linux.
+"""
+
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = 'Pselu'
+
+
+def app_dir():
+    """Каталог программы: рядом с исполняемым файлом или с исходниками."""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def local_data_root():
+    if sys.platform == 'win32':
+        root = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        root = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support')
+    else:
+        root = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(root, APP_NAME)
+
+
+def local_data_dir(name):
+    """
+    Возвращает подкаталог локального каталога данных, создавая его.
+
+    Если локальный каталог недоступен (нет профиля пользователя, нет прав),
+    используется каталог рядом с программой, как в прежних версиях.
+
+    Args:
+        name (str): Имя подкаталога (image_cache, lab_cache, journal, logs)
+
+    Returns:
+        str: Абсолютный путь к подкаталогу
+    """
+    path = os.path.join(local_data_root(), name)
+    try:
+        os.makedirs(path, exist_ok=True)
+        return path
+    except OSError as e:
+        fallback = os.path.join(app_dir(), name)
+        logger.warning(f"Локальный каталог {path} недоступен ({e}), используется {fallback}")
+        os.makedirs(fallback, exist_ok=True)
+        return fallback
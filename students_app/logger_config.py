@@ -2,8 +2,8 @@ import logging
 import os
 import sys
 from logging.handlers import RotatingFileHandler
-from datetime import datetime
-import codecs
+
+from local_storage import local_data_dir
 
 def setup_logger():
     """Настраивает логирование для приложения."""
@@ -18,18 +18,15 @@ def setup_logger():
             except locale.Error:
                 pass
     
-    # Создаем директорию для логов, если её нет
-    log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Создаем отдельную директорию для текущей сессии
-    session_time = datetime.now().strftime('%Y%m%d_%H%M%S')
-    session_dir = os.path.join(log_dir, session_time)
-    os.makedirs(session_dir, exist_ok=True)
+    # Все запуски пишут в одни и те же файлы с ротацией: отдельная директория
+    # на каждый запуск копилась без ограничений. Файлы лежат в локальном
+    # каталоге пользователя: при запуске с общего сетевого диска клиенты
+    # класса иначе писали бы и ротировали одни и те же файлы
+    log_dir = local_data_dir('logs')
     
     # Пути к файлам логов
-    client_log = os.path.join(session_dir, 'client.log')
-    network_log = os.path.join(session_dir, 'network.log')
+    client_log = os.path.join(log_dir, 'client.log')
+    network_log = os.path.join(log_dir, 'network.log')
     
     # Настраиваем корневой логгер
     logger = logging.getLogger('students_app')
@@ -49,36 +46,24 @@ def setup_logger():
         datefmt='%H:%M:%S'
     )
     
-    # Создаем обработчики с явным указанием кодировки
-    class Utf8RotatingFileHandler(RotatingFileHandler):
-        def __init__(self, *args, **kwargs):
-            kwargs['encoding'] = 'utf-8'
-            super().__init__(*args, **kwargs)
-        
-        def emit(self, record):
-            try:
-                msg = self.format(record)
-                stream = self.stream
-                if not isinstance(msg, bytes):
-                    msg = msg.encode('utf-8')
-                stream.write(msg.decode('utf-8'))
-                stream.write(self.terminator)
-                self.flush()
-            except Exception:
-                self.handleError(record)
-    
-    client_handler = Utf8RotatingFileHandler(
+    # Создаем обработчики с явным указанием кодировки; файл открывается при
+    # первой записи (delay), а ротация выполняется стандартным emit
+    client_handler = RotatingFileHandler(
         client_log,
         maxBytes=10*1024*1024,
-        backupCount=5
+        backupCount=5,
+        encoding='utf-8',
+        delay=True
     )
     client_handler.setLevel(logging.DEBUG)
     client_handler.setFormatter(detailed_formatter)
     
-    network_handler = Utf8RotatingFileHandler(
+    network_handler = RotatingFileHandler(
         network_log,
         maxBytes=10*1024*1024,
-        backupCount=5
+        backupCount=5,
+        encoding='utf-8',
+        delay=True
     )
     network_handler.setLevel(logging.DEBUG)
     network_handler.setFormatter(detailed_formatter)
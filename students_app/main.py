@@ -14,25 +14,51 @@ Pselu - Приложение для тестирования студентов
 Версия: 1.0.0
 """
 
+import os
 import sys
+
+# Добавляем корневую директорию в PYTHONPATH (там же общие модули common/)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from common import startup_profiler
+startup_profiler.install("PSELU_PROFILE_STARTUP", "students_app.startup")
+
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication, QStackedWidget, QMessageBox
 from PyQt5.QtGui import QIcon
 from windows.login import LoginWindow
-from windows.registration import RegistrationWindow
-from windows.lab_selection import LabSelectionWindow
-from windows.testing import TestingWindow
-from windows.result import ResultWindow
 from styles import MAIN_STYLE
 import logging
-import os
 from config_manager import ConfigManager
 from logger_config import setup_logger
 import codecs
 
-# Добавляем корневую директорию в PYTHONPATH
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if project_root not in sys.path:
-    sys.path.append(project_root)
+# Окна, кроме окна входа, создаются при первом переходе к ним: окно
+# тестирования тянет за собой requests, urllib3 и загрузку изображений
+def create_registration_window(app):
+    from windows.registration import RegistrationWindow
+    return RegistrationWindow(app.switch_window)
+
+def create_lab_selection_window(app):
+    from windows.lab_selection import LabSelectionWindow
+    return LabSelectionWindow(app.switch_window, app.get_student_id)
+
+def create_testing_window(app):
+    from windows.testing import TestingWindow
+    return TestingWindow(app.switch_window, app.get_student_id)
+
+def create_result_window(app):
+    from windows.result import ResultWindow
+    return ResultWindow(app.switch_window, app.get_student_id)
+
+WINDOW_FACTORIES = {
+    "registration": create_registration_window,
+    "lab_selection": create_lab_selection_window,
+    "testing": create_testing_window,
+    "result": create_result_window,
+}
 
 class App(QStackedWidget):
     """
@@ -41,10 +67,7 @@ class App(QStackedWidget):
     Attributes:
         current_student_id (int): ID текущего студента
         login_window (LoginWindow): Окно входа
-        registration_window (RegistrationWindow): Окно регистрации
-        lab_selection_window (LabSelectionWindow): Окно выбора работы
-        testing_window (TestingWindow): Окно тестирования
-        result_window (ResultWindow): Окно результатов
+        windows (dict): Созданные окна по именам (см. WINDOW_FACTORIES)
     """
     def __init__(self):
         super().__init__()
@@ -53,16 +76,8 @@ class App(QStackedWidget):
 
     def init_ui(self):
         self.login_window = LoginWindow(self.switch_window)
-        self.registration_window = RegistrationWindow(self.switch_window)
-        self.lab_selection_window = LabSelectionWindow(self.switch_window, self.get_student_id)
-        self.testing_window = TestingWindow(self.switch_window, self.get_student_id)
-        self.result_window = ResultWindow(self.switch_window, self.get_student_id)
-
         self.addWidget(self.login_window)
-        self.addWidget(self.registration_window)
-        self.addWidget(self.lab_selection_window)
-        self.addWidget(self.testing_window)
-        self.addWidget(self.result_window)
+        self.windows = {}
 
         base_path = getattr(sys, '_MEIPASS', os.path.dirname(__file__))
         self.setWindowIcon(QIcon(os.path.join(base_path, "app_icon.ico")))
@@ -75,32 +90,52 @@ class App(QStackedWidget):
     def apply_style(self):
         self.setStyleSheet(MAIN_STYLE)
 
+    def get_window(self, window_name):
+        """Возвращает окно, создавая его при первом обращении."""
+        window = self.windows.get(window_name)
+        if window is None:
+            window = WINDOW_FACTORIES[window_name](self)
+            self.windows[window_name] = window
+            self.addWidget(window)
+        return window
+
     def switch_window(self, window_name, data=None):
         if window_name == "login":
             self.setCurrentWidget(self.login_window)
         elif window_name == "registration":
-            self.setCurrentWidget(self.registration_window)
+            self.setCurrentWidget(self.get_window("registration"))
         elif window_name == "lab_selection":
-            self.lab_selection_window.load_data()
-            self.setCurrentWidget(self.lab_selection_window)
+            lab_selection_window = self.get_window("lab_selection")
+            lab_selection_window.load_data()
+            self.setCurrentWidget(lab_selection_window)
         elif window_name == "testing":
+            testing_window = self.get_window("testing")
             if data:
-                self.testing_window.load_questions(data)
-            self.setCurrentWidget(self.testing_window)
+                testing_window.load_questions(data)
+            self.setCurrentWidget(testing_window)
         elif window_name == "result":
+            result_window = self.get_window("result")
             if data:
-                self.result_window.display_result(data)
-            self.setCurrentWidget(self.result_window)
+                result_window.display_result(data)
+            self.setCurrentWidget(result_window)
         elif window_name == "login_success":
             self.current_student_id = data.get('student_id')
             if not self.current_student_id:
                 QMessageBox.critical(self, "Ошибка", "Не удалось получить student_id.")
                 return
-            self.lab_selection_window.load_data()
-            self.setCurrentWidget(self.lab_selection_window)
+            lab_selection_window = self.get_window("lab_selection")
+            lab_selection_window.load_data()
+            self.setCurrentWidget(lab_selection_window)
         else:
             pass
 
+    def replay_pending_submissions(self):
+        """Дослать тесты, не отправленные в прошлый запуск из-за обрыва связи."""
+        from submission_journal import SubmissionJournal
+        journal = SubmissionJournal()
+        if journal.pending():
+            journal.start_replay()
+
     def set_student_id(self, student_id):
         self.current_student_id = student_id
 
@@ -136,4 +171,8 @@ if __name__ == "__main__":
     server_port = config.get_server_port()
     
     ex = App()
+    startup_profiler.mark("Окно входа создано")
+    # Отчёт после обработки первых событий, когда окно уже отрисовано
+    QTimer.singleShot(0, lambda: startup_profiler.finish("Окно входа отрисовано"))
+    QTimer.singleShot(0, ex.replay_pending_submissions)
     sys.exit(app.exec_())
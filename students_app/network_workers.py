@@ -2,18 +2,18 @@
 Модуль для работы с сетевыми запросами.
 
 Обеспечивает асинхронное взаимодействие с сервером через TCP-сокеты.
-Использует QRunnable для выполнения запросов в отдельном потоке.
+Использует QRunnable для отправки запросов в отдельном потоке; запросы
+передаются по общему соединению ConnectionManager.
 """
 
 from PyQt5.QtCore import QObject, pyqtSignal, QRunnable
 import socket
-import json
 import logging
 import os
-import struct
 import traceback
 from logger_config import get_logger
 from config_manager import ConfigManager
+from connection_manager import ConnectionManager
 
 logger = get_logger('network')
 
@@ -43,74 +43,22 @@ class Worker(QRunnable):
         self.config = ConfigManager()
 
     def run(self):
+        HOST = self.config.get_server_host()
+        PORT = self.config.get_server_port()
         try:
-            HOST = self.config.get_server_host()
-            PORT = self.config.get_server_port()
-            logger.info(f"Попытка подключения к {HOST}:{PORT}")
-            
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    # Устанавливаем таймаут в 5 секунд
-                    sock.settimeout(5)
-                    logger.info("Создан сокет, пытаемся подключиться...")
-                    sock.connect((HOST, PORT))
-                    logger.info("Подключение успешно установлено")
-                    
-                    # Отправляем данные
-                    request_data = json.dumps(self.request).encode('utf-8')
-                    length_prefix = struct.pack('!I', len(request_data))
-                    logger.info(f"Отправляем данные: {self.request}")
-                    sock.sendall(length_prefix + request_data)
-
-                    # Получаем длину ответа
-                    length_prefix = sock.recv(4)
-                    if not length_prefix:
-                        error_msg = "No length prefix received from server."
-                        logger.error(error_msg)
-                        self.signals.error.emit(error_msg)
-                        return
-                    message_length = struct.unpack('!I', length_prefix)[0]
-                    logger.info(f"Получен префикс длины: {message_length} байт")
-
-                    # Получаем данные
-                    chunks = []
-                    bytes_recd = 0
-                    while bytes_recd < message_length:
-                        chunk = sock.recv(min(message_length - bytes_recd, 2048))
-                        if not chunk:
-                            error_msg = "Connection closed while receiving data."
-                            logger.error(error_msg)
-                            self.signals.error.emit(error_msg)
-                            return
-                        chunks.append(chunk)
-                        bytes_recd += len(chunk)
-                        logger.info(f"Получено {bytes_recd} из {message_length} байт")
-
-                    # Обрабатываем ответ
-                    response = b''.join(chunks)
-                    try:
-                        data = json.loads(response.decode('utf-8'))
-                        logger.info(f"Получен ответ: {data}")
-                        self.signals.finished.emit(data)
-                    except json.JSONDecodeError as e:
-                        error_msg = f"Ошибка декодирования JSON: {e}"
-                        logger.error(f"{error_msg}. Полученные данные: {response}")
-                        self.signals.error.emit(error_msg)
-
-            except ConnectionRefusedError:
-                error_msg = f"Could not connect to server at {HOST}:{PORT}. Connection refused."
-                logger.error(error_msg)
-                self.signals.error.emit(error_msg)
-            except socket.timeout:
-                error_msg = f"Connection timeout while connecting to {HOST}:{PORT}"
-                logger.error(error_msg)
-                self.signals.error.emit(error_msg)
-            except Exception as e:
-                error_msg = f"Error connecting to {HOST}:{PORT}: {str(e)}"
-                logger.error(f"{error_msg}\n{traceback.format_exc()}")
-                self.signals.error.emit(error_msg)
-
+            # Запрос уходит по общему соединению; ответ доставит поток чтения
+            # ConnectionManager в self.signals, поток пула сразу освобождается
+            logger.info(f"Отправляем данные: {self.request}")
+            ConnectionManager().send(self.request, self.signals)
+        except ConnectionRefusedError:
+            error_msg = f"Could not connect to server at {HOST}:{PORT}. Connection refused."
+            logger.error(error_msg)
+            self.signals.error.emit(error_msg)
+        except socket.timeout:
+            error_msg = f"Connection timeout while connecting to {HOST}:{PORT}"
+            logger.error(error_msg)
+            self.signals.error.emit(error_msg)
         except Exception as e:
-            error_msg = f"Unexpected error: {str(e)}"
+            error_msg = f"Error connecting to {HOST}:{PORT}: {str(e)}"
             logger.error(f"{error_msg}\n{traceback.format_exc()}")
-            self.signals.error.emit(error_msg) 
\ No newline at end of file
+            self.signals.error.emit(error_msg)
@@ -0,0 +1,113 @@
+"""
+Кэш декодированных изображений в памяти.
+
+Декодирование PNG с диска при каждом показе вопроса — самая заметная
+задержка при переходах туда и обратно. Кэш хранит уже декодированные и
+уменьшенные под рамку изображения (QImage) по ключу (URL, рамка), общий на
+весь процесс, и вытесняет давно не показанные изображения, когда суммарный
+размер превышает ограничение. Оригиналы попадают в кэш только при
+полноэкранном просмотре.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Ограничение размера кэша по умолчанию, МБ
+DEFAULT_LIMIT_MB = 64
+
+
+def image_bytes(image):
+    """Размер декодированного изображения в памяти."""
+    if hasattr(image, 'sizeInBytes'):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+class PixmapCache:
+    """
+    LRU-кэш декодированных изображений с ограничением по байтам (singleton).
+
+    Хранит QImage: в отличие от QPixmap его можно создавать и читать из
+    фоновых потоков. Доступ защищён блокировкой.
+
+    Attributes:
+        max_bytes (int): Ограничение суммарного размера изображений
+        size_bytes (int): Текущий суммарный размер
+        hits (int): Число попаданий
+        misses (int): Число промахов
+        evictions (int): Число вытесненных изображений
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(PixmapCache, cls).__new__(cls)
+            cls._instance._init_state()
+        return cls._instance
+
+    def _init_state(self):
+        try:
+            from config_manager import ConfigManager
+            limit_mb = ConfigManager().get_pixmap_cache_limit_mb()
+        except (FileNotFoundError, ValueError):
+            limit_mb = DEFAULT_LIMIT_MB
+        self.max_bytes = limit_mb * 1024 * 1024
+        # {(URL, рамка или None для оригинала): QImage} от давних к недавним
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, size=None):
+        """Возвращает изображение для рамки size (None — оригинал) или None."""
+        key = (url, tuple(size) if size else None)
+        with self.lock:
+            image = self.entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, url, size, image):
+        """Сохраняет изображение и вытесняет давно не использованные сверх ограничения."""
+        key = (url, tuple(size) if size else None)
+        cost = image_bytes(image)
+        if cost > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= image_bytes(old)
+            self.entries[key] = image
+            self.size_bytes += cost
+            while self.size_bytes > self.max_bytes:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self.size_bytes -= image_bytes(evicted)
+                self.evictions += 1
+                logger.debug(f"Из кэша изображений вытеснено: {evicted_key[0]}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        """Счётчики кэша для журнала и отладки."""
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+            }
@@ -0,0 +1,93 @@
+"""
+Кэш ответов сервера на клиенте.
+
+Окна повторно запрашивают одни и те же данные: список лабораторных при
+каждом возврате к выбору работы, данные студента, статусы выполнения.
+Успешные ответы на такие запросы хранятся в памяти с временем жизни,
+заданным для каждого действия, и сбрасываются после запросов, которые их
+меняют (например, после submit_test).
+"""
+
+import copy
+import json
+import threading
+import time
+
+from logger_config import get_logger
+
+logger = get_logger('network.response_cache')
+
+# Время жизни ответов в секундах по действиям; остальные действия не кэшируются
+CACHE_TTLS = {
+    'get_lab_works': 30,
+    'get_student_info': 300,
+    'check_lab_completed': 60,
+}
+# Какие кэшированные действия устаревают после успешного выполнения действия
+INVALIDATED_BY = {
+    'submit_test': ('check_lab_completed', 'get_student_info'),
+    'register': ('get_student_info',),
+    'login': ('get_lab_works', 'get_student_info', 'check_lab_completed'),
+}
+
+
+def request_key(request):
+    """Ключ запроса: действие и данные в каноническом виде."""
+    return request.get('action'), json.dumps(request.get('data', {}), sort_keys=True, ensure_ascii=False)
+
+
+class ResponseCache:
+    """
+    Потокобезопасный кэш ответов с временем жизни по действиям.
+
+    Attributes:
+        ttls (dict): Время жизни ответов по действиям
+        hits (int): Число ответов, выданных из кэша
+        misses (int): Число кэшируемых запросов, ушедших на сервер
+    """
+
+    def __init__(self, ttls=None):
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_cacheable(self, request):
+        return request.get('action') in self.ttls
+
+    def get(self, request):
+        """Возвращает копию свежего ответа или None."""
+        if not self.is_cacheable(request):
+            return None
+        key = request_key(request)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            response = entry[1]
+        logger.debug(f"Ответ на {key[0]} взят из кэша")
+        # Окна могут изменять полученный словарь
+        return copy.deepcopy(response)
+
+    def put(self, request, response):
+        """Сохраняет успешный ответ и сбрасывает зависящие от запроса записи."""
+        if response.get('status') != 'success':
+            return
+        action = request.get('action')
+        self.invalidate(*INVALIDATED_BY.get(action, ()))
+        if action in self.ttls:
+            with self.lock:
+                self.entries[request_key(request)] = (time.monotonic() + self.ttls[action], copy.deepcopy(response))
+
+    def invalidate(self, *actions):
+        """Сбрасывает ответы указанных действий (без аргументов — все)."""
+        with self.lock:
+            if not actions:
+                self.entries.clear()
+                return
+            for key in [key for key in self.entries if key[0] in actions]:
+                del self.entries[key]
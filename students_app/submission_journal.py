@@ -0,0 +1,223 @@
+"""
+Журнал отправок тестов на диске.
+
+Перед отправкой ответы записываются в журнал (JSON Lines, с fsync) вместе с
+ключом идемпотентности, сгенерированным клиентом. Если связь пропала, ответы
+не теряются: фоновый поток повторяет неподтверждённые отправки с нарастающей
+задержкой, пока сервер не ответит. Сервер узнаёт повтор по ключу и
+возвращает исходный ответ, не создавая второй записи результата.
+
+Формат строк журнала::
+
+    {"op": "submit", "key": "...", "request": {...}, "created_at": 1700000000.0}
+    {"op": "ack", "key": "..."}
+"""
+
+import os
+import json
+import random
+import threading
+import time
+import uuid
+
+from local_storage import app_dir, local_data_dir
+from logger_config import get_logger
+
+logger = get_logger('network.submission_journal')
+
+JOURNAL_NAME = 'submissions.jsonl'
+REPLAY_MIN_DELAY = 2.0
+REPLAY_MAX_DELAY = 60.0
+REPLAY_TIMEOUT = 15.0
+# Ответы сервера, после которых отправка считается обработанной
+FINAL_STATUSES = ('success', 'retake')
+# Ошибки, которые не исчезнут при повторе. Остальные ошибки ("Внутренняя
+# ошибка сервера", "Ошибка базы данных: database is locked" и т.п.) временные:
+# сервер ничего не записал, и отправка остаётся в журнале до следующей попытки
+PERMANENT_ERRORS = (
+    'Лабораторная работа уже выполнена',
+    'Необходимо предоставить student_id, lab_id и ответы',
+    'Некорректный ключ идемпотентности',
+)
+
+
+def is_final(response):
+    """Возвращает True, если повтор отправки не изменит ответ сервера."""
+    status = response.get('status')
+    if status in FINAL_STATUSES:
+        return True
+    return status == 'error' and response.get('message') in PERMANENT_ERRORS
+
+
+class _Reply:
+    """Приёмник ответа для синхронной отправки через ConnectionManager."""
+
+    class _Signal:
+        def __init__(self, reply, kind):
+            self.reply = reply
+            self.kind = kind
+
+        def emit(self, value):
+            self.reply.result = (self.kind, value)
+            self.reply.done.set()
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.finished = self._Signal(self, 'response')
+        self.error = self._Signal(self, 'error')
+
+
+class SubmissionJournal:
+    """
+    Журнал отправок тестов с фоновой повторной отправкой (singleton).
+
+    Attributes:
+        path (str): Путь к файлу журнала
+        entries (dict): Неподтверждённые отправки {ключ: запись}
+        on_replayed (callable): Вызывается с (запрос, ответ) после успешного повтора
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SubmissionJournal, cls).__new__(cls)
+            cls._instance._init_state()
+        return cls._instance
+
+    def _init_state(self, journal_dir='journal'):
+        self.journal_dir = local_data_dir(journal_dir)
+        self.path = os.path.join(self.journal_dir, JOURNAL_NAME)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.replay_thread = None
+        self.on_replayed = None
+        self.entries = self._load(self.path)
+        # Прежние версии хранили журнал рядом с программой
+        legacy_path = os.path.join(app_dir(), journal_dir, JOURNAL_NAME)
+        migrate = os.path.abspath(legacy_path) != os.path.abspath(self.path) and os.path.exists(legacy_path)
+        if migrate:
+            for key, record in self._load(legacy_path).items():
+                self.entries.setdefault(key, record)
+        self._compact()
+        if migrate:
+            try:
+                os.remove(legacy_path)
+            except OSError as e:
+                logger.error(f"Не удалось удалить прежний журнал отправок: {str(e)}")
+
+    def _load(self, path):
+        entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка при аварийном завершении
+                        continue
+                    if record.get('op') == 'submit':
+                        entries[record['key']] = record
+                    elif record.get('op') == 'ack':
+                        entries.pop(record.get('key'), None)
+        except OSError:
+            pass
+        if entries:
+            logger.info(f"В журнале неотправленных тестов: {len(entries)}")
+        return entries
+
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        """Переписывает журнал, оставляя только неподтверждённые отправки."""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in self.entries.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Ошибка при сжатии журнала отправок: {str(e)}")
+
+    def record(self, request):
+        """
+        Записывает отправку в журнал до её передачи на сервер.
+
+        Добавляет в данные запроса ключ идемпотентности.
+
+        Returns:
+            str: Ключ идемпотентности
+        """
+        key = uuid.uuid4().hex
+        request['data']['idempotency_key'] = key
+        record = {'op': 'submit', 'key': key, 'request': request, 'created_at': time.time()}
+        with self.lock:
+            self._append(record)
+            self.entries[key] = record
+        logger.info(f"Отправка теста {key} записана в журнал")
+        return key
+
+    def acknowledge(self, key):
+        """Отмечает отправку как обработанную сервером."""
+        with self.lock:
+            if self.entries.pop(key, None) is None:
+                return
+            self._append({'op': 'ack', 'key': key})
+            if not self.entries:
+                self._compact()
+        logger.info(f"Отправка теста {key} подтверждена сервером")
+
+    def pending(self):
+        with self.lock:
+            return list(self.entries.values())
+
+    def start_replay(self):
+        """Запускает фоновую отправку неподтверждённых записей (однократно)."""
+        if self.replay_thread is None:
+            self.replay_thread = threading.Thread(target=self._replay_loop, name="pselu-journal-replay", daemon=True)
+            self.replay_thread.start()
+        self.wakeup.set()
+
+    def _replay_loop(self):
+        from connection_manager import ConnectionManager
+
+        delay = REPLAY_MIN_DELAY
+        timeout = None
+        while True:
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+            failed = False
+            # Записи отправляются по одной: после восстановления связи сервер
+            # не получает все накопленные повторы разом
+            for record in self.pending():
+                reply = _Reply()
+                try:
+                    ConnectionManager().send(record['request'], reply)
+                except OSError as e:
+                    reply.error.emit(str(e))
+                if not reply.done.wait(REPLAY_TIMEOUT) or reply.result[0] == 'error':
+                    failed = True
+                    break
+                response = reply.result[1]
+                if not is_final(response):
+                    logger.warning(f"Сервер не принял отправку {record['key']}: {response.get('message')}")
+                    failed = True
+                    break
+                self.acknowledge(record['key'])
+                if self.on_replayed:
+                    self.on_replayed(record['request'], response)
+            if failed:
+                # Нарастающая задержка со случайной добавкой, чтобы клиенты
+                # класса не повторяли отправку одновременно
+                timeout = delay + random.uniform(0, delay / 2)
+                logger.info(f"Повторная отправка тестов через {timeout:.1f} с, в журнале: {len(self.entries)}")
+                delay = min(delay * 2, REPLAY_MAX_DELAY)
+            else:
+                delay = REPLAY_MIN_DELAY
+                timeout = None
@@ -11,6 +11,8 @@ from PyQt5.QtCore import Qt, QThreadPool
 from PyQt5.QtGui import QPixmap
 import sys
 import os
+import json
+import hashlib
 from network_workers import Worker
 from config_manager import ConfigManager
 from logger_config import get_logger
@@ -114,6 +116,10 @@ class RegistrationWindow(QWidget):
                 'year': year
             }
         }
+        # Ключ зависит только от данных формы: повторное нажатие кнопки сервер
+        # узнаёт и не выполняет регистрацию второй раз
+        form = json.dumps(request['data'], sort_keys=True, ensure_ascii=False)
+        request['data']['idempotency_key'] = hashlib.sha256(form.encode('utf-8')).hexdigest()[:32]
 
         worker = Worker(request)
         worker.signals.finished.connect(self.handle_register_response)
@@ -7,16 +7,15 @@
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, QLabel, QMessageBox, 
-    QHBoxLayout, QRadioButton, QButtonGroup, QGridLayout, QDialog, QMainWindow, QApplication
+    QHBoxLayout, QRadioButton, QButtonGroup, QGridLayout, QDialog, QMainWindow, QApplication,
+    QStackedWidget
 )
 from PyQt5.QtCore import Qt, QTimer, QThreadPool
-from PyQt5.QtGui import QPixmap, QFont
+from PyQt5.QtGui import QPixmap
 import os
 import random
-import requests
 import logging
 import re
-import uuid
 import sys
 import traceback
 from urllib.parse import urlparse
@@ -24,7 +23,10 @@ from urllib.parse import urlparse
 from logger_config import get_logger
 from config_manager import ConfigManager
 from network_workers import Worker
-from image_loader import ImageCache
+from image_prefetch import ImagePrefetcher, variant_url
+from pixmap_cache import PixmapCache
+from lab_bundle_cache import LabBundleCache
+from submission_journal import SubmissionJournal, is_final
 
 # Добавляем путь к корневой директории проекта в PYTHONPATH
 if __name__ == "__main__":
@@ -32,11 +34,13 @@ if __name__ == "__main__":
     if project_root not in sys.path:
         sys.path.append(project_root)
 
-from image_loader import get_cached_image
-
 # Настраиваем логирование
 logger = get_logger('windows.testing')
 
+# Рамки отображения изображений; сервер отдаёт заранее уменьшенные варианты под них
+QUESTION_IMAGE_SIZE = (400, 300)
+ANSWER_IMAGE_SIZE = (300, 200)
+
 def parse_images(text: str, server_url: str = None) -> tuple[str, list[str]]:
     if server_url is None:
         # Загружаем настройки сервера из конфигурационного файла
@@ -59,74 +63,104 @@ def parse_images(text: str, server_url: str = None) -> tuple[str, list[str]]:
     logger.info(f"Найденные URL изображений: {urls}")
     return text_without_images, urls
 
-def load_image_to_pixmap(url):
-    """Загружает изображение и создает QPixmap."""
-    logger.info(f"Попытка загрузки изображения: {url}")
-    cache = ImageCache()
-    
-    # Сначала пробуем получить QPixmap из кэша
-    pixmap = cache.get(url)
-    if pixmap and not pixmap.isNull():
-        logger.info("Изображение успешно загружено из кэша")
-        return pixmap
-        
-    # Если в кэше нет, загружаем и сохраняем
-    try:
-        logger.info("Загрузка изображения с сервера")
-        parsed_url = urlparse(url)
-        if parsed_url.hostname in ['localhost', '127.0.0.1'] or parsed_url.hostname.startswith('192.168.'):
-            response = requests.get(url, verify=False)
-        else:
-            response = requests.get(url)
-        response.raise_for_status()
-        
-        # Создаем QPixmap из полученных данных
-        pixmap = QPixmap()
-        pixmap.loadFromData(response.content)
-        
-        if not pixmap.isNull():
-            # Сохраняем в кэш
-            cache.save(url, response.content)
-            logger.info("Изображение успешно загружено и сохранено в кэш")
-            return pixmap
-        else:
-            logger.error("Ошибка: создан пустой QPixmap")
-            return None
-            
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке изображения: {str(e)}")
-        return None
+class QuestionPage(QWidget):
+    """
+    Страница одного вопроса попытки.
+
+    Страницы всех вопросов создаются один раз при загрузке попытки и
+    переключаются в QStackedWidget, поэтому выбранный ответ хранится в
+    собственной группе радиокнопок страницы, а после создания меняются только
+    заглушки изображений.
 
-class ImageViewer(QDialog):
-    def __init__(self, image_path):
+    Attributes:
+        question (dict): Данные вопроса
+        answer_group (QButtonGroup): Радиокнопки вариантов ответа
+        image_items (list): Изображения страницы — пары (URL, рамка)
+    """
+    def __init__(self, question, number, total, show_image):
         super().__init__()
-        self.setWindowTitle("Просмотр изображения")
-        self.setMinimumSize(600, 600)
-        layout = QVBoxLayout()
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        # Загружаем изображение
-        try:
-            if os.path.exists(image_path):
-                pixmap = QPixmap(image_path)
-                if not pixmap.isNull():
-                    pixmap = pixmap.scaled(
-                        600, 600, 
-                        Qt.AspectRatioMode.KeepAspectRatio, 
-                        Qt.TransformationMode.SmoothTransformation
-                    )
-                    self.image_label.setPixmap(pixmap)
-                else:
-                    self.image_label.setText("Ошибка: изображение повреждено")
-            else:
-                self.image_label.setText("Ошибка: файл не найден")
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке изображения: {str(e)}")
-            self.image_label.setText(f"Ошибка загрузки: {str(e)}")
-        
-        layout.addWidget(self.image_label)
-        self.setLayout(layout)
+        self.question = question
+        self.image_items = []
+        layout = QVBoxLayout(self)
+        layout.setSpacing(20)
+
+        # Заголовок вопроса
+        category_label = QLabel(f"{question.get('category', '')} ({number}/{total})")
+        category_label.setStyleSheet("""
+            font-size: 16px;
+            font-weight: bold;
+            color: #2c3e50;
+            margin: 10px;
+        """)
+        category_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(category_label)
+
+        # Текст вопроса
+        question_label = QLabel(question.get('question_text', '').strip())
+        question_label.setWordWrap(True)
+        question_label.setStyleSheet("""
+            font-size: 14px;
+            color: #34495e;
+            margin: 10px;
+        """)
+        question_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(question_label)
+
+        # Изображения вопроса
+        question_images = question.get('question_images', [])
+        if question_images:
+            question_images_layout = QHBoxLayout()
+            for url in question_images:
+                image_label = QLabel()
+                image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                image_label.setCursor(Qt.CursorShape.PointingHandCursor)
+                show_image(image_label, url, QUESTION_IMAGE_SIZE)
+                self.image_items.append((url, QUESTION_IMAGE_SIZE))
+                question_images_layout.addWidget(image_label)
+            layout.addLayout(question_images_layout)
+
+        # Варианты ответов в два ряда по два
+        self.answer_group = QButtonGroup(self)
+        answers_layout = QGridLayout()
+        answers_layout.setHorizontalSpacing(20)
+        answers_layout.setVerticalSpacing(20)
+        for i, answer in enumerate(question['answers'], 1):
+            answer_container = QVBoxLayout()
+
+            # Радиокнопка и заголовок варианта
+            header_container = QHBoxLayout()
+            radio = QRadioButton()
+            self.answer_group.addButton(radio, i - 1)
+            header_container.addWidget(radio)
+            answer_header = QLabel(f"Вариант {i}")
+            answer_header.setStyleSheet("font-weight: bold; color: #444;")
+            header_container.addWidget(answer_header)
+            header_container.addStretch()
+            answer_container.addLayout(header_container)
+
+            # Если есть текст ответа, добавляем его
+            if answer['text']:
+                text_label = QLabel(answer['text'])
+                text_label.setWordWrap(True)
+                answer_container.addWidget(text_label)
+
+            # Изображения ответа
+            for url in answer['images']:
+                image_label = QLabel()
+                image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                image_label.setCursor(Qt.CursorShape.PointingHandCursor)
+                show_image(image_label, url, ANSWER_IMAGE_SIZE)
+                self.image_items.append((url, ANSWER_IMAGE_SIZE))
+                answer_container.addWidget(image_label)
+
+            answers_layout.addLayout(answer_container, (i - 1) // 2, (i - 1) % 2)
+        layout.addLayout(answers_layout)
+        layout.addStretch()
+
+    def chosen_answer(self):
+        """Номер выбранного варианта (с 1) строкой или None."""
+        chosen = self.answer_group.checkedId()
+        return str(chosen + 1) if chosen >= 0 else None
 
 class TestingWindow(QMainWindow):
     """
@@ -176,6 +210,13 @@ class TestingWindow(QMainWindow):
         self.server_host = config.get_server_host()
         self.server_port = config.get_server_port()
         self.static_port = config.get_static_port()
+        self.lab_cache = LabBundleCache()
+
+        # Изображения готовятся в фоне, на экране до их прихода — заглушки
+        self.prefetcher = ImagePrefetcher(self)
+        self.prefetcher.image_ready.connect(self.on_image_ready)
+        self.prefetcher.image_failed.connect(self.on_image_failed)
+        self.image_placeholders = {}
 
     def init_ui(self):
         """Инициализация пользовательского интерфейса."""
@@ -215,30 +256,9 @@ class TestingWindow(QMainWindow):
         
         self.layout.addLayout(top_panel)
         
-        # Заголовок текущего вопроса
-        self.question_category_label = QLabel()
-        self.question_category_label.setStyleSheet("""
-            font-size: 16px;
-            font-weight: bold;
-            color: #2c3e50;
-            margin: 10px;
-        """)
-        self.question_category_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.layout.addWidget(self.question_category_label)
-        
-        # Текст вопроса
-        self.question_label = QLabel()
-        self.question_label.setWordWrap(True)
-        self.question_label.setStyleSheet("""
-            font-size: 14px;
-            color: #34495e;
-            margin: 10px;
-        """)
-        self.question_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.layout.addWidget(self.question_label)
-
-        # Добавляем растяжку перед нижней панелью
-        self.layout.addStretch()
+        # Страницы вопросов попытки
+        self.pages = QStackedWidget()
+        self.layout.addWidget(self.pages, 1)
         
         # Нижняя панель с навигацией
         bottom_panel = QHBoxLayout()
@@ -304,13 +324,11 @@ class TestingWindow(QMainWindow):
         """Переходит к вопросу с указанным индексом."""
         if 0 <= index < len(self.selected_questions):
             # Сохраняем текущий ответ пользователя
-            chosen = self.answer_group.checkedId()
-            if chosen >= 0:
-                qid = str(self.selected_questions[self.current_question]['id'])
-                self.user_answers[qid] = str(chosen + 1)
+            self.save_current_answer()
             
             self.current_question = index
-            self.display_question(self.selected_questions[index])
+            self.pages.setCurrentIndex(index)
+            self.request_page_images(index)
             self.update_navigation_buttons()
             
             # Обновляем состояние кнопки "Следующий вопрос"
@@ -348,226 +366,128 @@ class TestingWindow(QMainWindow):
                     }
                 """)
         
-    def display_question(self, question_data):
-        """Отображает вопрос и варианты ответов."""
-        logger.debug(f"Данные вопроса: {question_data}")
-        
-        # Очищаем все предыдущие виджеты
-        self.clear_question_widgets()
-        
-        # Обновляем заголовок вопроса
-        self.question_category_label.setText(f"{question_data.get('category', '')} ({self.current_question + 1}/{len(self.selected_questions)})")
-        
-        # Отображаем текст вопроса
-        question_text = question_data.get('question_text', '').strip()
-        logger.debug(f"Текст вопроса: {question_text}")
-        self.question_label.setText(question_text)
-        
-        # Отображаем изображения вопроса
-        question_images = question_data.get('question_images', [])
-        logger.debug(f"URL изображений вопроса: {question_images}")
-        
-        if question_images:
-            logger.debug("Найдены изображения для отображения")
-            question_images_layout = QHBoxLayout()
-            question_images_layout.setObjectName("question_images_layout")
-            
-            for url in question_images:
-                logger.debug(f"Обработка изображения: {url}")
-                image_container = QWidget()
-                image_layout = QVBoxLayout(image_container)
-                
-                image_label = QLabel()
-                image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                image_label.setCursor(Qt.CursorShape.PointingHandCursor)
-                
-                pixmap = load_image_to_pixmap(url)
-                if pixmap and not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(
-                        400, 300,
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation
-                    )
-                    image_label.setPixmap(scaled_pixmap)
-                    # Сохраняем оригинальный pixmap для просмотра
-                    image_label.original_pixmap = pixmap
-                    image_label.mousePressEvent = lambda _, label=image_label: self.show_full_image(label)
-                else:
-                    image_label.setText("Ошибка загрузки изображения")
-                
-                image_layout.addWidget(image_label)
-                question_images_layout.addWidget(image_container)
-            
-            self.layout.insertLayout(2, question_images_layout)
-            self.question_images_layout = question_images_layout
-        
-        # Создаем группу для радиокнопок
-        self.answer_group = QButtonGroup()
-        
-        # Создаем layout для ответов
-        answers_layout = QVBoxLayout()
-        answers_layout.setObjectName("answers_layout")
-        
-        # Создаем два горизонтальных ряда для вариантов ответов
-        top_row = QHBoxLayout()
-        bottom_row = QHBoxLayout()
-        
-        for i, answer in enumerate(question_data['answers'], 1):
-            answer_container = QVBoxLayout()
-            
-            # Создаем горизонтальный контейнер для радиокнопки и заголовка
-            header_container = QHBoxLayout()
-            
-            # Добавляем радиокнопку
-            radio = QRadioButton()
-            self.answer_group.addButton(radio, i-1)
-            header_container.addWidget(radio)
-            
-            # Добавляем заголовок варианта ответа
-            answer_header = QLabel(f"Вариант {i}")
-            answer_header.setStyleSheet("font-weight: bold; color: #444;")
-            header_container.addWidget(answer_header)
-            header_container.addStretch()
-            
-            answer_container.addLayout(header_container)
-            
-            # Если есть текст ответа, добавляем его
-            if answer['text']:
-                text_label = QLabel(answer['text'])
-                text_label.setWordWrap(True)
-                answer_container.addWidget(text_label)
-            
-            # Добавляем изображения ответа
-            for url in answer['images']:
-                image_label = QLabel()
-                image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                image_label.setCursor(Qt.CursorShape.PointingHandCursor)
-                
-                pixmap = load_image_to_pixmap(url)
-                if pixmap and not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(
-                        300, 200,
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation
-                    )
-                    image_label.setPixmap(scaled_pixmap)
-                    # Сохраняем оригинальный pixmap для просмотра
-                    image_label.original_pixmap = pixmap
-                    image_label.mousePressEvent = lambda _, label=image_label: self.show_full_image(label)
-                else:
-                    image_label.setText("Ошибка загрузки изображения")
-                
-                answer_container.addWidget(image_label)
-            
-            # Добавляем варианты в соответствующие ряды
-            if i <= 2:
-                top_row.addLayout(answer_container)
-            else:
-                bottom_row.addLayout(answer_container)
-            
-            # Добавляем разделитель между вариантами в ряду
-            if i == 1 or i == 3:
-                spacer = QLabel()
-                spacer.setFixedWidth(20)
-                if i == 1:
-                    top_row.addWidget(spacer)
-                else:
-                    bottom_row.addWidget(spacer)
-        
-        answers_layout.addLayout(top_row)
-        answers_layout.addSpacing(20)  # Отступ между рядами
-        answers_layout.addLayout(bottom_row)
-        
-        self.layout.insertLayout(3, answers_layout)
-        self.answers_layout = answers_layout
-        
-        # Восстанавливаем ответ пользователя, если он был
-        qid = str(question_data['id'])
-        if qid in self.user_answers:
-            answer_index = int(self.user_answers[qid])
-            if 0 <= answer_index < len(question_data['answers']):
-                self.answer_group.button(answer_index).setChecked(True)
-
-    def clear_question_widgets(self):
-        """Очищает все виджеты текущего вопроса."""
-        # Очищаем изображения вопроса
-        if hasattr(self, 'question_images_layout'):
-            while self.question_images_layout.count():
-                item = self.question_images_layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
-            self.layout.removeItem(self.question_images_layout)
-        
-        # Очищаем варианты ответов
-        if hasattr(self, 'answers_layout'):
-            while self.answers_layout.count():
-                item = self.answers_layout.takeAt(0)
-                if item.layout():
-                    while item.layout().count():
-                        sub_item = item.layout().takeAt(0)
-                        if sub_item.widget():
-                            sub_item.widget().deleteLater()
-                        elif sub_item.layout():
-                            while sub_item.layout().count():
-                                sub_sub_item = sub_item.layout().takeAt(0)
-                                if sub_sub_item.widget():
-                                    sub_sub_item.widget().deleteLater()
-            self.layout.removeItem(self.answers_layout)
-        
-        # Очищаем группу радиокнопок
-        if hasattr(self, 'answer_group'):
-            for button in self.answer_group.buttons():
-                self.answer_group.removeButton(button)
-                button.deleteLater()
-
-    def remove_question_images_layout(self):
-        for i in range(self.layout.count()):
-            item = self.layout.itemAt(i)
-            if isinstance(item, QHBoxLayout) and item.objectName() == "question_images_layout":
-                while item.count():
-                    sub_item = item.takeAt(0)
-                    w = sub_item.widget()
-                    if w:
-                        w.deleteLater()
-                self.layout.removeItem(item)
-                break
+    def build_pages(self):
+        """Создаёт страницы всех вопросов попытки (один раз на попытку)."""
+        self.clear_pages()
+        total = len(self.selected_questions)
+        for number, question in enumerate(self.selected_questions, 1):
+            logger.debug(f"Данные вопроса: {question}")
+            page = QuestionPage(question, number, total, self.show_image)
+            self.pages.addWidget(page)
+
+    def clear_pages(self):
+        """Удаляет страницы предыдущей попытки."""
+        # Заглушки удаляемых страниц больше не заполняются
+        self.image_placeholders.clear()
+        while self.pages.count():
+            page = self.pages.widget(0)
+            self.pages.removeWidget(page)
+            page.deleteLater()
+
+    def save_current_answer(self):
+        """Запоминает ответ на текущий вопрос, если он выбран."""
+        page = self.pages.widget(self.current_question)
+        if page is None:
+            return
+        answer = page.chosen_answer()
+        if answer is not None:
+            self.user_answers[str(page.question['id'])] = answer
+
+    def show_image(self, image_label, url, size):
+        """
+        Показывает изображение в image_label, не дожидаясь загрузки.
+
+        Готовое изображение ставится сразу, иначе показывается заглушка,
+        которую заменит on_image_ready. Загрузку здесь не запрашивает: все
+        изображения попытки уже загружаются пакетом, вне очереди
+        запрашиваются только изображения показанной страницы
+        (request_page_images).
+        """
+        # Оригинал загружается только при полноэкранном просмотре
+        image_label.image_url = url
+        image_label.image_size = size
+        image_label.mousePressEvent = lambda _, label=image_label: self.show_full_image(label)
+        image = self.prefetcher.get(url, size)
+        if image is not None:
+            image_label.setPixmap(QPixmap.fromImage(image))
+            return
+        key = variant_url(url, size)
+        if key in self.prefetcher.failed:
+            image_label.setText("Ошибка загрузки изображения")
+        else:
+            image_label.setText("Загрузка изображения...")
+            self.image_placeholders.setdefault(key, []).append(image_label)
+
+    def request_page_images(self, index):
+        """Запрашивает вне очереди ещё не готовые изображения показанной страницы."""
+        page = self.pages.widget(index)
+        if page is None:
+            return
+        for url, size in page.image_items:
+            if self.prefetcher.get(url, size) is None:
+                self.prefetcher.request(url, size)
+
+    def on_image_ready(self, key, image):
+        for image_label in self.image_placeholders.pop(key, []):
+            image_label.setPixmap(QPixmap.fromImage(image))
+
+    def on_image_failed(self, key):
+        for image_label in self.image_placeholders.pop(key, []):
+            image_label.setText("Ошибка загрузки изображения")
 
     def show_full_image(self, label):
-        """Показывает изображение в полном размере."""
-        if hasattr(label, 'original_pixmap'):
-            dialog = QDialog(self)
-            dialog.setWindowTitle("Просмотр изображения")
-            layout = QVBoxLayout()
-            
-            image_label = QLabel()
-            image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            
-            # Масштабируем изображение под размер экрана
-            screen = QApplication.primaryScreen().geometry()
-            scaled_pixmap = label.original_pixmap.scaled(
-                screen.width() * 0.8,
-                screen.height() * 0.8,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            image_label.setPixmap(scaled_pixmap)
-            
-            layout.addWidget(image_label)
-            dialog.setLayout(layout)
-            dialog.exec_()
+        """
+        Показывает изображение в полном размере.
+
+        Оригинал загружается в пуле ImagePrefetcher и подставляется в окно
+        просмотра сигналом image_ready; до этого показывается вариант со
+        страницы вопроса.
+        """
+        if not hasattr(label, 'image_url'):
+            return
+        # Масштабируем изображение под размер экрана
+        screen = QApplication.primaryScreen().geometry()
+        size = (int(screen.width() * 0.8), int(screen.height() * 0.8))
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Просмотр изображения")
+        layout = QVBoxLayout()
+        image_label = QLabel()
+        image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(image_label)
+        dialog.setLayout(layout)
+
+        key = None
+        image = self.prefetcher.get(label.image_url, size)
+        if image is None:
+            # Оригинал загружается только здесь, в кэше остаётся его вариант под экран
+            key = self.prefetcher.request_original(label.image_url, size)
+            self.image_placeholders.setdefault(key, []).append(image_label)
+            image = self.prefetcher.get(label.image_url, label.image_size)
+        if image is not None:
+            image_label.setPixmap(QPixmap.fromImage(image))
+        else:
+            image_label.setText("Загрузка изображения...")
+        dialog.exec_()
+
+        # Окно закрыли раньше, чем загрузился оригинал
+        placeholders = self.image_placeholders.get(key, [])
+        if image_label in placeholders:
+            placeholders.remove(image_label)
+            if not placeholders:
+                del self.image_placeholders[key]
+        dialog.deleteLater()
 
     def next_question(self):
         """Переходит к следующему вопросу или завершает тест."""
         # Сохраняем ответ на текущий вопрос, если он был
-        chosen = self.answer_group.checkedId()
-        if chosen >= 0:
-            qid = str(self.selected_questions[self.current_question]['id'])
-            self.user_answers[qid] = str(chosen + 1)
+        self.save_current_answer()
         
         # Переходим к следующему вопросу
         self.current_question += 1
         if self.current_question < len(self.selected_questions):
-            self.display_question(self.selected_questions[self.current_question])
+            self.pages.setCurrentIndex(self.current_question)
+            self.request_page_images(self.current_question)
             self.update_navigation_buttons()
             
             # Обновляем состояние кнопки "Следующий вопрос"
@@ -594,10 +514,7 @@ class TestingWindow(QMainWindow):
             self.timer.stop()
 
         # Сохраняем ответ на текущий вопрос, если он был
-        chosen = self.answer_group.checkedId()
-        if 0 <= self.current_question < len(self.selected_questions) and chosen >= 0:
-            qid = str(self.selected_questions[self.current_question]['id'])
-            self.user_answers[qid] = str(chosen + 1)
+        self.save_current_answer()
 
         # Проверяем наличие ID студента
         sid = self.get_student_id()
@@ -640,12 +557,28 @@ class TestingWindow(QMainWindow):
                 'answers': self.user_answers
             }
         }
+        # Ответы сохраняются на диск до отправки и не теряются при обрыве связи
+        key = SubmissionJournal().record(request)
         worker = Worker(request)
-        worker.signals.finished.connect(self.handle_submit_test_response)
+        # Ключ привязан к отправке: ответ на неё подтверждает именно эту запись журнала
+        worker.signals.finished.connect(lambda response, key=key: self.handle_submit_test_response(response, key))
         worker.signals.error.connect(self.handle_submit_test_error)
         self.thread_pool.start(worker)
 
-    def handle_submit_test_response(self, response):
+    def handle_submit_test_response(self, response, key):
+        if not is_final(response):
+            # Временная ошибка сервера: ответы остаются в журнале и будут отправлены повторно
+            logger.error(f"Сервер не принял результаты теста: {response.get('message')}")
+            SubmissionJournal().start_replay()
+            QMessageBox.warning(
+                self,
+                "Ошибка",
+                f"{response.get('message', 'Ошибка при отправке результатов')}\n\n"
+                "Ответы сохранены и будут отправлены автоматически."
+            )
+            self.switch_window("lab_selection")
+            return
+        SubmissionJournal().acknowledge(key)
         if response.get('status') == 'success':
             score = response['data']['score']
             total = response['data']['total_questions']
@@ -660,8 +593,15 @@ class TestingWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", response.get('message', 'Ошибка при отправке результатов'))
 
     def handle_submit_test_error(self, error_message):
-        QMessageBox.critical(self, "Ошибка", error_message)
         logger.error(f"Ошибка при отправке результатов теста: {error_message}")
+        SubmissionJournal().start_replay()
+        QMessageBox.warning(
+            self,
+            "Нет связи с сервером",
+            f"{error_message}\n\nОтветы сохранены и будут отправлены автоматически, "
+            "когда связь с сервером восстановится."
+        )
+        self.switch_window("lab_selection")
 
     def update_timer_label(self):
         minutes = self.remaining_time // 60
@@ -677,14 +617,22 @@ class TestingWindow(QMainWindow):
             QMessageBox.warning(self, "Время вышло", "Время на выполнение теста закончилось!")
             self.submit_test()
 
-    def load_questions(self, lab_id):
+    @property
+    def server_key(self):
+        """Адрес сервера, под которым хранятся закэшированные вопросы."""
+        return f"{self.server_host}:{self.server_port}"
+
+    def load_questions(self, lab_id, use_cache=True):
         try:
             if not self.get_student_id():
                 QMessageBox.critical(self, "Ошибка", "Не удалось получить student_id.")
                 self.switch_window("lab_selection")
                 return
             self.lab_id = lab_id
-            request = {'action': 'get_questions', 'data': {'lab_id': lab_id}}
+            if use_cache:
+                request = {'action': 'sync_questions', 'data': self.lab_cache.sync_request(self.server_key, lab_id)}
+            else:
+                request = {'action': 'sync_questions', 'data': {'lab_id': lab_id}}
             worker = Worker(request)
             worker.signals.finished.connect(self.handle_load_questions_response)
             worker.signals.error.connect(self.handle_load_questions_error)
@@ -696,6 +644,15 @@ class TestingWindow(QMainWindow):
 
     def handle_load_questions_response(self, response):
         try:
+            if response.get('status') == 'success':
+                bundle = self.lab_cache.apply_sync(self.server_key, self.lab_id, response['data'])
+                if bundle is None:
+                    # Сохранённый набор пропал или повреждён — запрашиваем полностью
+                    logger.warning("Нет сохранённого набора вопросов, повторный запрос")
+                    self.load_questions(self.lab_id, use_cache=False)
+                    return
+                response = {'status': 'success', 'data': bundle}
+
             if response.get('status') == 'success':
                 all_questions = response['data']['questions']
                 logger.debug(f"Получены вопросы: {all_questions}")
@@ -768,10 +725,14 @@ class TestingWindow(QMainWindow):
                     self.timer.start(1000)  # Update every second
                     self.update_timer_label()
 
-                    # Display first question
+                    self.prefetch_images()
+
+                    # Build all question pages once and show the first one
                     self.current_question = 0
                     self.user_answers.clear()
-                    self.display_question(self.selected_questions[self.current_question])
+                    self.build_pages()
+                    self.pages.setCurrentIndex(self.current_question)
+                    self.request_page_images(self.current_question)
                     self.update_navigation_buttons()
                 except Exception as e:
                     logger.error(f"Ошибка при обработке вопросов: {str(e)}\n{traceback.format_exc()}")
@@ -787,15 +748,41 @@ class TestingWindow(QMainWindow):
             QMessageBox.critical(self, "Ошибка", f"Неожиданная ошибка: {str(e)}")
             self.switch_window("lab_selection")
 
+    def prefetch_images(self):
+        """
+        Запускает фоновую загрузку и декодирование изображений всех выбранных
+        вопросов, чтобы переход между вопросами не обращался к сети.
+        """
+        items = []
+        for question in self.selected_questions:
+            items.extend((url, QUESTION_IMAGE_SIZE) for url in question.get('question_images', []))
+            for answer in question.get('answers', []):
+                items.extend((url, ANSWER_IMAGE_SIZE) for url in answer.get('images', []))
+        if not items:
+            return
+
+        # Пакет запрашивается у того же сервера, что отдаёт изображения
+        parsed_url = urlparse(items[0][0])
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        question_ids = [q['id'] for q in self.selected_questions]
+        self.prefetcher.start(base_url, question_ids, items)
+        logger.info(f"Кэш изображений в памяти: {PixmapCache().stats()}")
+
     def update_navigation_buttons(self):
         """Обновляет кнопки навигации по вопросам."""
-        for btn in self.nav_buttons:
-            btn.deleteLater()
-        self.nav_buttons.clear()
-
-        for i in range(len(self.selected_questions)):
-            btn = QPushButton(str(i + 1))
-            btn.setCheckable(True)
+        # Кнопки пересоздаются только при смене числа вопросов, иначе меняется стиль
+        if len(self.nav_buttons) != len(self.selected_questions):
+            for btn in self.nav_buttons:
+                btn.deleteLater()
+            self.nav_buttons.clear()
+            for i in range(len(self.selected_questions)):
+                btn = QPushButton(str(i + 1))
+                btn.setCheckable(True)
+                btn.clicked.connect(lambda checked, idx=i: self.go_to_question(idx))
+                self.nav_buttons.append(btn)
+                self.nav_layout.addWidget(btn)
+
+        for i, btn in enumerate(self.nav_buttons):
             btn.setChecked(i == self.current_question)
             
             # Определяем стиль кнопки в зависимости от состояния
@@ -821,10 +808,6 @@ class TestingWindow(QMainWindow):
                 }}
             """)
             
-            btn.clicked.connect(lambda checked, idx=i: self.go_to_question(idx))
-            self.nav_buttons.append(btn)
-            self.nav_layout.addWidget(btn)
-            
         # Обновляем состояние кнопок prev/next
         self.prev_button.setEnabled(self.current_question > 0)
         self.next_button.setEnabled(self.current_question < len(self.selected_questions) - 1)
@@ -1,10 +1,13 @@
 import sqlite3
 import os
 from sqlite3 import Error
+from server.schema import ensure_schema
 
 # Get the absolute path to the database
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = os.path.join(BASE_DIR, "mgtu_app.db")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+IMAGES_DIR = os.path.join(STATIC_DIR, "images")
 
 def create_connection(db_file):
     conn = None
@@ -20,9 +23,10 @@ def initialize_db():
         os.makedirs(os.path.dirname(DB_FILE))
         print(f"Folder '{os.path.dirname(DB_FILE)}' created.")
     
-    # Если база данных уже существует, ничего не делаем
+    # Если база данных уже существует, только досоздаём служебные таблицы
     if os.path.exists(DB_FILE):
         print(f"Database already exists at '{DB_FILE}'")
+        upgrade_db()
         return
 
     conn = create_connection(DB_FILE)
@@ -70,16 +74,19 @@ def initialize_db():
                 student_id INTEGER,
                 FOREIGN KEY (student_id) REFERENCES students (id)
             );""")
-        cursor.execute("""CREATE TABLE IF NOT EXISTS images (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                hash TEXT NOT NULL UNIQUE
-            );""")
         conn.commit()
+        ensure_schema(conn, IMAGES_DIR)
         conn.close()
         print(f"Database initialized at '{DB_FILE}'.")
     else:
         print("Ошибка! Не удалось создать соединение с базой данных.")
 
+def upgrade_db():
+    """Создаёт в существующей базе таблицы, появившиеся в новых версиях."""
+    conn = create_connection(DB_FILE)
+    if conn is not None:
+        ensure_schema(conn, IMAGES_DIR)
+        conn.close()
+
 if __name__ == "__main__":
     initialize_db()
@@ -1,16 +1,19 @@
+import os
 import sys
+
+# Общие модули приложений (common/) лежат в корне репозитория
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import startup_profiler
+startup_profiler.install("PSELP_PROFILE_STARTUP")
+
 import logging
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication, QStackedWidget
 from PyQt5.QtGui import QIcon
 from database import initialize_db
 from windows.main_menu import MainMenu
-from windows.lab_management import LabManagement
-from windows.performance_monitor import PerformanceMonitor
-from windows.import_export import ImportExport
-from windows.questions_management import QuestionsManagement
-from windows.server_control import ServerControl
 from styles import MAIN_STYLE
-import os
+import multiprocessing
 
 logging.basicConfig(
     filename='teacher_app.log',
@@ -19,6 +22,31 @@ logging.basicConfig(
     level=logging.INFO
 )
 
+# Окна (и их зависимости: matplotlib, сервер, импорт/экспорт) создаются при
+# первом переходе к ним, чтобы главное меню появлялось без задержки
+def create_lab_management(switch_window):
+    from windows.lab_management import LabManagement
+    return LabManagement(switch_window)
+
+def create_performance_monitor(switch_window):
+    from windows.performance_monitor import PerformanceMonitor
+    return PerformanceMonitor(switch_window)
+
+def create_import_export(switch_window):
+    from windows.import_export import ImportExport
+    return ImportExport(switch_window)
+
+def create_server_control(switch_window):
+    from windows.server_control import ServerControl
+    return ServerControl(switch_window)
+
+WINDOW_FACTORIES = {
+    "lab_management": create_lab_management,
+    "performance_monitor": create_performance_monitor,
+    "import_export": create_import_export,
+    "server_control": create_server_control,
+}
+
 class App(QStackedWidget):
     def __init__(self):
         super().__init__()
@@ -26,16 +54,8 @@ class App(QStackedWidget):
 
     def init_ui(self):
         self.main_menu = MainMenu(self.switch_window)
-        self.lab_management = LabManagement(self.switch_window)
-        self.performance_monitor = PerformanceMonitor(self.switch_window)
-        self.import_export = ImportExport(self.switch_window)
-        self.server_control = ServerControl(self.switch_window)
-
         self.addWidget(self.main_menu)
-        self.addWidget(self.lab_management)
-        self.addWidget(self.performance_monitor)
-        self.addWidget(self.import_export)
-        self.addWidget(self.server_control)
+        self.windows = {}
 
         self.current_student_id = None
 
@@ -50,23 +70,35 @@ class App(QStackedWidget):
     def apply_style(self):
         self.setStyleSheet(MAIN_STYLE)
 
+    def get_window(self, window_name):
+        """Возвращает окно, создавая его при первом обращении."""
+        window = self.windows.get(window_name)
+        if window is None:
+            window = WINDOW_FACTORIES[window_name](self.switch_window)
+            self.windows[window_name] = window
+            self.addWidget(window)
+        return window
+
     def switch_window(self, window_name, data=None):
         if window_name == "main_menu":
             self.setCurrentWidget(self.main_menu)
         elif window_name == "lab_management":
-            self.lab_management.load_data()
-            self.setCurrentWidget(self.lab_management)
+            lab_management = self.get_window(window_name)
+            lab_management.load_data()
+            self.setCurrentWidget(lab_management)
         elif window_name == "performance_monitor":
-            self.performance_monitor.load_data()
-            self.setCurrentWidget(self.performance_monitor)
+            performance_monitor = self.get_window(window_name)
+            performance_monitor.load_data()
+            self.setCurrentWidget(performance_monitor)
         elif window_name == "import_export":
-            self.setCurrentWidget(self.import_export)
+            self.setCurrentWidget(self.get_window(window_name))
         elif window_name == "questions_management" and data is not None:
+            from windows.questions_management import QuestionsManagement
             questions_window = QuestionsManagement(self.switch_window, data)
             self.addWidget(questions_window)
             self.setCurrentWidget(questions_window)
         elif window_name == "server_control":
-            self.setCurrentWidget(self.server_control)
+            self.setCurrentWidget(self.get_window(window_name))
 
     def set_student_id(self, student_id):
         self.current_student_id = student_id
@@ -75,6 +107,8 @@ class App(QStackedWidget):
         return self.current_student_id
 
 if __name__ == "__main__":
+    # Нужен собранному приложению для запуска рабочих процессов сервера
+    multiprocessing.freeze_support()
     # Инициализируем базу данных перед созданием приложения
     initialize_db()
     
@@ -93,4 +127,7 @@ if __name__ == "__main__":
     app.setWindowIcon(QIcon(icon_path))
     
     ex = App()
+    startup_profiler.mark("Главное меню создано")
+    # Отчёт после обработки первых событий, когда окно уже отрисовано
+    QTimer.singleShot(0, startup_profiler.finish)
     sys.exit(app.exec())
@@ -0,0 +1,84 @@
+"""
+Автономный запуск сервера без графического интерфейса и без PyQt5.
+
+Пример::
+
+    python -m teacher_app.server --config config.ini --db mgtu_app.db --workers 4
+
+Сервер останавливается корректно по SIGINT/SIGTERM (на Windows — Ctrl+C
+и Ctrl+Break): рабочие процессы завершаются, соединения закрываются.
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+logger = logging.getLogger("pselp.server")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m teacher_app.server",
+        description="Сервер тестирования Pselp без графического интерфейса",
+    )
+    parser.add_argument("--config", help="путь к config.ini (по умолчанию config.ini рядом с приложением)")
+    parser.add_argument("--db", help="путь к базе данных (по умолчанию mgtu_app.db рядом с приложением)")
+    parser.add_argument("--host", help="адрес прослушивания (переопределяет [Server] host)")
+    parser.add_argument("--port", type=int, help="порт TCP-сервера (переопределяет [Server] port)")
+    parser.add_argument("--static-port", type=int, help="порт сервера изображений (переопределяет [Server] static_port)")
+    parser.add_argument("--workers", type=int, help="число рабочих процессов (переопределяет [Server] workers)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="уровень журнала (по умолчанию INFO)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Журнал настраивается до импорта сервера, иначе он пишет в server_control.log
+    logging.basicConfig(
+        stream=sys.stderr,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=getattr(logging, args.log_level),
+    )
+
+    from .server import PselpServer, apply_config
+
+    settings = apply_config(config_path=args.config, db_path=args.db)
+    # События уже записываются в журнал модулем сервера, консольный обработчик не нужен
+    server = PselpServer(
+        host=args.host,
+        port=args.port,
+        static_port=args.static_port,
+        workers=args.workers,
+        settings=settings,
+    )
+
+    stop_requested = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info(f"Получен сигнал {signal.Signals(signum).name}, остановка сервера")
+        stop_requested.set()
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), request_stop)
+
+    try:
+        server.start()
+    except Exception as e:
+        logger.error(f"Ошибка при запуске серверов: {e}")
+        return 1
+    logger.info(f"Сервер работает на {server.host}:{server.port}, остановка — Ctrl+C")
+    try:
+        # Ожидание с таймаутом, чтобы обработчик сигнала выполнялся и на Windows
+        while not stop_requested.wait(1.0):
+            pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
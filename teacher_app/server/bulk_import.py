@@ -0,0 +1,178 @@
+"""
+Массовый импорт лабораторных работ вместе с вопросами и изображениями.
+
+Лабораторные и вопросы записываются в одной транзакции через executemany,
+поэтому импорт банка из тысячи вопросов — это один коммит, а при ошибке база
+остаётся в исходном состоянии. Изображения сохраняются (и уменьшаются) до её
+начала: хранилище адресуется по содержимому, каждое изображение сразу
+попадает в индекс media, и повторный импорт после отката их переиспользует,
+а блокировка записи не держится на время работы с файлами.
+
+Формат пакета::
+
+    labs = [{'theme': ..., 'time': ..., 'question_count': ...,
+             'questions': [{'category': ..., 'question_number': ...,
+                            'question_text': ..., 'answer1': ..., ...,
+                            'answer4': ..., 'correct_index': ...}]}]
+    images = {'имя в тексте вопросов': b'содержимое'}
+
+Ссылки ``![image](имя)`` в текстах заменяются на имена файлов в хранилище.
+"""
+
+import logging
+import os
+
+from .media_store import IMAGE_REF_RE
+
+logger = logging.getLogger(__name__)
+
+# Вопросы вставляются пачками, чтобы сообщать о ходе импорта
+QUESTION_BATCH_SIZE = 200
+QUESTION_FIELDS = (
+    "category", "question_number", "question_text",
+    "answer1", "answer2", "answer3", "answer4", "correct_index",
+)
+TEXT_FIELDS = ("question_text", "answer1", "answer2", "answer3", "answer4")
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def _rewrite_refs(text, renamed):
+    if not text or not renamed:
+        return text
+    return IMAGE_REF_RE.sub(lambda m: f"![image]({renamed.get(m.group(1), m.group(1))})", text)
+
+
+def _inserted_ids(conn, table, after_id):
+    """Возвращает id строк, вставленных после after_id (транзакция держит блокировку записи)."""
+    return [row[0] for row in conn.execute(f"SELECT id FROM {table} WHERE id > ? ORDER BY id", (after_id,))]
+
+
+def _last_id(conn, table):
+    row = conn.execute(
+        f"""
+        SELECT MAX(
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name='{table}'), 0),
+            COALESCE((SELECT MAX(id) FROM {table}), 0)
+        )
+        """
+    ).fetchone()
+    return row[0]
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_labs(conn, labs, images=None, media_store=None, progress=None,
+                questions=None, stored_images=None, total_questions=None):
+    """
+    Импортирует лабораторные работы и их вопросы одной транзакцией.
+
+    Изображения помещаются в хранилище до начала транзакции.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных
+        labs (list[dict]): Лабораторные работы с вложенными вопросами
+        images (dict[str, bytes]): Изображения, на которые ссылаются вопросы
+        media_store (MediaStore): Хранилище изображений (нужно, если есть images)
+        progress (callable): Вызывается как progress(этап, сделано, всего)
+        questions: Итератор пар (индекс ЛР в labs, вопрос) вместо вложенных
+            вопросов — позволяет не держать весь банк в памяти
+        stored_images (dict[str, str]): Изображения, уже помещённые в
+            хранилище: {имя в тексте вопросов: имя в хранилище}
+        total_questions (int): Число вопросов для отчёта о ходе импорта,
+            если они передаются итератором
+
+    Returns:
+        dict: {'lab_ids': [...], 'question_ids': [[...] для каждой ЛР],
+               'images': {старое имя: имя в хранилище}}
+
+    Raises:
+        BulkImportError: Если в пакете нет обязательных полей
+        sqlite3.Error: При ошибке базы данных (транзакция откатывается)
+    """
+    images = images or {}
+    if images and media_store is None:
+        raise BulkImportError("Для импорта изображений нужно хранилище")
+    report = progress or (lambda stage, done, total: None)
+
+    lab_rows = []
+    for index, lab in enumerate(labs):
+        if not lab.get('theme') or lab.get('time') is None:
+            raise BulkImportError(f"У лабораторной №{index + 1} не заданы тема или время")
+        nested = lab.get('questions') or []
+        lab_rows.append((lab['theme'], lab['time'], lab.get('question_count', len(nested))))
+    if questions is None:
+        questions = (
+            (index, question)
+            for index, lab in enumerate(labs)
+            for question in lab.get('questions') or []
+        )
+        total_questions = sum(len(lab.get('questions') or []) for lab in labs)
+
+    renamed = dict(stored_images or {})
+    for done, (name, data) in enumerate(images.items(), start=1):
+        ext = os.path.splitext(name)[1] or ".png"
+        renamed[name] = media_store.put_bytes(data, ext)
+        report('images', done, len(images))
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        last_lab_id = _last_id(conn, "lab_works")
+        conn.executemany(
+            "INSERT INTO lab_works (theme, time, question_count) VALUES (?, ?, ?)",
+            lab_rows
+        )
+        lab_ids = _inserted_ids(conn, "lab_works", last_lab_id)
+        if len(lab_ids) != len(lab_rows):
+            raise BulkImportError("Не удалось определить id созданных лабораторных")
+        report('labs', len(lab_ids), len(lab_rows))
+
+        question_ids = [[] for _ in labs]
+        last_question_id = _last_id(conn, "questions")
+        done = 0
+        for batch in _batches(questions, QUESTION_BATCH_SIZE):
+            rows = []
+            for lab_index, question in batch:
+                if not 0 <= lab_index < len(lab_ids):
+                    raise BulkImportError(f"Вопрос ссылается на неизвестную лабораторную №{lab_index + 1}")
+                row = {field: question.get(field) for field in QUESTION_FIELDS}
+                for field in TEXT_FIELDS:
+                    row[field] = _rewrite_refs(row[field], renamed)
+                rows.append((lab_ids[lab_index], *(row[field] for field in QUESTION_FIELDS)))
+            conn.executemany(
+                f"""
+                INSERT INTO questions (lab_id, {", ".join(QUESTION_FIELDS)})
+                VALUES (?, {", ".join("?" * len(QUESTION_FIELDS))})
+                """,
+                rows
+            )
+            new_ids = _inserted_ids(conn, "questions", last_question_id)
+            if len(new_ids) != len(rows):
+                raise BulkImportError("Не удалось определить id созданных вопросов")
+            for (lab_index, _), question_id in zip(batch, new_ids):
+                question_ids[lab_index].append(question_id)
+            last_question_id = new_ids[-1]
+            done += len(rows)
+            report('questions', done, total_questions or done)
+
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    logger.info(
+        f"Импортировано лабораторных: {len(lab_ids)}, вопросов: {done}, "
+        f"изображений: {len(renamed)}"
+    )
+    return {'lab_ids': lab_ids, 'question_ids': question_ids, 'images': renamed}
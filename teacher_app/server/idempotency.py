@@ -0,0 +1,111 @@
+"""
+Идемпотентность изменяющих запросов.
+
+Клиент может передать в данных запроса поле idempotency_key. Повтор запроса
+с тем же ключом (двойной щелчок, повтор после обрыва связи) не выполняется
+заново: если первый запрос ещё обрабатывается, повтор ждёт его результата
+(single-flight), а если уже обработан — получает сохранённый ответ.
+
+Ответы хранятся в памяти процесса ограниченное время и в ограниченном
+количестве. Отправки тестов дополнительно записываются в базу
+(см. submission_log), чтобы повтор узнавался и после перезапуска сервера.
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Действия, изменяющие данные и принимающие idempotency_key
+IDEMPOTENT_ACTIONS = {'register', 'submit_test', 'import_lab_works', 'upload_image'}
+MAX_KEY_LENGTH = 64
+IDEMPOTENCY_TTL = 600
+IDEMPOTENCY_MAX_ENTRIES = 2048
+
+
+def is_valid_key(key):
+    return isinstance(key, str) and 0 < len(key) <= MAX_KEY_LENGTH
+
+
+class _Flight:
+    """Выполняющийся запрос, результата которого ждут повторы."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+class IdempotencyStore:
+    """
+    Недавние ответы по ключам идемпотентности и выполняющиеся запросы.
+
+    Attributes:
+        ttl (float): Сколько секунд хранится ответ
+        max_entries (int): Наибольшее число хранимых ответов
+        replayed (int): Число повторов, получивших готовый ответ
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # {(действие, ключ): (срок хранения, ответ)} в порядке добавления
+        self.responses = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.replayed = 0
+
+    def run(self, action, key, handler):
+        """
+        Выполняет handler() один раз для ключа и возвращает его ответ.
+
+        Ответы со статусом 'error' не сохраняются: такие запросы ничего не
+        изменили, и повтор с тем же ключом выполняется заново. Одновременные
+        повторы получают и ответ-ошибку первого запроса.
+        """
+        store_key = (action, key)
+        with self.lock:
+            self._expire()
+            stored = self.responses.get(store_key)
+            if stored is not None:
+                self.replayed += 1
+                logger.info(f"Повтор {action} с ключом {key}, возвращён сохранённый ответ")
+                return copy.deepcopy(stored[1])
+            flight = self.flights.get(store_key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[store_key] = _Flight()
+
+        if not leader:
+            logger.info(f"Повтор {action} с ключом {key} ждёт результата первого запроса")
+            flight.done.wait()
+            with self.lock:
+                self.replayed += 1
+            if flight.response is None:
+                return {'status': 'error', 'message': 'Внутренняя ошибка сервера'}
+            return copy.deepcopy(flight.response)
+
+        response = None
+        try:
+            response = handler()
+            return response
+        finally:
+            with self.lock:
+                del self.flights[store_key]
+                if isinstance(response, dict) and response.get('status') != 'error':
+                    self.responses[store_key] = (time.monotonic() + self.ttl, copy.deepcopy(response))
+                    while len(self.responses) > self.max_entries:
+                        self.responses.popitem(last=False)
+            flight.response = response
+            flight.done.set()
+
+    def _expire(self):
+        """Удаляет устаревшие ответы (вызывается под self.lock)."""
+        now = time.monotonic()
+        while self.responses:
+            store_key, (expires, _) = next(iter(self.responses.items()))
+            if expires > now:
+                break
+            del self.responses[store_key]
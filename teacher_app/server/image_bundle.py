@@ -0,0 +1,122 @@
+"""
+Пакетная выдача изображений попытки одним ответом.
+
+Клиент запрашивает ``/bundle?questions=1,2,3`` и получает tar-поток со всеми
+изображениями выбранных вопросов: изображения вопросов — в варианте 400x300,
+ответов — в варианте 300x200. Имя элемента архива совпадает с относительным
+URL, по которому клиент запросил бы изображение отдельно
+(``images/ab/ab12....png?size=400x300``), поэтому клиент кладёт элементы в
+свой кэш под теми же ключами. ETag и Cache-Control передаются в PAX-заголовках
+элемента.
+
+Архив не сжимается (изображения уже сжаты) и передаётся с Transfer-Encoding:
+chunked по мере чтения файлов, поэтому память сервера не зависит от размера
+пакета.
+"""
+
+import os
+import sqlite3
+import tarfile
+
+from .image_variants import ANSWER_IMAGE_SIZE, QUESTION_IMAGE_SIZE
+from .media_store import extract_image_refs
+
+MAX_BUNDLE_QUESTIONS = 100
+PAX_ETAG = "PSELP.etag"
+PAX_CACHE_CONTROL = "PSELP.cache_control"
+
+
+def parse_question_ids(value):
+    """
+    Разбирает параметр questions ("1,2,3").
+
+    Returns:
+        list[int] | None: Идентификаторы вопросов или None, если параметр некорректен
+    """
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip()]
+    except (AttributeError, ValueError):
+        return None
+    if not ids or len(ids) > MAX_BUNDLE_QUESTIONS:
+        return None
+    return list(dict.fromkeys(ids))
+
+
+def collect_bundle_images(db_path, question_ids):
+    """
+    Собирает изображения, на которые ссылаются вопросы.
+
+    Returns:
+        list[tuple[str, tuple[int, int]]]: Пары (имя файла, размер варианта)
+        без повторов, в порядке следования вопросов
+    """
+    placeholders = ",".join("?" * len(question_ids))
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT id, question_text, answer1, answer2, answer3, answer4
+            FROM questions WHERE id IN ({placeholders})
+            """,
+            question_ids
+        ).fetchall()
+    finally:
+        conn.close()
+
+    by_id = {row[0]: row[1:] for row in rows}
+    images = {}
+    for q_id in question_ids:
+        if q_id not in by_id:
+            continue
+        question_text, *answers = by_id[q_id]
+        for filename in extract_image_refs(question_text)[1]:
+            images.setdefault((filename, QUESTION_IMAGE_SIZE), None)
+        for answer in answers:
+            for filename in extract_image_refs(answer)[1]:
+                images.setdefault((filename, ANSWER_IMAGE_SIZE), None)
+    return list(images)
+
+
+def member_name(filename, size):
+    """Имя элемента архива — относительный URL варианта изображения."""
+    return f"images/{filename}?size={size[0]}x{size[1]}"
+
+
+class ChunkedWriter:
+    """Файлоподобная обёртка, записывающая данные кадрами chunked-кодирования."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.bytes_written = 0
+
+    def write(self, data):
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii"))
+            self.wfile.write(data)
+            self.wfile.write(b"\r\n")
+            self.bytes_written += len(data)
+        return len(data)
+
+    def close(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def open_bundle(writer):
+    """Открывает потоковый tar поверх writer (без сжатия и без seek)."""
+    return tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT)
+
+
+def add_member(tar, name, f, fs, etag, cache_control):
+    """Добавляет открытый файл в архив, копируя его блоками."""
+    info = tarfile.TarInfo(name)
+    info.size = fs.st_size
+    info.mtime = int(fs.st_mtime)
+    info.mode = 0o644
+    info.pax_headers = {PAX_ETAG: etag, PAX_CACHE_CONTROL: cache_control}
+    tar.addfile(info, f)
+
+
+def is_inside(path, root):
+    """Проверяет, что путь не выходит за пределы каталога root."""
+    root = os.path.abspath(root)
+    return os.path.commonpath([os.path.abspath(path), root]) == root
@@ -0,0 +1,168 @@
+"""
+Уменьшенные варианты изображений под размеры отображения в клиенте.
+
+Клиент показывает изображения вопросов в рамке 400x300, а изображения
+ответов — в рамке 300x200. Варианты создаются при добавлении изображения,
+хранятся рядом с оригиналом в формате JPEG и запрашиваются клиентом
+параметром ``?size=ШxВ``. Оригинал загружается только для полноэкранного
+просмотра.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+QUESTION_IMAGE_SIZE = (400, 300)
+ANSWER_IMAGE_SIZE = (300, 200)
+VARIANT_SIZES = (QUESTION_IMAGE_SIZE, ANSWER_IMAGE_SIZE)
+VARIANT_EXTENSION = ".jpg"
+VARIANT_QUALITY = 85
+
+# Сколько результатов разрешения вариантов хранится в памяти
+RESOLVED_CACHE_SIZE = 4096
+
+_VARIANT_NAME_RE = re.compile(r"_\d+x\d+\.jpg$")
+_state_lock = threading.Lock()
+# Создаваемые сейчас варианты: путь к варианту -> событие завершения. Один и
+# тот же вариант создаёт один поток, остальные ждут только его, а не любое
+# другое уменьшение
+_inflight = {}
+# Успешные результаты разрешения: путь к варианту -> файл для отдачи (LRU).
+# Ошибки не запоминаются, следующий запрос пробует снова
+_resolved = OrderedDict()
+_pillow_missing = False
+
+
+def parse_size(value):
+    """
+    Разбирает значение параметра size ("400x300").
+
+    Returns:
+        tuple[int, int] | None: Размер, если он входит в VARIANT_SIZES
+    """
+    try:
+        width, height = (int(part) for part in value.lower().split("x", 1))
+    except (AttributeError, ValueError):
+        return None
+    size = (width, height)
+    return size if size in VARIANT_SIZES else None
+
+
+def variant_path(original_path, size):
+    """Возвращает путь к варианту изображения заданного размера."""
+    stem, _ = os.path.splitext(original_path)
+    return f"{stem}_{size[0]}x{size[1]}{VARIANT_EXTENSION}"
+
+
+def is_variant(path):
+    return bool(_VARIANT_NAME_RE.search(path))
+
+
+def generate_variants(original_path, sizes=VARIANT_SIZES):
+    """
+    Создаёт уменьшенные варианты изображения рядом с оригиналом.
+
+    Вариант не создаётся, если оригинал уже помещается в рамку: тогда вместо
+    варианта используется сам оригинал. Прозрачность заменяется белым фоном,
+    так как клиент показывает изображения на белом.
+
+    Args:
+        original_path (str): Путь к оригиналу
+        sizes: Размеры рамок (ширина, высота)
+
+    Returns:
+        list[str]: Для каждого размера путь к варианту или к оригиналу
+    """
+    global _pillow_missing
+    if _pillow_missing:
+        return []
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("Pillow не установлен, варианты изображений не создаются")
+        _pillow_missing = True
+        return []
+
+    created = []
+    try:
+        with Image.open(original_path) as image:
+            image.load()
+            for size in sizes:
+                target = variant_path(original_path, size)
+                if os.path.exists(target):
+                    created.append(target)
+                    continue
+                if image.width <= size[0] and image.height <= size[1]:
+                    created.append(original_path)
+                    continue
+
+                variant = image.copy()
+                variant.thumbnail(size, Image.Resampling.LANCZOS)
+                if variant.mode in ("RGBA", "LA", "P"):
+                    variant = variant.convert("RGBA")
+                    background = Image.new("RGB", variant.size, (255, 255, 255))
+                    background.paste(variant, mask=variant.getchannel("A"))
+                    variant = background
+                elif variant.mode != "RGB":
+                    variant = variant.convert("RGB")
+
+                # Пишем во временный файл, чтобы сервер не отдал недописанный вариант
+                tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    variant.save(tmp_path, "JPEG", quality=VARIANT_QUALITY, optimize=True)
+                    os.replace(tmp_path, target)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                created.append(target)
+    except (OSError, ValueError) as e:
+        logger.error(f"Не удалось создать варианты изображения {original_path}: {e}")
+    return created
+
+
+def resolve_variant(original_path, size):
+    """
+    Возвращает файл, который следует отдать вместо оригинала для рамки size.
+
+    Вариант создаётся при первом запросе, если не был создан при загрузке
+    изображения (например, для изображений, добавленных до появления вариантов).
+
+    Returns:
+        str | None: Путь к варианту (или к оригиналу, если он уже помещается
+        в рамку) либо None, если вариант недоступен
+    """
+    target = variant_path(original_path, size)
+    if os.path.isfile(target):
+        return target
+    if not os.path.isfile(original_path) or is_variant(original_path):
+        return None
+    with _state_lock:
+        if target in _resolved:
+            _resolved.move_to_end(target)
+            return _resolved[target]
+        done = _inflight.get(target)
+        leader = done is None
+        if leader:
+            done = _inflight[target] = threading.Event()
+    if not leader:
+        done.wait()
+        with _state_lock:
+            return _resolved.get(target)
+
+    try:
+        paths = generate_variants(original_path, sizes=(size,))
+        result = paths[0] if paths else None
+        if result is not None:
+            with _state_lock:
+                _resolved[target] = result
+                while len(_resolved) > RESOLVED_CACHE_SIZE:
+                    _resolved.popitem(last=False)
+        return result
+    finally:
+        with _state_lock:
+            del _inflight[target]
+        done.set()
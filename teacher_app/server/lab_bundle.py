@@ -0,0 +1,221 @@
+"""
+Переносимый пакет лабораторных работ (zip).
+
+Состав архива:
+
+* ``manifest.json`` — версия формата, лабораторные работы и список изображений;
+* ``questions.ndjson`` — по одному вопросу в строке, поле ``lab`` указывает
+  номер лабораторной в манифесте;
+* ``images/<hash>.<ext>`` — изображения, на которые ссылаются вопросы, по
+  одному файлу на содержимое.
+
+Экспорт и импорт читают и пишут элементы архива потоком: вопросы выбираются
+из базы страницами, изображения копируются блоками, поэтому память не зависит
+от размера банка. При импорте изображения, уже имеющиеся в хранилище (по
+хэшу), не распаковываются.
+"""
+
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+import zipfile
+
+from .bulk_import import QUESTION_FIELDS, TEXT_FIELDS, BulkImportError, import_labs
+from .media_store import extract_image_refs
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "pselp-lab-bundle"
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+QUESTIONS_NAME = "questions.ndjson"
+EXPORT_PAGE_SIZE = 500
+
+
+def _noop_progress(stage, done, total):
+    pass
+
+
+def export_bundle(db_path, media_store, path, lab_ids=None, progress=None):
+    """
+    Выгружает лабораторные работы с вопросами и изображениями в zip-пакет.
+
+    Args:
+        db_path (str): Путь к базе данных
+        media_store (MediaStore): Хранилище изображений
+        path (str): Путь к создаваемому архиву
+        lab_ids (list[int]): Какие ЛР выгружать (по умолчанию все)
+        progress (callable): Вызывается как progress(этап, сделано, всего)
+
+    Returns:
+        dict: Число выгруженных лабораторных, вопросов и изображений
+    """
+    report = progress or _noop_progress
+    conn = sqlite3.connect(db_path)
+    tmp_path = f"{path}.tmp"
+    try:
+        query = "SELECT id, theme, time, question_count FROM lab_works"
+        params = ()
+        if lab_ids:
+            query += f" WHERE id IN ({','.join('?' * len(lab_ids))})"
+            params = tuple(lab_ids)
+        labs = conn.execute(query + " ORDER BY id", params).fetchall()
+        lab_index = {row[0]: index for index, row in enumerate(labs)}
+        total_questions = 0
+        if labs:
+            total_questions = conn.execute(
+                f"SELECT COUNT(*) FROM questions WHERE lab_id IN ({','.join('?' * len(labs))})",
+                tuple(lab_index)
+            ).fetchone()[0]
+
+        referenced = {}
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            done = 0
+            with zf.open(QUESTIONS_NAME, "w") as raw, \
+                    io.TextIOWrapper(raw, encoding="utf-8", newline="\n") as out:
+                after_id = 0
+                while True:
+                    rows = conn.execute(
+                        f"""
+                        SELECT id, lab_id, {", ".join(QUESTION_FIELDS)} FROM questions
+                        WHERE id > ? ORDER BY id LIMIT ?
+                        """,
+                        (after_id, EXPORT_PAGE_SIZE)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    after_id = rows[-1][0]
+                    for row in rows:
+                        if row[1] not in lab_index:
+                            continue
+                        question = dict(zip(QUESTION_FIELDS, row[2:]))
+                        for field in TEXT_FIELDS:
+                            for name in extract_image_refs(question[field])[1]:
+                                referenced.setdefault(name, None)
+                        question['lab'] = lab_index[row[1]]
+                        out.write(json.dumps(question, ensure_ascii=False) + "\n")
+                        done += 1
+                    report('questions', done, total_questions)
+
+            images = []
+            written = set()
+            for number, name in enumerate(referenced, start=1):
+                image_hash = media_store.hash_for(name, conn)
+                source = media_store.path_for(name)
+                if not image_hash or not os.path.isfile(source):
+                    logger.warning(f"Изображение {name} не найдено, пропущено при экспорте")
+                    continue
+                arcname = f"images/{image_hash}{os.path.splitext(name)[1].lower()}"
+                if arcname not in written:
+                    # Изображения уже сжаты, повторно их не сжимаем
+                    zf.write(source, arcname, compress_type=zipfile.ZIP_STORED)
+                    written.add(arcname)
+                images.append({'name': name, 'hash': image_hash, 'path': arcname})
+                report('images', number, len(referenced))
+
+            manifest = {
+                'format': BUNDLE_FORMAT,
+                'version': BUNDLE_VERSION,
+                'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'labs': [
+                    {'theme': theme, 'time': lab_time, 'question_count': question_count}
+                    for _, theme, lab_time, question_count in labs
+                ],
+                'question_total': done,
+                'images': images,
+            }
+            zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+        os.replace(tmp_path, path)
+    finally:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info(f"Экспортировано ЛР: {len(labs)}, вопросов: {done}, изображений: {len(images)}")
+    return {'labs': len(labs), 'questions': done, 'images': len(images)}
+
+
+def read_manifest(zf):
+    """
+    Читает и проверяет манифест пакета.
+
+    Raises:
+        BulkImportError: Если архив не является пакетом ЛР
+    """
+    try:
+        with zf.open(MANIFEST_NAME) as f:
+            manifest = json.load(f)
+    except KeyError:
+        raise BulkImportError("В архиве нет манифеста пакета ЛР")
+    except ValueError as e:
+        raise BulkImportError(f"Некорректный манифест: {e}")
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise BulkImportError("Архив не является пакетом лабораторных работ")
+    if manifest.get('version', 0) > BUNDLE_VERSION:
+        raise BulkImportError(f"Пакет создан более новой версией программы (версия {manifest['version']})")
+    return manifest
+
+
+def _iter_questions(zf):
+    with zf.open(QUESTIONS_NAME) as raw:
+        for line_number, line in enumerate(io.TextIOWrapper(raw, encoding="utf-8"), start=1):
+            if not line.strip():
+                continue
+            try:
+                question = json.loads(line)
+            except ValueError as e:
+                raise BulkImportError(f"Некорректная строка {line_number} в {QUESTIONS_NAME}: {e}")
+            yield question.pop('lab', -1), question
+
+
+def import_bundle(db_path, media_store, path, progress=None):
+    """
+    Импортирует zip-пакет лабораторных работ.
+
+    Изображения помещаются в хранилище до начала транзакции (хранилище
+    адресуется по содержимому, повторная запись безопасна), вопросы
+    вставляются одной транзакцией через import_labs.
+
+    Returns:
+        dict: Результат import_labs и число пропущенных (уже имеющихся) изображений
+    """
+    report = progress or _noop_progress
+    with zipfile.ZipFile(path) as zf:
+        manifest = read_manifest(zf)
+        images = manifest.get('images', [])
+        stored = {}
+        skipped = 0
+        for number, image in enumerate(images, start=1):
+            existing = media_store.lookup(image['hash'])
+            if existing:
+                skipped += 1
+                stored[image['name']] = existing
+            else:
+                try:
+                    with zf.open(image['path']) as source:
+                        stored[image['name']] = media_store.put_stream(
+                            source, os.path.splitext(image['path'])[1], expected_hash=image['hash']
+                        )
+                except KeyError:
+                    raise BulkImportError(f"В архиве нет изображения {image['path']}")
+                except ValueError as e:
+                    raise BulkImportError(str(e))
+            report('images', number, len(images))
+
+        conn = sqlite3.connect(db_path)
+        try:
+            created = import_labs(
+                conn, manifest.get('labs', []),
+                progress=report,
+                questions=_iter_questions(zf),
+                stored_images=stored,
+                total_questions=manifest.get('question_total'),
+            )
+        finally:
+            conn.close()
+
+    created['skipped_images'] = skipped
+    return created
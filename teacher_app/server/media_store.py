@@ -0,0 +1,229 @@
+"""
+Хранилище изображений с адресацией по содержимому.
+
+Имя файла определяется хэшем содержимого, а индекс хэш -> файл хранится в
+таблице ``media``, поэтому проверка на дубликат — один поиск по первичному
+ключу независимо от числа изображений. Файлы раскладываются по подкаталогам
+по первым символам хэша (``images/ab/ab12....png``), чтобы каталоги не
+разрастались. Хранилищем пользуются и редактор вопросов, и сервер.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from .image_variants import generate_variants, is_variant
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CHARS = 2
+COPY_BLOCK_SIZE = 64 * 1024
+_HASH_NAME_RE = re.compile(r"^[0-9a-f]{32}$")
+# Ссылка на изображение в тексте вопроса или ответа
+IMAGE_REF_RE = re.compile(r'!\[image\]\((.*?)\)')
+
+
+def hash_bytes(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def extract_image_refs(text):
+    """
+    Разбирает ссылки на изображения в тексте.
+
+    Returns:
+        tuple[str, list[str]]: Текст без ссылок и имена файлов изображений
+    """
+    if not text:
+        return text or "", []
+    return IMAGE_REF_RE.sub('', text).strip(), IMAGE_REF_RE.findall(text)
+
+
+class MediaStore:
+    """
+    Индексированное хранилище изображений.
+
+    Attributes:
+        db_path (str): Путь к базе данных с таблицей media
+        images_dir (str): Корневой каталог изображений (static/images)
+    """
+
+    def __init__(self, db_path, images_dir):
+        self.db_path = db_path
+        self.images_dir = images_dir
+        os.makedirs(self.images_dir, exist_ok=True)
+
+    def path_for(self, filename):
+        """Возвращает абсолютный путь к файлу по имени из индекса."""
+        return os.path.join(self.images_dir, *filename.split("/"))
+
+    def lookup(self, image_hash, conn=None):
+        """
+        Ищет изображение по хэшу содержимого.
+
+        Returns:
+            str | None: Имя файла относительно каталога изображений
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT filename FROM media WHERE hash=?", (image_hash,)).fetchone()
+        finally:
+            if own_conn:
+                conn.close()
+        if row and os.path.exists(self.path_for(row[0])):
+            return row[0]
+        return None
+
+    def put_bytes(self, data, ext=".png", conn=None):
+        """
+        Сохраняет изображение, если такого ещё нет, и возвращает его имя.
+
+        Args:
+            data (bytes): Закодированное изображение
+            ext (str): Расширение файла
+            conn: Открытое соединение, если запись идёт в рамках внешней транзакции
+
+        Returns:
+            str: Имя файла относительно каталога изображений ("ab/ab12....png")
+        """
+        image_hash = hash_bytes(data)
+        existing = self.lookup(image_hash, conn)
+        if existing:
+            return existing
+
+        filename = self._filename_for(image_hash, ext)
+        path = self.path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self._register(image_hash, filename, len(data), conn)
+
+    def put_file(self, src_path, image_hash, ext=".png", conn=None):
+        """
+        Перемещает уже записанный на диск файл в хранилище.
+
+        Используется при потоковой загрузке: хэш посчитан по мере приёма данных.
+        Если такое изображение уже есть, исходный файл удаляется.
+
+        Returns:
+            str: Имя файла относительно каталога изображений
+        """
+        existing = self.lookup(image_hash, conn)
+        if existing:
+            os.remove(src_path)
+            return existing
+
+        filename = self._filename_for(image_hash, ext)
+        path = self.path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(src_path)
+        os.replace(src_path, path)
+        return self._register(image_hash, filename, size, conn)
+
+    def put_stream(self, stream, ext=".png", expected_hash=None, conn=None):
+        """
+        Сохраняет изображение из файлового объекта, не загружая его в память.
+
+        Args:
+            stream: Файловый объект, открытый на чтение в двоичном режиме
+            expected_hash (str): Ожидаемый md5 содержимого
+
+        Returns:
+            str: Имя файла относительно каталога изображений
+
+        Raises:
+            ValueError: Если содержимое не совпадает с expected_hash
+        """
+        tmp_path = os.path.join(self.images_dir, f".incoming.{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.md5()
+        try:
+            with open(tmp_path, "wb") as f:
+                for block in iter(lambda: stream.read(COPY_BLOCK_SIZE), b""):
+                    digest.update(block)
+                    f.write(block)
+            image_hash = digest.hexdigest()
+            if expected_hash and expected_hash.lower() != image_hash:
+                raise ValueError(f"Контрольная сумма изображения не совпадает: {expected_hash}")
+            return self.put_file(tmp_path, image_hash, ext, conn)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def hash_for(self, filename, conn=None):
+        """
+        Возвращает хэш содержимого файла хранилища.
+
+        Хэш берётся из индекса, а для файлов вне индекса вычисляется по содержимому.
+
+        Returns:
+            str | None: md5 или None, если файла нет
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT hash FROM media WHERE filename=?", (filename,)).fetchone()
+        finally:
+            if own_conn:
+                conn.close()
+        if row:
+            return row[0]
+        try:
+            digest = hashlib.md5()
+            with open(self.path_for(filename), "rb") as f:
+                for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+        except OSError:
+            return None
+
+    def _filename_for(self, image_hash, ext):
+        if not ext.startswith("."):
+            ext = f".{ext}"
+        return f"{image_hash[:FANOUT_CHARS]}/{image_hash}{ext.lower()}"
+
+    def _register(self, image_hash, filename, size, conn=None):
+        generate_variants(self.path_for(filename))
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            # Запись может остаться от удалённого с диска файла — перезаписываем её
+            conn.execute(
+                """
+                INSERT INTO media (hash, filename, size) VALUES (?, ?, ?)
+                ON CONFLICT(hash) DO UPDATE SET filename=excluded.filename, size=excluded.size
+                """,
+                (image_hash, filename, size)
+            )
+            if own_conn:
+                conn.commit()
+        finally:
+            if own_conn:
+                conn.close()
+        logger.info(f"Изображение {filename} добавлено в хранилище")
+        return filename
+
+    def index_legacy_files(self, conn):
+        """
+        Добавляет в индекс изображения, сохранённые до появления хранилища.
+
+        Старый редактор называл файлы по md5 содержимого PNG и клал их в корень
+        каталога изображений, поэтому хэш берётся из имени файла.
+        """
+        for entry in os.scandir(self.images_dir):
+            if not entry.is_file() or is_variant(entry.name):
+                continue
+            stem, _ = os.path.splitext(entry.name)
+            if _HASH_NAME_RE.match(stem):
+                conn.execute(
+                    "INSERT OR IGNORE INTO media (hash, filename, size) VALUES (?, ?, ?)",
+                    (stem, entry.name, entry.stat().st_size)
+                )
@@ -0,0 +1,49 @@
+"""
+Обёртка сервера для графического приложения.
+
+PselpServer не зависит от Qt; здесь его обратные вызовы превращаются в
+сигналы, а ожидание остановки выполняется в отдельном QThread.
+"""
+
+import logging
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .server import PselpServer
+
+logger = logging.getLogger(__name__)
+
+
+class ServerThread(QThread):
+    server_started = pyqtSignal()
+    server_stopped = pyqtSignal()
+    log_message = pyqtSignal(str)
+
+    def __init__(self, host=None, port=None, static_port=None, workers=None):
+        super().__init__()
+        self.server = PselpServer(
+            host=host,
+            port=port,
+            static_port=static_port,
+            workers=workers,
+            on_log=self.log_message.emit,
+            on_started=self.server_started.emit,
+            on_stopped=self.server_stopped.emit,
+        )
+
+    def run(self):
+        try:
+            print(f"Запуск сервера на {self.server.host}:{self.server.port}")  # Отладочный вывод
+            self.server.serve_forever()
+        except Exception as e:
+            em = f"Ошибка при запуске серверов: {e}"
+            print(em)  # Отладочный вывод
+            self.log_message.emit(em)
+            logger.error(em)
+            self.server_stopped.emit()
+
+    def get_metrics(self):
+        return self.server.get_metrics()
+
+    def stop_server(self):
+        self.server.stop()
@@ -0,0 +1,93 @@
+"""
+Журнал изменений вопросов для разностной синхронизации.
+
+Триггеры (см. schema) записывают каждую вставку, изменение и удаление вопроса
+в таблицу ``question_changes`` с возрастающим номером seq. Клиент хранит seq
+последней синхронизации и получает только изменения после него. Старые записи
+периодически удаляются; если клиент отстал дальше сохранённой части журнала
+(floor_seq), он получает полный снимок.
+"""
+
+import logging
+
+from .schema import init_question_log
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних записей журнала хранится для каждой лабораторной
+QUESTION_LOG_MAX_ENTRIES = 2000
+
+
+def current_seq(conn):
+    """Последний выданный номер записи журнала (общий для всех лабораторных)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='question_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def get_log_state(conn, lab_id):
+    """
+    Возвращает состояние журнала лабораторной.
+
+    Состояние создаётся вместе с лабораторной (см. schema); запись выполняется,
+    только если у существующей лабораторной его нет.
+
+    Returns:
+        tuple[int, str] | None: (floor_seq, log_id) или None, если лабораторной нет
+    """
+    row = conn.execute("SELECT floor_seq, log_id FROM question_log WHERE lab_id=?", (lab_id,)).fetchone()
+    if row is None and conn.execute("SELECT 1 FROM lab_works WHERE id=?", (lab_id,)).fetchone():
+        init_question_log(conn, lab_id)
+        conn.commit()
+        row = conn.execute("SELECT floor_seq, log_id FROM question_log WHERE lab_id=?", (lab_id,)).fetchone()
+    return row
+
+
+def changes_since(conn, lab_id, since_seq):
+    """
+    Сворачивает записи журнала после since_seq до итогового состояния вопросов.
+
+    Returns:
+        tuple[list[int], list[int]]: (изменённые или добавленные id, удалённые id)
+    """
+    latest = {}
+    for question_id, op in conn.execute(
+        "SELECT question_id, op FROM question_changes WHERE lab_id=? AND seq>? ORDER BY seq",
+        (lab_id, since_seq)
+    ):
+        latest[question_id] = op
+    changed = [q_id for q_id, op in latest.items() if op != 'delete']
+    deleted = [q_id for q_id, op in latest.items() if op == 'delete']
+    return changed, deleted
+
+
+def compact_log(conn, max_entries=QUESTION_LOG_MAX_ENTRIES):
+    """
+    Удаляет старые записи журнала, оставляя по max_entries на лабораторную.
+
+    Клиенты, синхронизированные раньше новой границы, получат полный снимок.
+    """
+    removed = 0
+    for lab_id, count in conn.execute(
+        "SELECT lab_id, COUNT(*) FROM question_changes GROUP BY lab_id"
+    ).fetchall():
+        if count <= max_entries:
+            continue
+        floor_seq = conn.execute(
+            "SELECT seq FROM question_changes WHERE lab_id=? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+            (lab_id, max_entries)
+        ).fetchone()[0]
+        removed += conn.execute(
+            "DELETE FROM question_changes WHERE lab_id=? AND seq<=?", (lab_id, floor_seq)
+        ).rowcount
+        conn.execute(
+            """
+            INSERT INTO question_log (lab_id, floor_seq, log_id)
+            VALUES (?, ?, lower(hex(randomblob(8))))
+            ON CONFLICT(lab_id) DO UPDATE SET floor_seq = MAX(floor_seq, excluded.floor_seq)
+            """,
+            (lab_id, floor_seq)
+        )
+    conn.commit()
+    if removed:
+        logger.info(f"Из журнала изменений вопросов удалено записей: {removed}")
+    return removed
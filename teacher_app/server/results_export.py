@@ -0,0 +1,92 @@
+"""
+Постраничная выгрузка результатов тестирования.
+
+Результаты читаются страницами по первичному ключу (``WHERE r.id > ?
+ORDER BY r.id LIMIT ?``), поэтому каждая страница — короткий запрос по индексу,
+база не блокируется на время передачи, а память сервера ограничена размером
+страницы независимо от объёма истории.
+"""
+
+import csv
+import io
+import json
+
+EXPORT_FORMATS = ("json", "csv", "ndjson")
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+EXPORT_COLUMNS = ("id", "first_name", "last_name", "middle_name", "group_name", "year", "lab_id", "score")
+
+
+class ExportError(Exception):
+    pass
+
+
+def parse_export_options(data):
+    """
+    Проверяет параметры выгрузки.
+
+    Returns:
+        tuple[str, int, int, dict]: (формат, размер страницы, after_id, фильтры)
+
+    Raises:
+        ExportError: Если параметры некорректны
+    """
+    fmt = data.get('format', 'json')
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Неизвестный формат выгрузки: {fmt}")
+    try:
+        page_size = int(data.get('page_size', DEFAULT_PAGE_SIZE))
+        after_id = int(data.get('after_id', 0))
+    except (TypeError, ValueError):
+        raise ExportError("page_size и after_id должны быть целыми числами")
+    if page_size < 1:
+        raise ExportError("page_size должен быть положительным")
+    filters = {key: data[key] for key in ('group_name', 'year', 'lab_id') if data.get(key) is not None}
+    return fmt, min(page_size, MAX_PAGE_SIZE), after_id, filters
+
+
+def fetch_page(conn, filters, after_id, limit):
+    """Возвращает следующую страницу результатов после after_id."""
+    conditions = ["r.id > ?"]
+    params = [after_id]
+    if 'group_name' in filters:
+        conditions.append("s.group_name = ?")
+        params.append(filters['group_name'])
+    if 'year' in filters:
+        conditions.append("s.year = ?")
+        params.append(filters['year'])
+    if 'lab_id' in filters:
+        conditions.append("r.lab_id = ?")
+        params.append(filters['lab_id'])
+    params.append(limit)
+    cursor = conn.execute(
+        f"""
+        SELECT r.id, s.first_name, s.last_name, s.middle_name, s.group_name, s.year, r.lab_id, r.score
+        FROM results r JOIN students s ON r.student_id = s.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY r.id
+        LIMIT ?
+        """,
+        params
+    )
+    return cursor.fetchmany(limit)
+
+
+def format_page(rows, fmt, with_header=False):
+    """
+    Упаковывает страницу в данные кадра.
+
+    Для json строки передаются списком объектов, для csv и ndjson — готовым
+    текстом в поле chunk, который клиент дописывает в файл как есть.
+    """
+    if fmt == "json":
+        return {'results': [dict(zip(EXPORT_COLUMNS, row)) for row in rows]}
+    if fmt == "ndjson":
+        lines = (json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) for row in rows)
+        return {'chunk': "".join(f"{line}\n" for line in lines)}
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if with_header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return {'chunk': buffer.getvalue()}
@@ -0,0 +1,198 @@
+"""
+Служебные таблицы сервера.
+
+Основные таблицы создаются в ``database.initialize_db``; здесь описаны
+таблицы, добавленные позже. ``ensure_schema`` идемпотентна и вызывается и
+приложением преподавателя, и сервером при запуске, поэтому существующие базы
+обновляются автоматически.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY
+        );""",
+    """CREATE TABLE IF NOT EXISTS media (
+            hash TEXT PRIMARY KEY,
+            filename TEXT NOT NULL UNIQUE,
+            size INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );""",
+    # Версия содержимого лабораторной: меняется при любом изменении её вопросов
+    # или строки lab_works. etag случайный, чтобы версии пересозданной базы не
+    # совпали с закэшированными клиентами.
+    """CREATE TABLE IF NOT EXISTS lab_versions (
+            lab_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1,
+            etag TEXT NOT NULL
+        );""",
+    # Журнал изменений вопросов для разностной синхронизации клиентов
+    """CREATE TABLE IF NOT EXISTS question_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            lab_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete'))
+        );""",
+    "CREATE INDEX IF NOT EXISTS idx_question_changes_lab ON question_changes (lab_id, seq);",
+    # Состояние журнала лабораторной: записи до floor_seq удалены при сжатии,
+    # log_id меняется при пересоздании базы
+    """CREATE TABLE IF NOT EXISTS question_log (
+            lab_id INTEGER PRIMARY KEY,
+            floor_seq INTEGER NOT NULL DEFAULT 0,
+            log_id TEXT NOT NULL
+        );""",
+    # Обработанные отправки тестов по ключам идемпотентности клиента: повторная
+    # отправка того же ключа получает сохранённый ответ, а не новую запись
+    """CREATE TABLE IF NOT EXISTS submission_log (
+            idempotency_key TEXT PRIMARY KEY,
+            student_id INTEGER NOT NULL,
+            lab_id INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );""",
+]
+
+_BUMP_LAB_VERSION = """
+        INSERT INTO lab_versions (lab_id, version, etag)
+        VALUES ({lab_id}, 1, lower(hex(randomblob(8))))
+        ON CONFLICT(lab_id) DO UPDATE SET version = version + 1, etag = excluded.etag;"""
+
+# Версия и состояние журнала создаются вместе с лабораторной, чтобы запросы
+# вопросов только читали их и не брали блокировку записи
+_INIT_LAB_VERSION = """
+        INSERT OR IGNORE INTO lab_versions (lab_id, version, etag)
+        SELECT {lab_id}, 1, lower(hex(randomblob(8)));"""
+_INIT_QUESTION_LOG = """
+        INSERT OR IGNORE INTO question_log (lab_id, floor_seq, log_id)
+        SELECT {lab_id}, (SELECT COALESCE(MAX(seq), 0) FROM question_changes), lower(hex(randomblob(8)));"""
+
+# Лабораторные, созданные до появления версий или без триггера
+BACKFILL_STATEMENTS = [
+    """INSERT OR IGNORE INTO lab_versions (lab_id, version, etag)
+        SELECT id, 1, lower(hex(randomblob(8))) FROM lab_works
+        WHERE id NOT IN (SELECT lab_id FROM lab_versions);""",
+    """INSERT OR IGNORE INTO question_log (lab_id, floor_seq, log_id)
+        SELECT id, (SELECT COALESCE(MAX(seq), 0) FROM question_changes), lower(hex(randomblob(8))) FROM lab_works
+        WHERE id NOT IN (SELECT lab_id FROM question_log);""",
+]
+
+# Триггеры создаются, только если основные таблицы уже есть
+TRIGGER_STATEMENTS = [
+    f"""CREATE TRIGGER IF NOT EXISTS lab_version_question_insert
+        AFTER INSERT ON questions BEGIN{_BUMP_LAB_VERSION.format(lab_id="NEW.lab_id")}
+        END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS lab_version_question_update
+        AFTER UPDATE ON questions BEGIN{_BUMP_LAB_VERSION.format(lab_id="NEW.lab_id")}{_BUMP_LAB_VERSION.format(lab_id="OLD.lab_id")}
+        END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS lab_version_question_delete
+        AFTER DELETE ON questions BEGIN{_BUMP_LAB_VERSION.format(lab_id="OLD.lab_id")}
+        END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS lab_state_lab_insert
+        AFTER INSERT ON lab_works BEGIN{_INIT_LAB_VERSION.format(lab_id="NEW.id")}{_INIT_QUESTION_LOG.format(lab_id="NEW.id")}
+        END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS lab_version_lab_update
+        AFTER UPDATE ON lab_works BEGIN{_BUMP_LAB_VERSION.format(lab_id="NEW.id")}
+        END;""",
+    """CREATE TRIGGER IF NOT EXISTS question_change_insert
+        AFTER INSERT ON questions BEGIN
+        INSERT INTO question_changes (lab_id, question_id, op) VALUES (NEW.lab_id, NEW.id, 'insert');
+        END;""",
+    """CREATE TRIGGER IF NOT EXISTS question_change_update
+        AFTER UPDATE ON questions WHEN OLD.lab_id IS NEW.lab_id BEGIN
+        INSERT INTO question_changes (lab_id, question_id, op) VALUES (NEW.lab_id, NEW.id, 'update');
+        END;""",
+    # Перенос вопроса в другую лабораторную — удаление из одной и вставка в другую
+    """CREATE TRIGGER IF NOT EXISTS question_change_move
+        AFTER UPDATE ON questions WHEN OLD.lab_id IS NOT NEW.lab_id BEGIN
+        INSERT INTO question_changes (lab_id, question_id, op) VALUES (OLD.lab_id, OLD.id, 'delete');
+        INSERT INTO question_changes (lab_id, question_id, op) VALUES (NEW.lab_id, NEW.id, 'insert');
+        END;""",
+    """CREATE TRIGGER IF NOT EXISTS question_change_delete
+        AFTER DELETE ON questions BEGIN
+        INSERT INTO question_changes (lab_id, question_id, op) VALUES (OLD.lab_id, OLD.id, 'delete');
+        END;""",
+    """CREATE TRIGGER IF NOT EXISTS lab_version_lab_delete
+        AFTER DELETE ON lab_works BEGIN
+        DELETE FROM lab_versions WHERE lab_id = OLD.id;
+        DELETE FROM question_changes WHERE lab_id = OLD.id;
+        DELETE FROM question_log WHERE lab_id = OLD.id;
+        END;""",
+]
+
+
+def _table_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    return row is not None
+
+
+def _run_once(conn, name, migration):
+    """Выполняет миграцию данных один раз за время жизни базы."""
+    if conn.execute("SELECT 1 FROM schema_migrations WHERE name=?", (name,)).fetchone():
+        return
+    migration()
+    conn.execute("INSERT INTO schema_migrations (name) VALUES (?)", (name,))
+    logger.info(f"Выполнена миграция {name}")
+
+
+def ensure_schema(conn, images_dir=None):
+    """
+    Создаёт недостающие служебные таблицы и переносит старые данные.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных
+        images_dir (str): Каталог изображений для индексации старых файлов
+    """
+    for statement in SCHEMA_STATEMENTS:
+        conn.execute(statement)
+    if _table_exists(conn, "questions") and _table_exists(conn, "lab_works"):
+        for statement in TRIGGER_STATEMENTS:
+            conn.execute(statement)
+        for statement in BACKFILL_STATEMENTS:
+            conn.execute(statement)
+
+    if _table_exists(conn, "images"):
+        # Старая таблица загрузок с uuid-именами переходит в общий индекс
+        _run_once(conn, "media_from_images_table", lambda: conn.execute(
+            "INSERT OR IGNORE INTO media (hash, filename) SELECT hash, filename FROM images"
+        ))
+
+    if images_dir and os.path.isdir(images_dir):
+        from .media_store import MediaStore
+        _run_once(conn, "media_legacy_files",
+                  lambda: MediaStore(None, images_dir).index_legacy_files(conn))
+
+    conn.commit()
+
+
+def init_question_log(conn, lab_id):
+    """
+    Создаёт состояние журнала изменений лабораторной, если его ещё нет.
+
+    Обычно состояние создаёт триггер lab_state_lab_insert; вызов нужен только
+    для лабораторных, добавленных в обход триггеров. Фиксацию выполняет
+    вызывающий.
+    """
+    conn.execute(_INIT_QUESTION_LOG.format(lab_id="?"), (lab_id,))
+
+
+def get_lab_version(conn, lab_id):
+    """
+    Возвращает версию содержимого лабораторной работы.
+
+    Версии создаются триггером при добавлении лабораторной и в ensure_schema,
+    поэтому обычно это только чтение. Строка записывается, лишь если её нет
+    у существующей лабораторной (база изменена в обход триггеров).
+
+    Returns:
+        tuple[int, str] | None: (номер версии, etag) или None, если лабораторной нет
+    """
+    row = conn.execute("SELECT version, etag FROM lab_versions WHERE lab_id=?", (lab_id,)).fetchone()
+    if row is None and conn.execute("SELECT 1 FROM lab_works WHERE id=?", (lab_id,)).fetchone():
+        conn.execute(_INIT_LAB_VERSION.format(lab_id="?"), (lab_id,))
+        conn.commit()
+        row = conn.execute("SELECT version, etag FROM lab_versions WHERE lab_id=?", (lab_id,)).fetchone()
+    return row
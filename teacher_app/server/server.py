@@ -1,3 +1,7 @@
+import base64
+import binascii
+import concurrent.futures
+import socket
 import socketserver
 import threading
 import json
@@ -5,26 +9,66 @@ import logging
 import sqlite3
 import struct
 import os
-import http.server
+import time
 import configparser
-from PyQt5.QtCore import QThread, pyqtSignal
-import uuid
-import hashlib
+from .static_server import StaticFileServer
+from .bulk_import import BulkImportError, import_labs
+from .media_store import MediaStore, extract_image_refs, hash_bytes
+from .schema import ensure_schema, get_lab_version
+from .question_log import changes_since, compact_log, current_seq, get_log_state
+from .idempotency import IDEMPOTENT_ACTIONS, IdempotencyStore, is_valid_key
+from .submission_log import find_submission, prune_submissions, record_submission
+from .results_export import ExportError, fetch_page, format_page, parse_export_options
+from .workers import WorkerSupervisor
+from .uploads import BINARY_FRAME_FLAG, MAX_CHUNK_SIZE, ChunkedUpload, UploadError, drain_frame, normalize_ext
 
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "mgtu_app.db")
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "mgtu_app.db")
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "config.ini")
 STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+IMAGES_DIR = os.path.join(STATIC_DIR, "images")
+# Временные файлы загрузок лежат на том же диске, что и хранилище, чтобы перенос был атомарным
+UPLOADS_DIR = os.path.join(STATIC_DIR, ".uploads")
 
-# Загружаем конфигурацию
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "config.ini")
-if not os.path.exists(config_path):
-    config_path = "config.ini"  # Fallback для собранного приложения
-config.read(config_path)
 
-# Получаем настройки сервера
-SERVER_HOST = config.get('Server', 'host', fallback='0.0.0.0')
-SERVER_PORT = config.getint('Server', 'port', fallback=9999)
-STATIC_PORT = config.getint('Server', 'static_port', fallback=8080)
+def apply_config(config_path=None, db_path=None):
+    """
+    Загружает настройки сервера из config.ini в глобальные переменные модуля.
+
+    Вызывается при импорте с путями по умолчанию; автономный запуск и рабочие
+    процессы вызывают её повторно с путями из командной строки.
+
+    Args:
+        config_path (str): Путь к config.ini
+        db_path (str): Путь к базе данных
+
+    Returns:
+        dict: Переданные пути — по ним рабочие процессы повторяют настройку
+    """
+    global CONFIG_PATH, DATABASE_PATH, SERVER_HOST, SERVER_PORT, STATIC_PORT, STATIC_MAX_CONNECTIONS
+    global STATIC_TIMEOUT, STATIC_KEEPALIVE_REQUESTS, STATIC_CACHE_BYTES, SERVER_WORKERS
+
+    CONFIG_PATH = config_path or DEFAULT_CONFIG_PATH
+    if not config_path and not os.path.exists(CONFIG_PATH):
+        CONFIG_PATH = "config.ini"  # Fallback для собранного приложения
+    DATABASE_PATH = db_path or DEFAULT_DATABASE_PATH
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+
+    # Получаем настройки сервера
+    SERVER_HOST = config.get('Server', 'host', fallback='0.0.0.0')
+    SERVER_PORT = config.getint('Server', 'port', fallback=9999)
+    STATIC_PORT = config.getint('Server', 'static_port', fallback=8080)
+    STATIC_MAX_CONNECTIONS = config.getint('Server', 'static_max_connections', fallback=64)
+    STATIC_TIMEOUT = config.getfloat('Server', 'static_timeout', fallback=15.0)
+    STATIC_KEEPALIVE_REQUESTS = config.getint('Server', 'static_keepalive_requests', fallback=100)
+    STATIC_CACHE_BYTES = config.getint('Server', 'static_cache_mb', fallback=64) * 1024 * 1024
+    # Число процессов TCP-сервера; при 1 сервер работает потоками в процессе приложения
+    SERVER_WORKERS = config.getint('Server', 'workers', fallback=1)
+    return {'config_path': config_path, 'db_path': db_path}
+
+
+apply_config()
 
 logging.basicConfig(
     filename='server_control.log',
@@ -34,36 +78,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class StaticFileServer:
-    def __init__(self, directory=STATIC_DIR, host="0.0.0.0", port=8080):
-        self.directory = directory
-        self.host = host
-        self.port = port
-        self.httpd = None
-        self.thread = None
-
-        # Создаем директорию для статических файлов и изображений
-        os.makedirs(self.directory, exist_ok=True)
-        images_dir = os.path.join(self.directory, "images")
-        os.makedirs(images_dir, exist_ok=True)
-
-    def start(self):
-        handler = http.server.SimpleHTTPRequestHandler
-        os.chdir(self.directory)
-        self.httpd = socketserver.TCPServer((self.host, self.port), handler)
-        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
-        self.thread.start()
-        print(f"Static file server running at http://{self.host}:{self.port}")
-
-    def stop(self):
-        if self.httpd:
-            self.httpd.shutdown()
-            self.httpd.server_close()
-            print("Static file server stopped")
+# Запросы с request_id из этого списка выполняются параллельно (не более
+# MAX_CONCURRENT_REQUESTS на соединение), ответы уходят по мере готовности.
+# Потоковые запросы и загрузки остаются последовательными: их кадры
+# привязаны к порядку в соединении.
+CONCURRENT_ACTIONS = {
+    'login', 'register', 'get_lab_works', 'get_questions', 'sync_questions',
+    'submit_test', 'get_student_info', 'check_lab_completed',
+}
+MAX_CONCURRENT_REQUESTS = 4
 
 class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
     def handle(self):
         self.server.increment_clients()
+        self.upload = None
+        # request_id запроса, который обрабатывает текущий поток
+        self.context = threading.local()
+        self.send_lock = threading.Lock()
+        self.executor = None
         try:
             while True:
                 # Читаем длину сообщения (4 байта)
@@ -73,6 +105,12 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
                 
                 # Распаковываем длину сообщения
                 message_length = struct.unpack('!I', length_prefix)[0]
+
+                # Двоичный кадр — фрагмент загружаемого файла
+                if message_length & BINARY_FRAME_FLAG:
+                    if not self.handle_binary_frame(message_length & ~BINARY_FRAME_FLAG):
+                        break
+                    continue
                 
                 # Читаем данные
                 chunks = []
@@ -90,26 +128,98 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
                 data = b''.join(chunks)
                 try:
                     request = json.loads(data.decode('utf-8'))
-                    response = self.process_request(request)
                 except json.JSONDecodeError:
                     response = {'status': 'error', 'message': 'Неверный формат JSON'}
                     self.send_response(response)
                     continue
-                self.send_response(response)
-        except ConnectionResetError:
+                if request.get('request_id') is not None and request.get('action') in CONCURRENT_ACTIONS:
+                    if self.executor is None:
+                        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+                    self.executor.submit(self.run_concurrent_request, request)
+                else:
+                    self.run_request(request)
+        except (ConnectionResetError, ConnectionError):
             pass
         finally:
+            if self.executor:
+                self.executor.shutdown(wait=True)
+            if self.upload:
+                self.upload.abort()
+                self.upload = None
             self.server.decrement_clients(self.client_address)
 
+    def handle_binary_frame(self, length):
+        """
+        Принимает двоичный кадр активной загрузки.
+
+        Returns:
+            bool: False, если соединение нужно закрыть
+        """
+        if self.upload is None:
+            if length > MAX_CHUNK_SIZE:
+                return False
+            drain_frame(self.request, length)
+            self.send_response({'status': 'error', 'message': 'Нет активной загрузки'})
+            return True
+        try:
+            self.upload.receive_frame(self.request, length)
+        except UploadError as e:
+            # Поток кадров рассинхронизирован, дальше соединение использовать нельзя
+            logger.error(f"Ошибка загрузки {self.upload.upload_id}: {e}")
+            self.upload.abort()
+            self.upload = None
+            self.send_response({'status': 'error', 'message': str(e)})
+            return False
+        return True
+
+    def run_request(self, request):
+        """Выполняет запрос и отправляет ответ с request_id запроса (если он был)."""
+        self.context.request_id = request.get('request_id')
+        try:
+            started = time.monotonic()
+            response = self.process_request(request)
+            self.server.record_request(
+                time.monotonic() - started,
+                isinstance(response, dict) and response.get('status') == 'error'
+            )
+            # Потоковые обработчики отправляют кадры сами и возвращают None
+            if response is not None:
+                self.send_response(response)
+        finally:
+            self.context.request_id = None
+
+    def run_concurrent_request(self, request):
+        try:
+            self.run_request(request)
+        except OSError:
+            pass  # Клиент отключился, пока запрос выполнялся
+        except Exception as e:
+            logger.exception(f"Ошибка при обработке запроса {request.get('action')}: {e}")
+            self.send_response({'status': 'error', 'message': 'Внутренняя ошибка сервера', 'request_id': request['request_id']})
+
     def send_response(self, response):
+        request_id = getattr(self.context, 'request_id', None)
+        if request_id is not None:
+            response = dict(response, request_id=request_id)
         response_data = json.dumps(response).encode('utf-8')
         length_prefix = struct.pack('!I', len(response_data))
-        self.request.sendall(length_prefix + response_data)
+        # Ответы параллельных запросов не должны перемешиваться в потоке
+        with self.send_lock:
+            self.request.sendall(length_prefix + response_data)
 
 
     def process_request(self, request):
         action = request.get('action')
         data = request.get('data', {})
+        key = data.get('idempotency_key') if action in IDEMPOTENT_ACTIONS and isinstance(data, dict) else None
+        if key is None:
+            return self.dispatch_request(action, data)
+        if not is_valid_key(key):
+            return {'status': 'error', 'message': 'Некорректный ключ идемпотентности'}
+        # Повторы с тем же ключом ждут первый запрос и получают его ответ
+        return self.server.idempotency.run(action, key, lambda: self.dispatch_request(action, data))
+
+    def dispatch_request(self, action, data):
         if action == 'login':
             return self.handle_login(data)
         elif action == 'register':
@@ -118,6 +228,8 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             return self.handle_get_lab_works()
         elif action == 'get_questions':
             return self.handle_get_questions(data)
+        elif action == 'sync_questions':
+            return self.handle_sync_questions(data)
         elif action == 'submit_test':
             return self.handle_submit_test(data)
         elif action == 'get_student_info':
@@ -130,6 +242,12 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             return self.handle_check_lab_completed(data)
         elif action == 'upload_image':
             return self.handle_upload_image(data)
+        elif action == 'upload_begin':
+            return self.handle_upload_begin(data)
+        elif action == 'upload_commit':
+            return self.handle_upload_commit(data)
+        elif action == 'upload_abort':
+            return self.handle_upload_abort(data)
         return {'status': 'error', 'message': 'Неизвестное действие'}
 
     def handle_login(self, data):
@@ -156,7 +274,7 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             self.server.client_usernames[self.client_address] = fio
             msg = f"{fio} подключился"
             logger.info(msg)
-            self.server.log_message.emit(msg)
+            self.server.log(msg)
             return {'status': 'success', 'data': {'student_id': student_id}}
         return {'status': 'error', 'message': 'Учетная запись не найдена'}
 
@@ -169,36 +287,39 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
         if not f or not l or not g or not y:
             return {'status': 'error', 'message': 'Необходимо заполнить имя, фамилию, группу и год'}
         conn = sqlite3.connect(DATABASE_PATH)
-        cur = conn.cursor()
-        
-        cur.execute(
-            "SELECT id FROM students WHERE first_name=? AND last_name=? AND middle_name=? AND group_name=? AND year=?",
-            (f, l, m, g, y)
-        )
-        existing_user = cur.fetchone()
-        if existing_user:
-            conn.close()
-            return {'status': 'error', 'message': 'Пользователь с такими данными уже зарегистрирован'}
-        
         try:
+            cur = conn.cursor()
+            # Проверка и вставка в одной транзакции с блокировкой записи: две
+            # одновременные регистрации не создадут двух одинаковых студентов
+            conn.execute("BEGIN IMMEDIATE")
+            cur.execute(
+                "SELECT id FROM students WHERE first_name=? AND last_name=? AND middle_name=? AND group_name=? AND year=?",
+                (f, l, m, g, y)
+            )
+            if cur.fetchone():
+                conn.rollback()
+                return {'status': 'error', 'message': 'Пользователь с такими данными уже зарегистрирован'}
             cur.execute(
                 "INSERT INTO students (first_name, last_name, middle_name, group_name, year) VALUES (?, ?, ?, ?, ?)",
                 (f, l, m, g, y)
             )
             conn.commit()
             student_id = cur.lastrowid
-            conn.close()
-            fio = f"{l} {f}"
-            if m:
-                fio += f" {m}"
-            self.server.client_usernames[self.client_address] = fio
-            msg = f"{fio} подключился (новая регистрация)"
-            logger.info(msg)
-            self.server.log_message.emit(msg)
-            return {'status': 'success', 'data': {'student_id': student_id}}
         except sqlite3.Error as e:
-            conn.close()
+            # В том числе "database is locked", если блокировку записи не удалось получить
+            conn.rollback()
             return {'status': 'error', 'message': f"Ошибка базы данных: {e}"}
+        finally:
+            conn.close()
+
+        fio = f"{l} {f}"
+        if m:
+            fio += f" {m}"
+        self.server.client_usernames[self.client_address] = fio
+        msg = f"{fio} подключился (новая регистрация)"
+        logger.info(msg)
+        self.server.log(msg)
+        return {'status': 'success', 'data': {'student_id': student_id}}
 
     def handle_get_lab_works(self):
         try:
@@ -219,8 +340,16 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
 
         try:
             conn = sqlite3.connect(DATABASE_PATH)
+            if get_lab_version(conn, lid) is None:
+                conn.close()
+                return {'status': 'error', 'message': 'Лабораторная работа не найдена'}
+
             cursor = conn.cursor()
-            
+            # Версия и вопросы читаются в одной транзакции, чтобы не разойтись
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT version, etag FROM lab_versions WHERE lab_id=?", (lid,))
+            version, etag = cursor.fetchone()
+
             logger.debug(f"Загрузка вопросов для lab_id={lid}")
             
             cursor.execute("""
@@ -255,36 +384,15 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
                 logger.error(f"Не найдено время для lab_id={lid}")
                 return {'status': 'error', 'message': 'Не задано время для выполнения теста'}
 
-            results = []
-            for q in questions:
-                q_id, category, q_text, a1, a2, a3, a4, correct_idx = q
-                logger.debug(f"Обработка вопроса {q_id}, категория: {category}")
-
-                q_text_parsed, q_image_urls = self.parse_images(q_text)
-                a1_parsed, a1_image_urls = self.parse_images(a1)
-                a2_parsed, a2_image_urls = self.parse_images(a2)
-                a3_parsed, a3_image_urls = self.parse_images(a3)
-                a4_parsed, a4_image_urls = self.parse_images(a4)
-
-                results.append({
-                    'id': q_id,
-                    'category': category,
-                    'question_text': q_text_parsed,
-                    'question_images': q_image_urls,
-                    'answers': [
-                        {'text': a1_parsed, 'images': a1_image_urls},
-                        {'text': a2_parsed, 'images': a2_image_urls},
-                        {'text': a3_parsed, 'images': a3_image_urls},
-                        {'text': a4_parsed, 'images': a4_image_urls}
-                    ],
-                    'correct_index': correct_idx
-                })
+            results = [self.question_to_dict(q) for q in questions]
 
             response_data = {
                 'status': 'success',
                 'data': {
                     'questions': results,
-                    'time_limit': time_limit
+                    'time_limit': time_limit,
+                    'version': version,
+                    'etag': etag
                 }
             }
             logger.debug(f"Отправка ответа: {response_data}")
@@ -297,6 +405,126 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             logger.error(f"Unexpected error: {e}")
             return {'status': 'error', 'message': 'Внутренняя ошибка сервера'}
 
+    def question_to_dict(self, row):
+        """
+        Преобразует строку таблицы questions в вопрос для клиента.
+
+        Args:
+            row (tuple): (id, category, question_text, answer1..answer4, correct_index)
+        """
+        q_id, category, q_text, a1, a2, a3, a4, correct_idx = row
+        logger.debug(f"Обработка вопроса {q_id}, категория: {category}")
+
+        q_text_parsed, q_image_urls = self.parse_images(q_text)
+        a1_parsed, a1_image_urls = self.parse_images(a1)
+        a2_parsed, a2_image_urls = self.parse_images(a2)
+        a3_parsed, a3_image_urls = self.parse_images(a3)
+        a4_parsed, a4_image_urls = self.parse_images(a4)
+
+        return {
+            'id': q_id,
+            'category': category,
+            'question_text': q_text_parsed,
+            'question_images': q_image_urls,
+            'answers': [
+                {'text': a1_parsed, 'images': a1_image_urls},
+                {'text': a2_parsed, 'images': a2_image_urls},
+                {'text': a3_parsed, 'images': a3_image_urls},
+                {'text': a4_parsed, 'images': a4_image_urls}
+            ],
+            'correct_index': correct_idx
+        }
+
+    def handle_sync_questions(self, data):
+        """
+        Разностная синхронизация вопросов лабораторной.
+
+        Клиент передаёт seq и log_id своей последней синхронизации и получает
+        только изменения после неё (mode='delta'). Если клиент синхронизируется
+        впервые, журнал сжат дальше его seq или база пересоздана, возвращается
+        полный снимок (mode='snapshot').
+        """
+        lid = data.get('lab_id')
+        if not lid:
+            return {'status': 'error', 'message': 'Не указан lab_id'}
+        since_seq = data.get('since_seq')
+        known_log_id = data.get('log_id')
+
+        try:
+            conn = sqlite3.connect(DATABASE_PATH)
+            try:
+                if get_lab_version(conn, lid) is None or get_log_state(conn, lid) is None:
+                    return {'status': 'error', 'message': 'Лабораторная работа не найдена'}
+
+                cursor = conn.cursor()
+                # Журнал, версия и вопросы читаются в одной транзакции
+                cursor.execute("BEGIN")
+                floor_seq, log_id = cursor.execute(
+                    "SELECT floor_seq, log_id FROM question_log WHERE lab_id=?", (lid,)
+                ).fetchone()
+                version, etag = cursor.execute(
+                    "SELECT version, etag FROM lab_versions WHERE lab_id=?", (lid,)
+                ).fetchone()
+                seq = current_seq(conn)
+                lab_time = cursor.execute("SELECT time FROM lab_works WHERE id=?", (lid,)).fetchone()
+                if not lab_time or lab_time[0] is None:
+                    logger.error(f"Не найдено время для lab_id={lid}")
+                    return {'status': 'error', 'message': 'Не задано время для выполнения теста'}
+
+                columns = "id, category, question_text, answer1, answer2, answer3, answer4, correct_index"
+                delta_possible = (
+                    isinstance(since_seq, int)
+                    and known_log_id == log_id
+                    and floor_seq <= since_seq <= seq
+                )
+                changed = deleted = None
+                if delta_possible:
+                    changed, deleted = changes_since(conn, lid, since_seq)
+                    total = cursor.execute("SELECT COUNT(*) FROM questions WHERE lab_id=?", (lid,)).fetchone()[0]
+                    # Если изменилось больше вопросов, чем есть в банке, снимок не больше разности
+                    delta_possible = len(changed) + len(deleted) <= total
+
+                result = {
+                    'time_limit': lab_time[0],
+                    'seq': seq,
+                    'log_id': log_id,
+                    'version': version,
+                    'etag': etag,
+                }
+                if delta_possible:
+                    rows = []
+                    if changed:
+                        placeholders = ",".join("?" * len(changed))
+                        rows = cursor.execute(
+                            f"SELECT {columns} FROM questions WHERE lab_id=? AND id IN ({placeholders})",
+                            (lid, *changed)
+                        ).fetchall()
+                    found = {row[0] for row in rows}
+                    result['mode'] = 'delta'
+                    result['changed'] = [self.question_to_dict(row) for row in rows]
+                    # Вопрос мог быть удалён после записи в журнал
+                    result['deleted'] = deleted + [q_id for q_id in changed if q_id not in found]
+                    logger.debug(
+                        f"Синхронизация lab_id={lid} с seq={since_seq}: "
+                        f"изменено {len(rows)}, удалено {len(result['deleted'])}"
+                    )
+                else:
+                    rows = cursor.execute(
+                        f"SELECT {columns} FROM questions WHERE lab_id=? ORDER BY id", (lid,)
+                    ).fetchall()
+                    if not rows:
+                        return {'status': 'error', 'message': 'Для данной лабораторной работы не созданы вопросы'}
+                    result['mode'] = 'snapshot'
+                    result['questions'] = [self.question_to_dict(row) for row in rows]
+                    logger.debug(f"Полный снимок lab_id={lid}: {len(rows)} вопросов")
+            finally:
+                conn.close()
+            return {'status': 'success', 'data': result}
+
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            return {'status': 'error', 'message': 'Ошибка базы данных'}
+
     def parse_images(self, text: str, base_url: str = None) -> tuple[str, list[str]]:
         """
         Извлекает изображения из текста в формате markdown и возвращает очищенный текст и список URL изображений.
@@ -312,10 +540,7 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             # Используем IP-адрес сервера вместо localhost
             base_url = f"http://{SERVER_HOST}:{STATIC_PORT}/images"
             
-        import re
-        pattern = r'!\[image\]\((.*?)\)'
-        matches = re.findall(pattern, text)
-        cleaned_text = re.sub(pattern, '', text).strip()
+        cleaned_text, matches = extract_image_refs(text)
         
         # Преобразуем имена файлов в полные URL
         image_urls = [f"{base_url}/{match}" for match in matches]
@@ -326,9 +551,44 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
         sid = data.get('student_id')
         lid = data.get('lab_id')
         answers = data.get('answers', {})
+        key = data.get('idempotency_key')
         if not sid or not lid or not answers:
             return {'status': 'error', 'message': 'Необходимо предоставить student_id, lab_id и ответы'}
         conn = sqlite3.connect(DATABASE_PATH)
+        try:
+            # Блокировка записи до конца проверки: одновременные отправки
+            # выполняются по очереди и не создают двух результатов
+            conn.execute("BEGIN IMMEDIATE")
+            if key:
+                # Ключ мог быть обработан до перезапуска сервера или другим процессом
+                stored = find_submission(conn, key)
+                if stored is not None:
+                    conn.rollback()
+                    logger.info(f"Повторная отправка теста {key}, возвращён сохранённый ответ")
+                    return stored
+            response, msg = self.grade_submission(conn, sid, lid, answers)
+            if key:
+                record_submission(conn, key, sid, lid, response)
+            conn.commit()
+        except sqlite3.Error as e:
+            # Временная ошибка ("database is locked"): клиент повторит отправку из журнала
+            conn.rollback()
+            logger.error(f"Ошибка базы данных при отправке теста: {e}")
+            return {'status': 'error', 'message': f"Ошибка базы данных: {e}"}
+        finally:
+            conn.close()
+        if msg:
+            logger.info(msg)
+            self.server.log(msg)
+        return response
+
+    def grade_submission(self, conn, sid, lid, answers):
+        """
+        Проверяет ответы и записывает результат (без фиксации транзакции).
+
+        Returns:
+            tuple[dict, str | None]: Ответ клиенту и сообщение для журнала
+        """
         cursor = conn.cursor()
 
         cursor.execute("SELECT theme FROM lab_works WHERE id=?", (lid,))
@@ -343,8 +603,7 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
         
         cursor.execute("SELECT id FROM results WHERE student_id=? AND lab_id=?", (sid, lid))
         if cursor.fetchone():
-            conn.close()
-            return {'status': 'error', 'message': 'Лабораторная работа уже выполнена'}
+            return {'status': 'error', 'message': 'Лабораторная работа уже выполнена'}, None
         
         cursor.execute("SELECT id, correct_index FROM questions WHERE lab_id=?", (lid,))
         rows = cursor.fetchall()
@@ -354,9 +613,6 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
 
         if score < 3:
             msg = f"{student_fio} не прошел лабораторную работу '{lab_theme}'. Баллы: {score}/5"
-            logger.info(msg)
-            self.server.log_message.emit(msg)
-            conn.close()
             return {
                 'status': 'retake',
                 'message': f'Вы набрали {score}/5, лабораторная не засчитана.',
@@ -364,21 +620,17 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
                     'score': score,
                     'total_questions': total_questions
                 }
-            }
+            }, msg
         
         cursor.execute("INSERT INTO results (student_id, lab_id, score) VALUES (?, ?, ?)", (sid, lid, score))
-        conn.commit()
-        conn.close()
         msg = f"{student_fio} прошел лабораторную работу '{lab_theme}' на {score} баллов из 5."
-        logger.info(msg)
-        self.server.log_message.emit(msg)
         return {
             'status': 'success',
             'data': {
                 'score': score,
                 'total_questions': total_questions
             }
-        }
+        }, msg
 
     def handle_check_lab_completed(self, data):
         sid = data.get('student_id')
@@ -408,92 +660,254 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
         return {'status': 'error', 'message': 'Студент не найден'}
 
     def handle_import_lab_works(self, data):
+        """
+        Импорт лабораторных работ вместе с вопросами и изображениями.
+
+        Всё записывается одной транзакцией. Изображения передаются в поле
+        images как {имя: base64}. Если передан progress=true, сервер перед
+        итоговым ответом отправляет кадры 'partial' с ходом импорта.
+        """
         lw = data.get('lab_works')
         if not lw:
             return {'status': 'error', 'message': 'Нет данных для импорта'}
+        try:
+            images = {name: base64.b64decode(content) for name, content in (data.get('images') or {}).items()}
+        except (TypeError, ValueError, binascii.Error):
+            return {'status': 'error', 'message': 'Некорректные данные изображений'}
+
+        progress = None
+        if data.get('progress'):
+            def progress(stage, done, total):
+                self.send_response({'status': 'partial', 'data': {'stage': stage, 'done': done, 'total': total}})
+
         c = sqlite3.connect(DATABASE_PATH)
-        r = c.cursor()
         try:
-            for lab in lw:
-                th = lab.get('theme')
-                ti = lab.get('time')
-                qc = lab.get('question_count', 0)
-                r.execute("INSERT INTO lab_works (theme, time, question_count) VALUES (?, ?, ?)", (th, ti, qc))
-            c.commit()
-            c.close()
-            return {'status': 'success'}
+            created = import_labs(c, lw, images, self.server.media_store, progress)
+            return {'status': 'success', 'data': created}
+        except BulkImportError as e:
+            return {'status': 'error', 'message': str(e)}
         except sqlite3.Error as e:
-            c.close()
             return {'status': 'error', 'message': f"Ошибка базы данных: {e}"}
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении изображений импорта: {e}")
+            return {'status': 'error', 'message': 'Не удалось сохранить изображения'}
+        finally:
+            c.close()
 
     def handle_export_results(self, data):
-        c = sqlite3.connect(DATABASE_PATH)
-        r = c.cursor()
-        r.execute("SELECT s.first_name, s.last_name, s.middle_name, s.group_name, r.lab_id, r.score FROM results r JOIN students s ON r.student_id = s.id")
-        rec = r.fetchall()
-        c.close()
-        out = []
-        for row in rec:
-            out.append({
-                'first_name': row[0],
-                'last_name': row[1],
-                'middle_name': row[2],
-                'group_name': row[3],
-                'lab_id': row[4],
-                'score': row[5]
+        """
+        Выгрузка результатов с фильтрами по группе, году и лабораторной.
+
+        По умолчанию возвращается один ответ с одной страницей и after_id
+        следующей, как ожидают существующие клиенты. С stream=true ответ
+        передаётся потоком: несколько кадров со статусом 'partial' (по
+        странице в каждом) и завершающий кадр 'success'.
+
+        Returns:
+            dict | None: Ответ или None, если кадры уже отправлены
+        """
+        try:
+            fmt, page_size, after_id, filters = parse_export_options(data)
+        except ExportError as e:
+            return {'status': 'error', 'message': str(e)}
+
+        try:
+            if not data.get('stream', False):
+                conn = sqlite3.connect(DATABASE_PATH)
+                try:
+                    rows = fetch_page(conn, filters, after_id, page_size)
+                finally:
+                    conn.close()
+                page = format_page(rows, fmt, with_header=after_id == 0)
+                page.update({
+                    'format': fmt,
+                    'next_after_id': rows[-1][0] if rows else after_id,
+                    'has_more': len(rows) == page_size,
+                })
+                return {'status': 'success', 'data': page}
+
+            count = 0
+            while True:
+                # Соединение открывается на каждую страницу, чтобы не держать
+                # блокировку чтения, пока клиент принимает данные
+                conn = sqlite3.connect(DATABASE_PATH)
+                try:
+                    rows = fetch_page(conn, filters, after_id, page_size)
+                finally:
+                    conn.close()
+                if not rows:
+                    break
+                page = format_page(rows, fmt, with_header=count == 0)
+                page['format'] = fmt
+                self.send_response({'status': 'partial', 'data': page})
+                count += len(rows)
+                after_id = rows[-1][0]
+                if len(rows) < page_size:
+                    break
+            logger.info(f"Выгружено результатов: {count} ({fmt})")
+            self.send_response({
+                'status': 'success',
+                'data': {'format': fmt, 'count': count, 'last_id': after_id, 'done': True}
             })
-        return {'status': 'success', 'data': {'results': out}}
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            return {'status': 'error', 'message': 'Ошибка базы данных'}
+
+    def handle_upload_image(self, data):
+        """
+        Загрузка небольшого изображения одним JSON-запросом.
 
-    def handle_upload_image(self, image_data):
+        Содержимое передаётся в поле image в base64 (как изображения в
+        import_lab_works). Большие изображения передаются двоичными кадрами
+        (upload_begin / upload_commit), без base64 и без чтения в память целиком.
+        """
         try:
-            # Создаем хэш содержимого изображения для проверки дубликатов
-            image_hash = hashlib.md5(image_data).hexdigest()
-            
-            # Проверяем, существует ли уже такое изображение
-            conn = sqlite3.connect(DATABASE_PATH)
-            cur = conn.cursor()
-            cur.execute("SELECT filename FROM images WHERE hash=?", (image_hash,))
-            existing_file = cur.fetchone()
-            
-            if existing_file:
-                # Если изображение уже существует, возвращаем существующий URL
-                filename = existing_file[0]
-                conn.close()
-                return {'status': 'success', 'data': {'image_url': f"http://localhost:8080/images/{filename}"}}
-            
-            # Генерируем уникальное имя файла
-            filename = f"{uuid.uuid4().hex}.png"
-            image_path = os.path.join(STATIC_DIR, "images", filename)
-            
-            # Сохраняем изображение
-            with open(image_path, "wb") as f:
-                f.write(image_data)
-            
-            # Сохраняем информацию об изображении в базе данных
-            cur.execute("INSERT INTO images (filename, hash) VALUES (?, ?)", (filename, image_hash))
-            conn.commit()
-            conn.close()
-            
-            return {'status': 'success', 'data': {'image_url': f"http://localhost:8080/images/{filename}"}}
-        except Exception as e:
+            image_data = base64.b64decode(data.get('image') or '', validate=True)
+            ext = normalize_ext(data.get('ext'))
+        except (TypeError, ValueError, binascii.Error):
+            return {'status': 'error', 'message': 'Некорректные данные изображения'}
+        except UploadError as e:
+            return {'status': 'error', 'message': str(e)}
+        if not image_data:
+            return {'status': 'error', 'message': 'Нет данных изображения'}
+        try:
+            # Хранилище само проверяет дубликаты по хэшу содержимого
+            exists = self.server.media_store.lookup(hash_bytes(image_data)) is not None
+            filename = self.server.media_store.put_bytes(image_data, ext)
+        except (OSError, sqlite3.Error) as e:
             logger.error(f"Ошибка при сохранении изображения: {e}")
+            return {'status': 'error', 'message': 'Не удалось сохранить изображение'}
+        return {'status': 'success', 'data': self.image_info(filename, exists=exists)}
+
+    def handle_upload_begin(self, data):
+        if self.upload:
+            return {'status': 'error', 'message': 'Предыдущая загрузка не завершена'}
+        ext = data.get('ext', '.png')
+        image_hash = data.get('hash')
+        if image_hash:
+            # Такое изображение уже есть — данные можно не передавать
+            existing = self.server.media_store.lookup(image_hash.lower())
+            if existing:
+                return {'status': 'success', 'data': self.image_info(existing, exists=True)}
+        try:
+            self.upload = ChunkedUpload(UPLOADS_DIR, ext, data.get('size'))
+        except UploadError as e:
+            return {'status': 'error', 'message': str(e)}
+        except OSError as e:
+            logger.error(f"Не удалось начать загрузку: {e}")
+            return {'status': 'error', 'message': 'Не удалось начать загрузку'}
+        return {'status': 'success', 'data': {
+            'upload_id': self.upload.upload_id,
+            'exists': False,
+            'max_chunk_size': MAX_CHUNK_SIZE
+        }}
+
+    def handle_upload_commit(self, data):
+        upload = self.upload
+        if not upload or data.get('upload_id') != upload.upload_id:
+            return {'status': 'error', 'message': 'Загрузка не найдена'}
+        self.upload = None
+        try:
+            image_hash = upload.finish(data.get('hash'))
+            # Дубликат ищется в индексе до переноса файла в хранилище
+            exists = self.server.media_store.lookup(image_hash) is not None
+            filename = self.server.media_store.put_file(upload.path, image_hash, upload.ext)
+        except UploadError as e:
+            upload.abort()
             return {'status': 'error', 'message': str(e)}
+        except (OSError, sqlite3.Error) as e:
+            upload.abort()
+            logger.error(f"Ошибка при сохранении загруженного изображения: {e}")
+            return {'status': 'error', 'message': 'Не удалось сохранить изображение'}
+        logger.info(f"Загружено изображение {filename} ({upload.received} байт)")
+        return {'status': 'success', 'data': self.image_info(filename, exists=exists)}
+
+    def handle_upload_abort(self, data):
+        if self.upload and data.get('upload_id') == self.upload.upload_id:
+            self.upload.abort()
+            self.upload = None
+        return {'status': 'success'}
+
+    def image_info(self, filename, exists):
+        return {
+            'filename': filename,
+            'image_url': f"http://{SERVER_HOST}:{STATIC_PORT}/images/{filename}",
+            'exists': exists
+        }
 
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     allow_reuse_address = True
-    def __init__(self, server_address, RequestHandlerClass):
-        super().__init__(server_address, RequestHandlerClass)
+    # Клиенты держат соединение открытым, остановка сервера не ждёт их отключения
+    daemon_threads = True
+    def __init__(self, server_address, RequestHandlerClass, listen_socket=None):
+        # В многопроцессном режиме слушающий сокет создаёт супервизор и передаёт процессам
+        super().__init__(server_address, RequestHandlerClass, bind_and_activate=listen_socket is None)
+        if listen_socket is not None:
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
         self.connected_clients = 0
         self.lock = threading.Lock()
-        self.log_message = None
+        # Обработчик событий для журнала (окно управления сервером или консоль)
+        self.on_log = None
         self.client_usernames = {}
+        self.media_store = MediaStore(DATABASE_PATH, IMAGES_DIR)
+        self.idempotency = IdempotencyStore()
+        self.requests_handled = 0
+        self.request_errors = 0
+        self.request_time = 0.0
+        self.active_connections = set()
+    def get_request(self):
+        request, client_address = super().get_request()
+        # На Windows и macOS принятый сокет наследует неблокирующий режим
+        # общего слушающего сокета (см. workers.py), а обработчик читает
+        # данные блокирующими вызовами
+        request.setblocking(True)
+        return request, client_address
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.active_connections.add(request)
+        super().process_request(request, client_address)
+    def shutdown_request(self, request):
+        with self.lock:
+            self.active_connections.discard(request)
+        super().shutdown_request(request)
+    def server_close(self):
+        # Закрываем постоянные соединения клиентов, иначе они остались бы
+        # подключены к остановленному серверу
+        with self.lock:
+            connections = list(self.active_connections)
+        for request in connections:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        super().server_close()
+    def log(self, message):
+        if self.on_log:
+            self.on_log(message)
+    def record_request(self, duration, failed=False):
+        with self.lock:
+            self.requests_handled += 1
+            self.request_time += duration
+            if failed:
+                self.request_errors += 1
+    def get_metrics(self):
+        """Счётчики для окна управления сервером."""
+        with self.lock:
+            return {
+                'connected_clients': self.connected_clients,
+                'requests': self.requests_handled,
+                'errors': self.request_errors,
+                'avg_ms': round(self.request_time * 1000 / self.requests_handled, 2) if self.requests_handled else 0.0,
+            }
     def increment_clients(self):
         with self.lock:
             self.connected_clients += 1
             msg = f"Клиентов подключено: {self.connected_clients}"
             logger.info(msg)
-            if self.log_message:
-                self.log_message.emit(msg)
+            self.log(msg)
     def decrement_clients(self, client_address):
         with self.lock:
             self.connected_clients -= 1
@@ -506,49 +920,146 @@ class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
                 msg = f"Клиент отключился: {client_address}"
             logger.info(f"Клиентов подключено: {self.connected_clients}")
             logger.info(msg)
-            if self.log_message:
-                self.log_message.emit(f"Клиентов подключено: {self.connected_clients}")
-                self.log_message.emit(msg)
-
-class ServerThread(QThread):
-    server_started = pyqtSignal()
-    server_stopped = pyqtSignal()
-    log_message = pyqtSignal(str)
-    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, static_dir=STATIC_DIR, static_port=STATIC_PORT):
-        super().__init__()
-        self.host = host
-        self.port = port
+            self.log(f"Клиентов подключено: {self.connected_clients}")
+            self.log(msg)
+
+class PselpServer:
+    """
+    TCP-сервер и сервер изображений без зависимости от Qt.
+
+    О событиях сообщает обратными вызовами: графическое приложение
+    подключает к ним сигналы (см. qt_server.ServerThread), автономный
+    запуск (python -m teacher_app.server) — журнал в консоль.
+
+    Attributes:
+        on_log (callable): Вызывается с текстом события
+        on_started (callable): Вызывается после запуска серверов
+        on_stopped (callable): Вызывается после остановки или ошибки запуска
+    """
+
+    def __init__(self, host=None, port=None, static_dir=STATIC_DIR, static_port=None, workers=None,
+                 settings=None, on_log=None, on_started=None, on_stopped=None):
+        # Значения по умолчанию читаются при создании: apply_config могла их изменить
+        self.host = host or SERVER_HOST
+        self.port = port or SERVER_PORT
+        self.workers = workers or SERVER_WORKERS
+        self.settings = settings or {}
+        self.on_log = on_log
+        self.on_started = on_started
+        self.on_stopped = on_stopped
         self.server = None
         self.server_thread = None
-        self.static_file_server = StaticFileServer(directory=static_dir, host=host, port=static_port)
-    def run(self):
+        self.supervisor = None
+        self.running = False
+        self.stopped = threading.Event()
+        self.static_file_server = StaticFileServer(
+            directory=static_dir,
+            host=self.host,
+            port=static_port or STATIC_PORT,
+            max_connections=STATIC_MAX_CONNECTIONS,
+            connection_timeout=STATIC_TIMEOUT,
+            keepalive_requests=STATIC_KEEPALIVE_REQUESTS,
+            cache_bytes=STATIC_CACHE_BYTES,
+            db_path=DATABASE_PATH,
+        )
+
+    def log(self, message):
+        logger.info(message)
+        if self.on_log:
+            self.on_log(message)
+
+    def _worker_event(self, message):
+        # Рабочие процессы уже записали событие в свой журнал; без обработчика
+        # (автономный запуск) событие дублируется в журнал супервизора
+        if self.on_log:
+            self.on_log(message)
+        else:
+            logger.info(message)
+
+    def start(self):
+        """
+        Подготавливает базу и запускает серверы, не блокируя вызывающий поток.
+
+        Raises:
+            Exception: Если запуск не удался (запущенные части останавливаются)
+        """
+        self.stopped.clear()
         try:
-            print(f"Запуск сервера на {self.host}:{self.port}")  # Отладочный вывод
+            conn = sqlite3.connect(DATABASE_PATH)
+            ensure_schema(conn, IMAGES_DIR)
+            compact_log(conn)
+            prune_submissions(conn)
+            conn.close()
             self.static_file_server.start()
-            self.log_message.emit("Static file server запущен")
-            logger.info("Static file server запущен")
-            self.server = ThreadedTCPServer((self.host, self.port), ThreadedTCPRequestHandler)
-            self.server.log_message = self.log_message
-            self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
-            self.server_thread.start()
-            self.log_message.emit("TCP-сервер запущен")
-            logger.info("TCP-сервер запущен")
-            self.server_started.emit()
-            self.server_thread.join()
-        except Exception as e:
-            em = f"Ошибка при запуске серверов: {e}"
-            print(em)  # Отладочный вывод
-            self.log_message.emit(em)
-            logger.error(em)
-            self.server_stopped.emit()
-    def stop_server(self):
+            self.log("Static file server запущен")
+            if self.workers > 1:
+                self.supervisor = WorkerSupervisor(
+                    self.host, self.port, self.workers, on_log=self._worker_event, settings=self.settings
+                )
+                self.supervisor.start()
+                self.log(f"TCP-сервер запущен ({self.workers} процессов)")
+            else:
+                self.server = ThreadedTCPServer((self.host, self.port), ThreadedTCPRequestHandler)
+                self.server.on_log = self.on_log
+                self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+                self.server_thread.start()
+                self.log("TCP-сервер запущен")
+        except Exception:
+            self._shutdown()
+            raise
+        self.running = True
+        if self.on_started:
+            self.on_started()
+
+    def serve_forever(self):
+        """Запускает серверы и блокирует поток до вызова stop()."""
+        self.start()
+        self.stopped.wait()
+
+    def wait(self, timeout=None):
+        """Ожидает остановки серверов. Возвращает True, если серверы остановлены."""
+        return self.stopped.wait(timeout)
+
+    def get_metrics(self):
+        """
+        Счётчики TCP-сервера: в многопроцессном режиме — суммарные по всем процессам.
+
+        Returns:
+            dict | None: Счётчики или None, если сервер не запущен
+        """
+        if self.supervisor:
+            return self.supervisor.get_metrics()
+        if self.server:
+            metrics = self.server.get_metrics()
+            metrics.update({'workers': 1, 'alive': 1, 'restarts': 0})
+            return metrics
+        return None
+
+    def _shutdown(self):
+        if self.supervisor:
+            self.supervisor.stop()
+            self.supervisor = None
+            self.log("TCP-сервер остановлен")
         if self.server:
             self.server.shutdown()
             self.server.server_close()
-            self.log_message.emit("TCP-сервер остановлен")
-            logger.info("TCP-сервер остановлен")
-        self.static_file_server.stop()
-        self.log_message.emit("Static file server остановлен")
-        logger.info("Static file server остановлен")
+            self.server = None
+            self.log("TCP-сервер остановлен")
+        if self.static_file_server.httpd:
+            stats = self.static_file_server.get_stats()
+            logger.info(
+                f"Статистика кэша изображений: попаданий {stats['hits']}, промахов {stats['misses']}, "
+                f"доля попаданий {stats['hit_ratio']:.0%}, из памяти отдано {stats['bytes_from_memory']} байт"
+            )
+            self.static_file_server.stop()
+            self.log("Static file server остановлен")
 
-        self.server_stopped.emit()
+    def stop(self):
+        """Останавливает серверы; повторный вызов ничего не делает."""
+        if not self.running:
+            return
+        self.running = False
+        self._shutdown()
+        self.stopped.set()
+        if self.on_stopped:
+            self.on_stopped()
@@ -0,0 +1,500 @@
+"""
+Статический HTTP-сервер для раздачи изображений клиентам.
+
+Многопоточный сервер с поддержкой HTTP/1.1 keep-alive. Файлы раздаются из
+явно заданного корня без смены рабочей директории процесса. Изображения
+неизменяемы (имена содержат хэш или uuid), поэтому отдаются с сильным ETag
+и долгоживущим Cache-Control, а условные запросы получают 304.
+
+Часто запрашиваемые файлы держатся в памяти (LRU с бюджетом в байтах) и
+отдаются срезами memoryview, редкие — через sendfile без копирования в Python.
+Все изображения выбранных вопросов можно получить одним запросом ``/bundle``
+(см. image_bundle).
+"""
+
+import functools
+import hashlib
+import http.server
+import json
+import logging
+import os
+import sqlite3
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+
+from .image_bundle import (
+    ChunkedWriter, add_member, collect_bundle_images, is_inside, member_name,
+    open_bundle, parse_question_ids,
+)
+from .image_variants import parse_size, resolve_variant
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_CONNECTION_TIMEOUT = 15.0
+DEFAULT_KEEPALIVE_REQUESTS = 100
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_MAX_ENTRY_BYTES = 8 * 1024 * 1024
+# Файл попадает в память после стольких запросов; до этого он считается холодным
+DEFAULT_CACHE_ADMIT_AFTER = 2
+WRITE_CHUNK_SIZE = 256 * 1024
+
+# Изображения никогда не меняются по тому же URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class ETagRegistry:
+    """Кэш сильных ETag, вычисленных по содержимому файлов."""
+
+    def __init__(self):
+        self._etags = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, fs, f):
+        """
+        Возвращает ETag файла, вычисляя хэш содержимого только при изменении файла.
+
+        Args:
+            path (str): Путь к файлу
+            fs (os.stat_result): Результат fstat открытого файла
+            f: Открытый файл (позиция восстанавливается после чтения) или уже
+               прочитанное содержимое в виде bytes
+
+        Returns:
+            str: ETag в кавычках
+        """
+        key = (fs.st_size, fs.st_mtime_ns)
+        with self._lock:
+            cached = self._etags.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        if isinstance(f, (bytes, bytearray)):
+            digest = hashlib.md5(f)
+        else:
+            digest = hashlib.md5()
+            for block in iter(lambda: f.read(64 * 1024), b""):
+                digest.update(block)
+            f.seek(0)
+        etag = f'"{digest.hexdigest()}"'
+        with self._lock:
+            self._etags[path] = (key, etag)
+        return etag
+
+
+class HotFileCache:
+    """
+    LRU-кэш содержимого популярных файлов с ограничением по суммарному размеру.
+
+    Attributes:
+        max_bytes (int): Бюджет памяти на содержимое файлов
+        max_entry_bytes (int): Файлы крупнее этого размера не кэшируются
+        admit_after (int): Сколько запросов нужно, чтобы файл стал «горячим»
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES,
+                 max_entry_bytes=DEFAULT_CACHE_MAX_ENTRY_BYTES,
+                 admit_after=DEFAULT_CACHE_ADMIT_AFTER):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.admit_after = admit_after
+        self._entries = OrderedDict()
+        self._requests = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_from_memory = 0
+        self.bytes_from_sendfile = 0
+        # Пакеты /bundle передаются tar-потоком, а не из памяти и не через sendfile
+        self.bundles_sent = 0
+        self.bytes_from_bundles = 0
+
+    def get(self, path, key):
+        """
+        Возвращает закэшированный файл, если его версия совпадает с key.
+
+        Returns:
+            tuple[memoryview, str] | None: (содержимое, ETag) или None при промахе
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry:
+                # Файл изменился на диске
+                self._drop(path)
+            self.misses += 1
+            self._requests[path] = self._requests.get(path, 0) + 1
+            return None
+
+    def should_admit(self, path, size):
+        with self._lock:
+            return (
+                self.max_bytes > 0
+                and size <= min(self.max_entry_bytes, self.max_bytes)
+                and self._requests.get(path, 0) >= self.admit_after
+            )
+
+    def put(self, path, key, data, etag):
+        view = memoryview(data)
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+            self._entries[path] = (key, view, etag)
+            self._size += len(view)
+            self._requests.pop(path, None)
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+        return view
+
+    def _drop(self, path):
+        _, view, _ = self._entries.pop(path)
+        self._size -= len(view)
+
+    def record_sent(self, from_memory, size):
+        with self._lock:
+            if from_memory:
+                self.bytes_from_memory += size
+            else:
+                self.bytes_from_sendfile += size
+
+    def record_bundle(self, size):
+        with self._lock:
+            self.bundles_sent += 1
+            self.bytes_from_bundles += size
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'bytes_from_memory': self.bytes_from_memory,
+                'bytes_from_sendfile': self.bytes_from_sendfile,
+                'bundles_sent': self.bundles_sent,
+                'bytes_from_bundles': self.bytes_from_bundles,
+                'cached_files': len(self._entries),
+                'cached_bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class StaticRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Обработчик запросов к статическим файлам с поддержкой keep-alive."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "PselpStatic/1.0"
+
+    def setup(self):
+        # Таймаут простаивающего соединения задаётся сервером
+        self.timeout = self.server.connection_timeout
+        super().setup()
+        self.requests_on_connection = 0
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        self.requests_on_connection += 1
+        if self.requests_on_connection >= self.server.keepalive_requests:
+            self.close_connection = True
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == "/bundle":
+            self.send_bundle()
+            return
+        body = self.send_head()
+        if body is None:
+            return
+        if isinstance(body, memoryview):
+            self.send_memory(body)
+            return
+        try:
+            self.send_file(body)
+        finally:
+            body.close()
+
+    def do_HEAD(self):
+        body = self.send_head()
+        if body is not None and not isinstance(body, memoryview):
+            body.close()
+
+    def send_head(self):
+        """
+        Отправляет статус и заголовки ответа.
+
+        Returns:
+            memoryview | file | None: содержимое из памяти, открытый файл для
+            sendfile или None, если тело отправлять не нужно
+        """
+        if self.path.split('?', 1)[0] == "/_stats":
+            return self.send_stats()
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) or path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        # Запрос уменьшенного варианта: /images/<имя>?size=400x300
+        variant_fallback = False
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        size = parse_size(query.get('size', [None])[0])
+        if size:
+            variant = resolve_variant(path, size)
+            if variant:
+                path = variant
+            else:
+                variant_fallback = True
+
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            fs = os.fstat(f.fileno())
+            key = (fs.st_size, fs.st_mtime_ns)
+            cache = self.server.hot_cache
+            body = f
+            cached = cache.get(path, key)
+            if cached is not None:
+                f.close()
+                body, etag = cached
+            elif cache.should_admit(path, fs.st_size):
+                data = f.read()
+                f.close()
+                etag = self.server.etags.get(path, fs, data)
+                body = cache.put(path, key, data, etag)
+            else:
+                etag = self.server.etags.get(path, fs, f)
+            cache_control = self.cache_control_for(path)
+            if variant_fallback:
+                # Отдаём оригинал, но не навсегда: вариант может появиться позже
+                cache_control = REVALIDATE_CACHE_CONTROL
+
+            if self.etag_matches(etag):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                if body is f:
+                    f.close()
+                return None
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-type", self.guess_type(path))
+            self.send_header("Content-Length", str(fs.st_size))
+            self.send_header("Last-Modified", self.date_time_string(fs.st_mtime))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return body
+        except:
+            f.close()
+            raise
+
+    def send_memory(self, view):
+        """Отправляет содержимое из памяти срезами без копирования."""
+        for offset in range(0, len(view), WRITE_CHUNK_SIZE):
+            self.wfile.write(view[offset:offset + WRITE_CHUNK_SIZE])
+        self.server.hot_cache.record_sent(True, len(view))
+
+    def send_file(self, f):
+        """Отправляет файл через sendfile (на платформах без него — обычной записью)."""
+        sent = self.connection.sendfile(f)
+        self.server.hot_cache.record_sent(False, sent)
+
+    def send_bundle(self):
+        """
+        Отдаёт tar-поток с изображениями вопросов: /bundle?questions=1,2,3.
+
+        Отсутствующие на диске изображения пропускаются, клиент загрузит их
+        по отдельности.
+        """
+        db_path = self.server.db_path
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        question_ids = parse_question_ids(query.get('questions', [None])[0])
+        if db_path is None or question_ids is None:
+            self.send_error(HTTPStatus.BAD_REQUEST, "Invalid bundle request")
+            return
+        try:
+            images = collect_bundle_images(db_path, question_ids)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка базы данных при сборке пакета изображений: {e}")
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Database error")
+            return
+
+        images_dir = os.path.join(self.directory, "images")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", "application/x-tar")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        writer = ChunkedWriter(self.wfile)
+        count = 0
+        with open_bundle(writer) as tar:
+            for filename, size in images:
+                original = os.path.join(images_dir, *filename.split("/"))
+                if not is_inside(original, images_dir):
+                    continue
+                variant = resolve_variant(original, size)
+                path = variant or original
+                # Как и в send_head: оригинал вместо варианта не кэшируется навсегда
+                cache_control = self.cache_control_for(path) if variant else REVALIDATE_CACHE_CONTROL
+                try:
+                    f = open(path, 'rb')
+                except OSError:
+                    continue
+                with f:
+                    fs = os.fstat(f.fileno())
+                    etag = self.server.etags.get(path, fs, f)
+                    add_member(tar, member_name(filename, size), f, fs, etag, cache_control)
+                    count += 1
+        writer.close()
+        self.server.hot_cache.record_bundle(writer.bytes_written)
+        logger.debug(f"Отдан пакет из {count} изображений ({writer.bytes_written} байт)")
+
+    def send_stats(self):
+        """Отдаёт статистику кэша; доступно только с локального адреса."""
+        if self.client_address[0] not in ("127.0.0.1", "::1"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        body = json.dumps(self.server.hot_cache.get_stats()).encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        return memoryview(body)
+
+    def etag_matches(self, etag):
+        """Проверяет заголовок If-None-Match (список ETag или "*")."""
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        candidates = [c.strip() for c in header.split(",")]
+        if "*" in candidates:
+            return True
+        # Слабое сравнение допустимо для If-None-Match
+        return any(c.removeprefix("W/") == etag for c in candidates)
+
+    def cache_control_for(self, path):
+        images_dir = os.path.join(self.directory, "images") + os.sep
+        if path.startswith(images_dir):
+            return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    def list_directory(self, path):
+        # Листинг каталогов клиентам не нужен
+        self.send_error(404, "File not found")
+        return None
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ThreadedStaticHTTPServer(http.server.ThreadingHTTPServer):
+    """HTTP-сервер с ограничением числа одновременных соединений."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, RequestHandlerClass,
+                 max_connections=DEFAULT_MAX_CONNECTIONS,
+                 connection_timeout=DEFAULT_CONNECTION_TIMEOUT,
+                 keepalive_requests=DEFAULT_KEEPALIVE_REQUESTS,
+                 hot_cache=None, db_path=None):
+        self.max_connections = max_connections
+        self.connection_timeout = connection_timeout
+        self.keepalive_requests = keepalive_requests
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+        self.etags = ETagRegistry()
+        self.hot_cache = hot_cache or HotFileCache()
+        # База с вопросами нужна для /bundle; без неё пакетная выдача отключена
+        self.db_path = db_path
+        super().__init__(server_address, RequestHandlerClass)
+
+    def process_request(self, request, client_address):
+        if not self.connection_slots.acquire(blocking=False):
+            # Превышен лимит соединений: отвечаем 503 и закрываем соединение
+            logger.warning(f"Отклонено соединение {client_address}: достигнут лимит {self.max_connections}")
+            try:
+                request.sendall(
+                    b"HTTP/1.1 503 Service Unavailable\r\n"
+                    b"Content-Length: 0\r\n"
+                    b"Retry-After: 1\r\n"
+                    b"Connection: close\r\n\r\n"
+                )
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self.connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connection_slots.release()
+
+
+class StaticFileServer:
+    def __init__(self, directory, host="0.0.0.0", port=8080,
+                 max_connections=DEFAULT_MAX_CONNECTIONS,
+                 connection_timeout=DEFAULT_CONNECTION_TIMEOUT,
+                 keepalive_requests=DEFAULT_KEEPALIVE_REQUESTS,
+                 cache_bytes=DEFAULT_CACHE_BYTES,
+                 db_path=None):
+        self.directory = os.path.abspath(directory)
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.connection_timeout = connection_timeout
+        self.keepalive_requests = keepalive_requests
+        self.hot_cache = HotFileCache(max_bytes=cache_bytes)
+        self.db_path = db_path
+        self.httpd = None
+        self.thread = None
+
+        # Создаем директорию для статических файлов и изображений
+        os.makedirs(self.directory, exist_ok=True)
+        images_dir = os.path.join(self.directory, "images")
+        os.makedirs(images_dir, exist_ok=True)
+
+    def start(self):
+        handler = functools.partial(StaticRequestHandler, directory=self.directory)
+        self.httpd = ThreadedStaticHTTPServer(
+            (self.host, self.port),
+            handler,
+            max_connections=self.max_connections,
+            connection_timeout=self.connection_timeout,
+            keepalive_requests=self.keepalive_requests,
+            hot_cache=self.hot_cache,
+            db_path=self.db_path,
+        )
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Static file server running at http://{self.host}:{self.port}")
+
+    def get_stats(self):
+        """Возвращает статистику кэша: долю попаданий и объём отданного из памяти."""
+        return self.hot_cache.get_stats()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+            print("Static file server stopped")
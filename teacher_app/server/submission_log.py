@@ -0,0 +1,41 @@
+"""
+Журнал обработанных отправок тестов.
+
+Клиент сохраняет отправку в локальный журнал с ключом идемпотентности и
+повторяет её, пока не получит ответ. Сервер записывает ответ на каждый ключ в
+таблицу ``submission_log`` в той же транзакции, что и результат, поэтому
+повторы после обрыва связи получают исходный ответ и не создают записей.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Сколько дней хранятся ключи; клиент повторяет отправку гораздо быстрее
+SUBMISSION_LOG_RETENTION_DAYS = 30
+
+
+def find_submission(conn, key):
+    """Возвращает сохранённый ответ на отправку с ключом key или None."""
+    row = conn.execute("SELECT response FROM submission_log WHERE idempotency_key=?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def record_submission(conn, key, student_id, lab_id, response):
+    """Сохраняет ответ на отправку (в транзакции вызывающего кода)."""
+    conn.execute(
+        "INSERT INTO submission_log (idempotency_key, student_id, lab_id, response) VALUES (?, ?, ?, ?)",
+        (key, student_id, lab_id, json.dumps(response, ensure_ascii=False))
+    )
+
+
+def prune_submissions(conn, retention_days=SUBMISSION_LOG_RETENTION_DAYS):
+    """Удаляет ключи старше retention_days дней."""
+    cursor = conn.execute(
+        "DELETE FROM submission_log WHERE created_at < datetime('now', ?)",
+        (f"-{retention_days} days",)
+    )
+    conn.commit()
+    if cursor.rowcount:
+        logger.info(f"Удалено устаревших ключей отправки: {cursor.rowcount}")
@@ -0,0 +1,132 @@
+"""
+Потоковая загрузка изображений по TCP-протоколу.
+
+Кадр протокола — 4 байта длины (big-endian) и данные. Обычный кадр содержит
+JSON; если в длине установлен старший бит, кадр двоичный и содержит очередной
+фрагмент загружаемого файла. Порядок загрузки:
+
+1. JSON ``upload_begin`` — сервер создаёт временный файл и возвращает upload_id.
+   Если клиент передал hash и такое изображение уже есть, сервер сразу
+   возвращает имя файла и данные можно не передавать.
+2. Двоичные кадры с фрагментами файла (не больше MAX_CHUNK_SIZE байт каждый),
+   ответа на них нет. Фрагменты пишутся на диск, хэш считается по мере приёма,
+   поэтому память сервера не зависит от размера изображения.
+3. JSON ``upload_commit`` — сервер сверяет размер и хэш, ищет дубликат в
+   индексе хранилища и только после этого переносит файл в хранилище.
+"""
+
+import hashlib
+import os
+import struct
+import uuid
+
+BINARY_FRAME_FLAG = 0x80000000
+MAX_CHUNK_SIZE = 1024 * 1024
+RECV_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+
+class UploadError(Exception):
+    pass
+
+
+def pack_binary_frame(chunk):
+    """Формирует двоичный кадр с фрагментом файла (для клиентов протокола)."""
+    if len(chunk) > MAX_CHUNK_SIZE:
+        raise UploadError("Фрагмент больше допустимого размера")
+    return struct.pack('!I', len(chunk) | BINARY_FRAME_FLAG) + chunk
+
+
+def normalize_ext(ext):
+    """
+    Приводит расширение файла к виду ".png" и проверяет, что оно допустимо.
+
+    Raises:
+        UploadError: Если расширение не из ALLOWED_EXTENSIONS
+    """
+    ext = (ext or ".png").lower()
+    if not ext.startswith("."):
+        ext = f".{ext}"
+    if ext not in ALLOWED_EXTENSIONS:
+        raise UploadError(f"Недопустимое расширение файла: {ext}")
+    return ext
+
+
+class ChunkedUpload:
+    """
+    Принимаемый по частям файл.
+
+    Attributes:
+        upload_id (str): Идентификатор загрузки
+        ext (str): Расширение итогового файла
+        expected_size (int | None): Заявленный клиентом размер
+        received (int): Принято байт
+    """
+
+    def __init__(self, upload_dir, ext=".png", expected_size=None):
+        ext = normalize_ext(ext)
+        os.makedirs(upload_dir, exist_ok=True)
+        self.upload_id = uuid.uuid4().hex
+        self.ext = ext
+        self.expected_size = expected_size
+        self.received = 0
+        self.path = os.path.join(upload_dir, f"{self.upload_id}.part")
+        self._file = open(self.path, "wb")
+        self._hash = hashlib.md5()
+
+    def receive_frame(self, sock, length):
+        """
+        Читает из сокета двоичный кадр длиной length прямо во временный файл.
+
+        Raises:
+            UploadError: Если кадр слишком большой или превышен заявленный размер
+            ConnectionError: Если соединение закрылось посреди кадра
+        """
+        if length > MAX_CHUNK_SIZE:
+            raise UploadError("Фрагмент больше допустимого размера")
+        if self.expected_size is not None and self.received + length > self.expected_size:
+            raise UploadError("Получено больше данных, чем заявлено")
+        remaining = length
+        while remaining:
+            chunk = sock.recv(min(remaining, RECV_SIZE))
+            if not chunk:
+                raise ConnectionError("Соединение закрыто во время загрузки")
+            self._file.write(chunk)
+            self._hash.update(chunk)
+            remaining -= len(chunk)
+        self.received += length
+
+    def finish(self, expected_hash=None):
+        """
+        Закрывает временный файл и проверяет целостность.
+
+        Returns:
+            str: md5 принятого содержимого
+        """
+        self._file.close()
+        digest = self._hash.hexdigest()
+        if self.expected_size is not None and self.received != self.expected_size:
+            raise UploadError(f"Получено {self.received} байт из {self.expected_size}")
+        if self.received == 0:
+            raise UploadError("Файл пуст")
+        if expected_hash and expected_hash.lower() != digest:
+            raise UploadError("Контрольная сумма не совпадает")
+        return digest
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def drain_frame(sock, length):
+    """Пропускает двоичный кадр, для которого нет активной загрузки."""
+    remaining = length
+    while remaining:
+        chunk = sock.recv(min(remaining, RECV_SIZE))
+        if not chunk:
+            raise ConnectionError("Соединение закрыто во время приёма кадра")
+        remaining -= len(chunk)
@@ -0,0 +1,211 @@
+"""
+Многопроцессный режим TCP-сервера.
+
+Из-за GIL многопоточный сервер использует одно ядро: разбор JSON, обработка
+изображений и проверка ответов выполняются по очереди. В многопроцессном
+режиме супервизор создаёт слушающий сокет и передаёт его N рабочим процессам
+(сокет наследуется через multiprocessing и на Windows, и на Linux). Каждый
+процесс принимает соединения с общего сокета и обслуживает их своим
+ThreadedTCPServer со своими соединениями с базой и кэшами.
+
+Процессы отправляют журнал событий и счётчики в общую очередь. Супервизор
+пересылает события в обработчик (окно управления сервером), суммирует
+счётчики и перезапускает упавшие процессы.
+"""
+
+import logging
+import multiprocessing
+import queue
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS_INTERVAL = 1.0
+# Процесс, упавший быстрее этого времени после запуска, перезапускается с задержкой
+MIN_HEALTHY_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+STOP_TIMEOUT = 5.0
+
+
+def worker_main(worker_id, listen_socket, events, control, settings):
+    """
+    Точка входа рабочего процесса.
+
+    Команда остановки приходит по собственному каналу control: общий
+    multiprocessing.Event нельзя использовать, так как после аварийного
+    завершения ожидающего процесса его set() блокируется.
+
+    Процесс запускается через spawn и импортирует модуль сервера заново,
+    поэтому пути к конфигурации и базе передаются в settings.
+    """
+    from .server import ThreadedTCPRequestHandler, ThreadedTCPServer, apply_config
+
+    apply_config(**settings)
+
+    # Соединение достаётся одному из процессов, остальные получают EAGAIN и ждут следующего.
+    # Принятые сокеты переводятся обратно в блокирующий режим в ThreadedTCPServer.get_request
+    listen_socket.setblocking(False)
+    server = ThreadedTCPServer(listen_socket.getsockname(), ThreadedTCPRequestHandler, listen_socket=listen_socket)
+    # События уходят в очередь супервизора
+    server.on_log = lambda message: events.put(('log', worker_id, message))
+    serve_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    serve_thread.start()
+    events.put(('started', worker_id, None))
+    try:
+        # Канал закрывается и при завершении супервизора — тогда процесс тоже останавливается
+        while not control.poll(METRICS_INTERVAL):
+            events.put(('metrics', worker_id, server.get_metrics()))
+    except (KeyboardInterrupt, OSError):
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        events.put(('metrics', worker_id, server.get_metrics()))
+
+
+class WorkerSupervisor:
+    """
+    Запускает и контролирует рабочие процессы TCP-сервера.
+
+    Attributes:
+        workers (int): Число рабочих процессов
+        on_log (callable): Вызывается с текстом события из любого процесса
+        settings (dict): Аргументы apply_config для рабочих процессов
+    """
+
+    def __init__(self, host, port, workers, on_log=None, settings=None):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.on_log = on_log or (lambda message: None)
+        self.settings = settings or {}
+        # spawn: fork процесса с потоками небезопасен, а на Windows другого способа нет
+        self.ctx = multiprocessing.get_context("spawn")
+        self.events = self.ctx.Queue()
+        self.listen_socket = None
+        self.processes = {}
+        self.controls = {}
+        self.started_at = {}
+        self.restarts = {}
+        self.metrics = {}
+        # Счётчики завершившихся процессов, чтобы перезапуск не обнулял статистику
+        self.retired = {'requests': 0, 'errors': 0, 'total_ms': 0.0}
+        self.lock = threading.Lock()
+        self.monitor_thread = None
+        self.stopping = False
+
+    def start(self):
+        self.listen_socket = socket.create_server((self.host, self.port), backlog=128)
+        for worker_id in range(self.workers):
+            self.restarts[worker_id] = 0
+            self._spawn(worker_id)
+        self.monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+        self.monitor_thread.start()
+        logger.info(f"Запущено рабочих процессов: {self.workers} на {self.host}:{self.port}")
+
+    def _spawn(self, worker_id):
+        control, child_control = self.ctx.Pipe()
+        process = self.ctx.Process(
+            target=worker_main,
+            args=(worker_id, self.listen_socket, self.events, child_control, self.settings),
+            name=f"pselp-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_control.close()
+        old_control = self.controls.get(worker_id)
+        if old_control:
+            old_control.close()
+        self.processes[worker_id] = process
+        self.controls[worker_id] = control
+        self.started_at[worker_id] = time.monotonic()
+
+    def _monitor(self):
+        pending_restarts = {}
+        while not self.stopping:
+            try:
+                kind, worker_id, payload = self.events.get(timeout=0.5)
+                self._handle_event(kind, worker_id, payload)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for worker_id, process in list(self.processes.items()):
+                if self.stopping or process.is_alive() or worker_id in pending_restarts:
+                    continue
+                uptime = now - self.started_at[worker_id]
+                self.restarts[worker_id] += 1
+                delay = 0.0
+                if uptime < MIN_HEALTHY_UPTIME:
+                    delay = min(2 ** self.restarts[worker_id], MAX_RESTART_DELAY)
+                with self.lock:
+                    last = self.metrics.pop(worker_id, None)
+                    if last:
+                        self.retired['requests'] += last['requests']
+                        self.retired['errors'] += last['errors']
+                        self.retired['total_ms'] += last['avg_ms'] * last['requests']
+                message = f"Рабочий процесс {worker_id} завершился (код {process.exitcode}), перезапуск"
+                logger.warning(message)
+                self.on_log(message)
+                pending_restarts[worker_id] = now + delay
+            for worker_id, due in list(pending_restarts.items()):
+                if now >= due and not self.stopping:
+                    del pending_restarts[worker_id]
+                    self._spawn(worker_id)
+
+    def _handle_event(self, kind, worker_id, payload):
+        if kind == 'log':
+            self.on_log(payload)
+        elif kind == 'metrics':
+            with self.lock:
+                self.metrics[worker_id] = payload
+        elif kind == 'started':
+            logger.info(f"Рабочий процесс {worker_id} запущен")
+
+    def get_metrics(self):
+        """Суммарные счётчики всех процессов."""
+        with self.lock:
+            per_worker = dict(self.metrics)
+            retired = dict(self.retired)
+        requests = retired['requests'] + sum(m['requests'] for m in per_worker.values())
+        total_ms = retired['total_ms'] + sum(m['avg_ms'] * m['requests'] for m in per_worker.values())
+        return {
+            'workers': self.workers,
+            'alive': sum(1 for p in self.processes.values() if p.is_alive()),
+            'restarts': sum(self.restarts.values()),
+            'connected_clients': sum(m['connected_clients'] for m in per_worker.values()),
+            'requests': requests,
+            'errors': retired['errors'] + sum(m['errors'] for m in per_worker.values()),
+            'avg_ms': round(total_ms / requests, 2) if requests else 0.0,
+        }
+
+    def stop(self):
+        self.stopping = True
+        for control in self.controls.values():
+            try:
+                control.send('stop')
+            except OSError:
+                pass
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in self.processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+        for worker_id, process in self.processes.items():
+            if process.is_alive():
+                logger.warning(f"Рабочий процесс {worker_id} не завершился, принудительная остановка")
+                process.terminate()
+                process.join(1.0)
+        if self.monitor_thread:
+            self.monitor_thread.join(1.0)
+        # Последние события и счётчики процессов
+        while True:
+            try:
+                self._handle_event(*self.events.get_nowait())
+            except queue.Empty:
+                break
+        for control in self.controls.values():
+            control.close()
+        if self.listen_socket:
+            self.listen_socket.close()
+        logger.info("Рабочие процессы остановлены")
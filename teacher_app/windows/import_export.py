@@ -4,17 +4,92 @@ from PyQt5.QtWidgets import (
     QPushButton,
     QMessageBox,
     QLabel,
-    QFileDialog
+    QFileDialog,
+    QProgressDialog
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 import sqlite3
 import json
 import os
+import base64
+import binascii
+import traceback
+from database import DB_FILE, IMAGES_DIR
+from server.bulk_import import BulkImportError, import_labs
+from server.lab_bundle import export_bundle, import_bundle
+from server.media_store import MediaStore
+
+IMPORT_STAGES = {
+    'images': "Обработка изображений",
+    'labs': "Создание лабораторных работ",
+    'questions': "Обработка вопросов",
+}
+
+class TaskSignals(QObject):
+    """
+    Сигналы фоновой задачи импорта/экспорта.
+
+    Signals:
+        progress (str, int, int): Этап, сделано, всего
+        finished (object): Результат задачи
+        error (str): Сообщение об ошибке
+    """
+    progress = pyqtSignal(str, int, int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class BundleTask(QRunnable):
+    """Выполняет импорт или экспорт в пуле потоков, не блокируя интерфейс."""
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.signals.progress.emit)
+            self.signals.finished.emit(result)
+        except BulkImportError as e:
+            self.signals.error.emit(str(e))
+        except sqlite3.Error as e:
+            self.signals.error.emit(f"Ошибка базы данных:\n{e}")
+        except json.JSONDecodeError as e:
+            self.signals.error.emit(f"Некорректный формат JSON файла:\n{e}")
+        except OSError as e:
+            self.signals.error.emit(f"Ошибка файла:\n{e}")
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(f"Произошла неизвестная ошибка:\n{e}")
+
+def import_json_file(db_file, media_store, file_name, progress=None):
+    """Импорт старого формата: JSON-список ЛР или объект с ЛР и изображениями (base64)."""
+    with open(file_name, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        labs = data.get('lab_works', [])
+        try:
+            images = {
+                name: base64.b64decode(content)
+                for name, content in (data.get('images') or {}).items()
+            }
+        except (TypeError, binascii.Error) as e:
+            raise BulkImportError(f"Некорректные данные изображений: {e}")
+    else:
+        labs, images = data, {}
+    conn = sqlite3.connect(db_file)
+    try:
+        return import_labs(conn, labs, images, media_store, progress)
+    finally:
+        conn.close()
 
 class ImportExport(QWidget):
     def __init__(self, switch_window):
         super().__init__()
         self.switch_window = switch_window
+        self.thread_pool = QThreadPool()
+        self.progress_dialog = None
         self.init_ui()
 
     def init_ui(self):
@@ -56,61 +131,68 @@ class ImportExport(QWidget):
             self,
             "Импортировать ЛР",
             "",
-            "JSON Files (*.json)",
+            "Пакет ЛР (*.zip);;JSON Files (*.json)",
             options=options
         )
         if file_name:
-            try:
-                with open(file_name, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                conn = sqlite3.connect("mgtu_app.db")
-                cursor = conn.cursor()
-                for lab in data:
-                    cursor.execute("""
-                        INSERT INTO lab_works (theme, time, question_count)
-                        VALUES (?, ?, ?)
-                    """, (lab['theme'], lab['time'], lab['question_count']))
-                conn.commit()
-                conn.close()
-                QMessageBox.information(self, "Успех", "Лабораторные работы успешно импортированы.")
-            except sqlite3.IntegrityError as ie:
-                QMessageBox.warning(self, "Ошибка целостности", f"Ошибка целостности данных: {ie}")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось импортировать ЛР:\n{e}")
-            except json.JSONDecodeError as je:
-                QMessageBox.critical(self, "Ошибка JSON", f"Некорректный формат JSON файла:\n{je}")
-            except Exception as ex:
-                QMessageBox.critical(self, "Ошибка", f"Произошла неизвестная ошибка:\n{ex}")
+            media_store = MediaStore(DB_FILE, IMAGES_DIR)
+            if file_name.lower().endswith('.json'):
+                task = BundleTask(import_json_file, DB_FILE, media_store, file_name)
+            else:
+                task = BundleTask(import_bundle, DB_FILE, media_store, file_name)
+            task.signals.finished.connect(self.handle_import_finished)
+            self.start_task(task, "Импорт лабораторных работ...")
 
     def export_lab_works(self):
         file_name, _ = QFileDialog.getSaveFileName(
             self,
             "Экспортировать ЛР",
             "",
-            "JSON Files (*.json)"
+            "Пакет ЛР (*.zip)"
         )
         if file_name:
-            if not file_name.lower().endswith('.json'):
-                file_name += '.json'
-            try:
-                conn = sqlite3.connect("mgtu_app.db")
-                cursor = conn.cursor()
-                cursor.execute("SELECT theme, time, question_count FROM lab_works")
-                records = cursor.fetchall()
-                conn.close()
-                data = []
-                for row in records:
-                    data.append({
-                        'theme': row[0],
-                        'time': row[1],
-                        'question_count': row[2]
-                    })
-                with open(file_name, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=4)
-                QMessageBox.information(self, "Успех", "Лабораторные работы успешно экспортированы.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось экспортировать ЛР:\n{e}")
-            except IOError as ioe:
-                QMessageBox.critical(self, "Ошибка файла", f"Не удалось записать в файл:\n{ioe}")
-            except Exception as ex:
-                QMessageBox.critical(self, "Ошибка", f"Произошла неизвестная ошибка:\n{ex}")
+            if not file_name.lower().endswith('.zip'):
+                file_name += '.zip'
+            task = BundleTask(export_bundle, DB_FILE, MediaStore(DB_FILE, IMAGES_DIR), file_name)
+            task.signals.finished.connect(self.handle_export_finished)
+            self.start_task(task, "Экспорт лабораторных работ...")
+
+    def start_task(self, task, title):
+        """Показывает окно прогресса и запускает задачу в пуле потоков."""
+        self.progress_dialog = QProgressDialog(title, None, 0, 100, self)
+        self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress_dialog.setMinimumDuration(300)
+        self.progress_dialog.setValue(0)
+        task.signals.progress.connect(self.update_progress)
+        task.signals.error.connect(self.handle_task_error)
+        self.thread_pool.start(task)
+
+    def update_progress(self, stage, done, total):
+        if self.progress_dialog:
+            self.progress_dialog.setLabelText(IMPORT_STAGES.get(stage, stage))
+            self.progress_dialog.setValue(int(done * 100 / total) if total else 100)
+
+    def close_progress(self):
+        if self.progress_dialog:
+            self.progress_dialog.close()
+            self.progress_dialog = None
+
+    def handle_import_finished(self, created):
+        self.close_progress()
+        question_count = sum(len(ids) for ids in created['question_ids'])
+        message = f"Импортировано лабораторных работ: {len(created['lab_ids'])}, вопросов: {question_count}."
+        if created.get('skipped_images'):
+            message += f"\nИзображений уже было в хранилище: {created['skipped_images']}."
+        QMessageBox.information(self, "Успех", message)
+
+    def handle_export_finished(self, summary):
+        self.close_progress()
+        QMessageBox.information(
+            self, "Успех",
+            f"Экспортировано лабораторных работ: {summary['labs']}, вопросов: {summary['questions']}, "
+            f"изображений: {summary['images']}."
+        )
+
+    def handle_task_error(self, message):
+        self.close_progress()
+        QMessageBox.critical(self, "Ошибка", message)
@@ -4,8 +4,6 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 import sqlite3
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import os
 from database import DB_FILE
 
@@ -161,10 +159,9 @@ class PerformanceMonitor(QWidget):
         btn_delete_student.clicked.connect(self.delete_student)
         btn_delete_all_students.clicked.connect(self.delete_all_students)
 
-        self.figure = plt.figure(figsize=(5, 4))
-        self.canvas = FigureCanvas(self.figure)
-        layout.addWidget(self.canvas)
-        self.canvas.hide()
+        # График (и matplotlib) создаётся при первом нажатии «Показать график»
+        self.figure = None
+        self.canvas = None
 
         layout.setSpacing(20)
         layout.setContentsMargins(50, 50, 50, 50)
@@ -269,11 +266,22 @@ class PerformanceMonitor(QWidget):
                     self.table.setItem(row_number, 3, QTableWidgetItem(str(avg_score)))
             else:
                 print("Нет данных для отображения студентов.")
-            self.canvas.hide()
+            if self.canvas:
+                self.canvas.hide()
         except sqlite3.Error as e:
             QMessageBox.critical(self, "Ошибка базы данных", f"Произошла ошибка при загрузке данных: {e}")
 
+    def create_chart(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+        self.figure = plt.figure(figsize=(5, 4))
+        self.canvas = FigureCanvas(self.figure)
+        self.layout().addWidget(self.canvas)
+
     def show_chart(self):
+        if self.canvas is None:
+            self.create_chart()
         selected_year = self.combo_year.currentText()
         selected_group = self.combo_group.currentText()
         try:
@@ -2,11 +2,41 @@ from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
     QFileDialog, QMessageBox, QLineEdit, QTextEdit, QVBoxLayout, QGridLayout
 )
-from PyQt5.QtCore import Qt, QStandardPaths, QMimeData, QByteArray, QBuffer, QIODevice
+from PyQt5.QtCore import (
+    Qt, QStandardPaths, QMimeData, QByteArray, QBuffer, QIODevice, QObject, QRunnable, QThreadPool, pyqtSignal
+)
 from PyQt5.QtGui import QGuiApplication, QDragEnterEvent, QDropEvent
-import os
-import uuid
-import hashlib
+import sqlite3
+from server.media_store import MediaStore
+from database import DB_FILE, IMAGES_DIR
+
+class ImageSaveSignals(QObject):
+    """Сигналы сохранения изображения: (имя файла, курсор вставки) или текст ошибки."""
+    finished = pyqtSignal(str, object)
+    error = pyqtSignal(str)
+
+class ImageSaveTask(QRunnable):
+    """
+    Сохраняет изображение в хранилище вне потока интерфейса.
+
+    Вместе с сохранением создаются уменьшенные варианты (Pillow), что для
+    больших изображений заметно дольше кадра интерфейса.
+    """
+
+    def __init__(self, data, cursor):
+        super().__init__()
+        self.data = data
+        # Курсор только передаётся обратно, в потоке задачи он не используется
+        self.cursor = cursor
+        self.signals = ImageSaveSignals()
+
+    def run(self):
+        try:
+            filename = MediaStore(DB_FILE, IMAGES_DIR).put_bytes(self.data, ".png")
+        except (OSError, sqlite3.Error) as e:
+            self.signals.error.emit(str(e))
+            return
+        self.signals.finished.emit(filename, self.cursor)
 
 class ImageTextEdit(QTextEdit):
     def __init__(self, parent=None):
@@ -46,33 +76,25 @@ class ImageTextEdit(QTextEdit):
             super().dropEvent(event)
 
     def _save_and_insert_image(self, qimage):
-        # Вычисляем хэш изображения для дедупликации
+        # Кодируем изображение один раз: эти же байты хэшируются и сохраняются
         byte_array = QByteArray()
         buffer = QBuffer(byte_array)
         buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-        qimage.save(buffer, "PNG")
-        image_hash = hashlib.md5(byte_array.data()).hexdigest()
-        
-        # Проверяем, есть ли уже такое изображение
-        static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
-        images_dir = os.path.join(static_dir, "images")
-        os.makedirs(images_dir, exist_ok=True)
-        
-        # Ищем существующий файл с таким же хэшем
-        for filename in os.listdir(images_dir):
-            if filename.startswith(image_hash):
-                self.insertPlainText(f'![image]({filename})\n')
-                return
-        
-        # Если изображение новое, сохраняем его
-        filename = f"{image_hash}.png"
-        file_path = os.path.join(images_dir, filename)
-        
-        if not qimage.save(file_path, "PNG"):
+        if not qimage.save(buffer, "PNG"):
             QMessageBox.warning(self, "Ошибка", "Не удалось сохранить изображение.")
             return
-            
-        self.insertPlainText(f'![image]({filename})\n')
+
+        # Ссылка вставляется туда, где был курсор в момент вставки изображения
+        task = ImageSaveTask(byte_array.data(), self.textCursor())
+        task.signals.finished.connect(self._insert_image_ref)
+        task.signals.error.connect(self._show_save_error)
+        QThreadPool.globalInstance().start(task)
+
+    def _insert_image_ref(self, filename, cursor):
+        cursor.insertText(f'![image]({filename})\n')
+
+    def _show_save_error(self, message):
+        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить изображение:\n{message}")
 
 class QuestionDialog(QDialog):
     def __init__(self, category="", question_number="", question_text="", answer1="", answer2="", answer3="", answer4="", correct_idx=1):
@@ -7,8 +7,8 @@ from PyQt5.QtWidgets import (
     QMessageBox,
     QHBoxLayout
 )
-from PyQt5.QtCore import Qt
-from server.server import ServerThread
+from PyQt5.QtCore import Qt, QTimer
+from server.qt_server import ServerThread
 import logging
 import socket
 
@@ -26,6 +26,9 @@ class ServerControl(QWidget):
         super().__init__()
         self.switch_window = switch_window
         self.server_thread = None
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(2000)
+        self.metrics_timer.timeout.connect(self.update_metrics)
         self.init_ui()
 
     def init_ui(self):
@@ -42,6 +45,12 @@ class ServerControl(QWidget):
         self.local_ip_label.setStyleSheet("font-size: 14px; color: gray;")
         layout.addWidget(self.local_ip_label)
 
+        # Нагрузка на сервер (в многопроцессном режиме — по всем процессам)
+        self.metrics_label = QLabel("")
+        self.metrics_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.metrics_label.setStyleSheet("font-size: 13px; color: gray;")
+        layout.addWidget(self.metrics_label)
+
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
         self.log_text.hide()
@@ -109,13 +118,28 @@ class ServerControl(QWidget):
     def on_server_started(self):
         self.append_log("Сервер успешно запущен.")
         logger.info("Сервер успешно запущен.")
+        self.metrics_timer.start()
 
     def on_server_stopped(self):
         self.append_log("Сервер успешно остановлен.")
         logger.info("Сервер успешно остановлен.")
+        self.metrics_timer.stop()
+        self.metrics_label.setText("")
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
 
+    def update_metrics(self):
+        metrics = self.server_thread.get_metrics() if self.server_thread else None
+        if not metrics:
+            return
+        text = (
+            f"Клиентов: {metrics['connected_clients']}  |  Запросов: {metrics['requests']}  |  "
+            f"Ошибок: {metrics['errors']}  |  Среднее время: {metrics['avg_ms']} мс"
+        )
+        if metrics['workers'] > 1:
+            text += f"\nПроцессов: {metrics['alive']} из {metrics['workers']}, перезапусков: {metrics['restarts']}"
+        self.metrics_label.setText(text)
+
     def append_log(self, message: str):
         logger.info(message)
         if "Клиент отключился: (" in message: